@@ -241,3 +241,15 @@ def get_current_user_from_token(credentials: HTTPAuthorizationCredentials = Depe
     return payload
 
 
+def get_current_admin(current_user: dict = Depends(get_current_user_from_token)) -> dict:
+    """
+    Dependency для endpoints администратора
+    Пропускает только пользователей, чей email указан в ADMIN_EMAILS
+    """
+    email = (current_user.get("sub") or "").lower()
+    if email not in settings.admin_emails_list:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав"
+        )
+    return current_user
@@ -1,20 +1,33 @@
 """
 API endpoints для дашбордов
 """
-from fastapi import APIRouter, Depends
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 
 from ..models.schemas import DashboardResponse, DashboardItem
 from ..services.dashboard_service import dashboard_service
-from .auth import get_current_user_from_token
+from ..services.dashboard_sections import parse_sections
+from ..core.cancellation import ClientDisconnected, cancel_on_disconnect
+from ..core.config import settings
+from ..core.database import run_in_db_executor
+from ..core.http_cache import compute_etag, etag_matches
+from ..core.serialization import FastJSONResponse, dumps
+from .auth import get_current_user_from_token, get_current_admin
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
+# Клиент закрыл соединение, не дождавшись ответа (как в nginx); ответ никто не получит
+CLIENT_CLOSED_REQUEST = 499
+
 
 @router.get("/", response_model=DashboardResponse)
 async def get_dashboard(
+    request: Request,
     fiscal_year: str = "current",  # "current" или "previous"
     order_status: str = "active",  # "active", "completed" или "all"
+    response_format: str = Query("objects", alias="format"),  # "objects" или "columnar"
+    sections: Optional[str] = None,  # id секций через запятую, по умолчанию - все
     current_user: dict = Depends(get_current_user_from_token)
 ):
     """
@@ -23,31 +36,139 @@ async def get_dashboard(
     Args:
         fiscal_year: "current" для текущего финансового года, "previous" для прошлого
         order_status: "active" для активных заказов, "completed" для завершенных, "all" для всех
+        format: "objects" - строки data/details объектами {колонка: значение},
+            "columnar" - массивами значений в порядке columns/details_columns
+        sections: Вычислить только эти секции ("client_orders,conversions"), неизвестный id - 400
         
+    Секции вычисляются параллельно; секции с ошибкой или таймаутом перечислены в failed_sections.
+    Ответ содержит ETag: если данные не изменились, на запрос с If-None-Match возвращается 304 без тела.
+    Если клиент отключился, не дождавшись ответа, SQL-запросы дашборда отменяются в БД.
     Все SQL-запросы автоматически фильтруются по ФИО пользователя
     """
     user_full_name = current_user.get("full_name")
+    section_ids = _section_ids(sections)
     
     # Получаем данные дашборда
-    dashboard_items = dashboard_service.get_dashboard_data(user_full_name, fiscal_year, order_status)
+    try:
+        dashboard = await cancel_on_disconnect(
+            request, dashboard_service.get_dashboard_data(user_full_name, fiscal_year, order_status, section_ids)
+        )
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    
+    # Элементы уже в форме DashboardResponse - сериализуем напрямую через orjson,
+    # без валидации каждой строки Pydantic (response_model остается для документации)
+    content = {
+        "user_name": user_full_name,
+        "items": dashboard["items"],
+        "failed_sections": dashboard["failed_sections"],
+    }
+    columnar = response_format == "columnar"
+    
+    headers = {
+        # Слабый ETag: тело ответа включает age_seconds/stale, которых нет в хэше
+        "ETag": compute_etag([response_format, _etag_content(content)], weak=True),
+        "Cache-Control": f"private, max-age={settings.DASHBOARD_HTTP_MAX_AGE}",
+        "Vary": "Authorization",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
     
-    return DashboardResponse(
-        user_name=user_full_name,
-        items=dashboard_items
+    return FastJSONResponse(content=content, columnar=columnar, headers=headers)
+
+
+def _section_ids(sections: Optional[str]):
+    """id секций из параметра sections (None - все секции)"""
+    try:
+        return parse_sections(sections)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _etag_content(content: dict) -> dict:
+    """
+    Данные для ETag: содержимое ответа без возраста кэша (age_seconds, stale),
+    чтобы ETag менялся только при изменении самих данных. Ответы с тем же ETag
+    могут отличаться этими полями, поэтому ETag слабый
+    """
+    return {
+        "user_name": content["user_name"],
+        "items": [
+            {key: value for key, value in item.items() if key not in ("age_seconds", "stale")}
+            for item in content["items"]
+        ],
+        "failed_sections": content["failed_sections"],
+    }
+
+
+@router.get("/stream")
+async def stream_dashboard(
+    request: Request,
+    fiscal_year: str = "current",
+    order_status: str = "active",
+    response_format: str = Query("objects", alias="format"),
+    sections: Optional[str] = None,
+    current_user: dict = Depends(get_current_user_from_token)
+):
+    """
+    Потоковая выдача дашборда: каждая секция отправляется, как только вычислена
+    
+    Формат - NDJSON (по событию в строке), при Accept: text/event-stream - Server-Sent Events.
+    События:
+        {"type": "start", "user_name": ...}
+        {"type": "item", "index": позиция секции, "item": DashboardItem} - просроченные задачи первыми
+        {"type": "end", "user_name": ..., "failed_sections": [DashboardSectionError, ...]}
+    index - позиция секции в обычном дашборде, по ней клиент упорядочивает элементы.
+    format=columnar - строки секций массивами значений, как в /api/dashboard/.
+    sections - только эти секции, как в /api/dashboard/.
+    Если клиент отключился, незавершенные секции и их SQL-запросы отменяются.
+    """
+    user_full_name = current_user.get("full_name")
+    section_ids = _section_ids(sections)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    columnar = response_format == "columnar"
+    
+    def encode(event: dict) -> bytes:
+        if sse:
+            return b"event: " + event["type"].encode() + b"\ndata: " + dumps(event, columnar) + b"\n\n"
+        return dumps(event, columnar) + b"\n"
+    
+    async def events():
+        yield encode({"type": "start", "user_name": user_full_name})
+        failed_sections = []
+        async for kind, index, payload in dashboard_service.stream_dashboard_data(user_full_name, fiscal_year, order_status, section_ids):
+            if kind == "failed":
+                failed_sections.append(payload)
+            else:
+                yield encode({"type": "item", "index": index, "item": payload})
+        yield encode({"type": "end", "user_name": user_full_name, "failed_sections": failed_sections})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # nginx не должен буферизовать поток
+        }
     )
 
 
 @router.get("/items", response_model=List[DashboardItem])
 async def get_dashboard_items(
+    request: Request,
     fiscal_year: str = "current",
+    response_format: str = Query("objects", alias="format"),
     current_user: dict = Depends(get_current_user_from_token)
 ):
     """
     Получает только элементы дашборда (без обертки)
     """
     user_full_name = current_user.get("full_name")
-    dashboard_items = dashboard_service.get_dashboard_data(user_full_name, fiscal_year)
-    return dashboard_items
+    try:
+        dashboard = await cancel_on_disconnect(request, dashboard_service.get_dashboard_data(user_full_name, fiscal_year))
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    return FastJSONResponse(content=dashboard["items"], columnar=response_format == "columnar")
 
 
 @router.post("/query")
@@ -62,7 +183,7 @@ async def execute_custom_query(
     В production рекомендуется отключить или ограничить доступ.
     """
     user_full_name = current_user.get("full_name")
-    result = dashboard_service.execute_custom_query(query, user_full_name)
+    result = await run_in_db_executor(dashboard_service.execute_custom_query, query, user_full_name)
     
     return {
         "user": user_full_name,
@@ -71,3 +192,32 @@ async def execute_custom_query(
     }
 
 
+@router.get("/cache")
+async def get_dashboard_cache_stats(current_user: dict = Depends(get_current_admin)):
+    """
+    Статистика кэша дашбордов: количество записей, попадания и промахи (только для администраторов)
+    """
+    return dashboard_service.cache.stats()
+
+
+@router.delete("/cache")
+async def invalidate_dashboard_cache(
+    user_name: Optional[str] = None,
+    closed_periods: bool = False,
+    current_user: dict = Depends(get_current_admin)
+):
+    """
+    Сбрасывает кэш дашбордов (только для администраторов)
+    
+    Args:
+        user_name: ФИО пользователя; если не указано - кэш сбрасывается для всех
+        closed_periods: Удалить также сохраненные в БД результаты за закрытые финансовые годы
+    """
+    removed = await run_in_db_executor(dashboard_service.invalidate_cache, user_name, closed_periods)
+    print(f"🧹 Dashboard cache invalidated for {user_name or 'all users'}: {removed} entries")
+    
+    return {
+        "user_name": user_name,
+        "closed_periods": closed_periods,
+        "removed": removed
+    }
@@ -0,0 +1,172 @@
+"""
+In-memory кэш с временем жизни записей и LRU-вытеснением
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+from .metrics import metrics
+
+
+class CacheLookup(NamedTuple):
+    """Результат поиска в кэше"""
+    value: Any
+    age: float  # Возраст записи, секунды
+    stale: bool  # Запись старше ttl, но еще в пределах max_stale
+
+
+def approximate_size(value: Any) -> int:
+    """
+    Примерный объем значения в памяти, байты: объекты и вложенные строки, кортежи, словари
+    и QueryResult (колонки и строки). Общие объекты (одинаковые строки) считаются каждый раз,
+    поэтому оценка - сверху.
+    """
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approximate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approximate_size(key) + approximate_size(item) for key, item in value.items())
+    if hasattr(value, "columns") and hasattr(value, "rows"):
+        # QueryResult
+        return sys.getsizeof(value) + approximate_size(value.columns) + approximate_size(value.rows)
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    """
+    Кэш с ограничением по времени жизни (ttl, секунды), количеству записей и объему
+    
+    Записи старше ttl, но моложе ttl + max_stale считаются устаревшими: get их не возвращает,
+    а lookup возвращает с признаком stale (для режима stale-while-revalidate).
+    При превышении max_entries или max_bytes (оценка approximate_size) вытесняются записи,
+    к которым дольше всего не обращались; запись больше max_bytes не сохраняется.
+    Попадания, промахи и вытеснения считаются в metrics как <name>_hits, <name>_stale_hits,
+    <name>_misses, <name>_evictions, <name>_too_large.
+    """
+    
+    def __init__(self, name: str, ttl: float, max_entries: int, max_stale: float = 0, max_bytes: int = 0):
+        self.name = name
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes  # 0 - без ограничения объема
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, stored_at, retain, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        metrics.register_gauge(f"{name}_entries", lambda: len(self._entries))
+        metrics.register_gauge(f"{name}_bytes", lambda: self._bytes)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Возвращает значение из кэша
+        
+        Returns:
+            Значение или None, если записи нет или она устарела
+        """
+        found = self.lookup(key, max_stale=0)
+        return found.value if found is not None else None
+    
+    def lookup(self, key: Hashable, ttl: Optional[float] = None, max_stale: Optional[float] = None) -> Optional[CacheLookup]:
+        """
+        Ищет запись в кэше, в том числе устаревшую
+        
+        Args:
+            key: Ключ
+            ttl: Время свежести записи (по умолчанию self.ttl)
+            max_stale: Сколько секунд после ttl запись еще можно отдать как устаревшую
+                (по умолчанию self.max_stale)
+            
+        Returns:
+            CacheLookup или None, если записи нет или она старше ttl + max_stale
+        """
+        if not self.enabled:
+            return None
+        ttl = self.ttl if ttl is None else ttl
+        max_stale = self.max_stale if max_stale is None else max_stale
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry[1]
+                if age > entry[2]:
+                    self._remove(key)
+                    entry = None
+                elif age > ttl + max_stale:
+                    entry = None
+            if entry is None:
+                metrics.inc(f"{self.name}_misses")
+                return None
+            self._entries.move_to_end(key)
+        stale = age > ttl
+        metrics.inc(f"{self.name}_stale_hits" if stale else f"{self.name}_hits")
+        return CacheLookup(entry[0], age, stale)
+    
+    def set(self, key: Hashable, value: Any, retain: Optional[float] = None) -> None:
+        """
+        Сохраняет значение в кэш
+        
+        Args:
+            key: Ключ
+            value: Значение
+            retain: Сколько секунд хранить запись (по умолчанию ttl + max_stale)
+        """
+        if not self.enabled:
+            return
+        retain = self.ttl + self.max_stale if retain is None else retain
+        size = approximate_size(value) if self.max_bytes > 0 else 0
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes > 0 and size > self.max_bytes:
+                metrics.inc(f"{self.name}_too_large")
+                return
+            self._entries[key] = (value, time.monotonic(), retain, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes > 0 and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                metrics.inc(f"{self.name}_evictions")
+    
+    def _remove(self, key: Hashable) -> None:
+        """Удаляет запись (вызывается под self._lock)"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+    
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """
+        Удаляет записи из кэша
+        
+        Args:
+            predicate: Функция от ключа; если не указана, удаляются все записи
+            
+        Returns:
+            Количество удаленных записей
+        """
+        with self._lock:
+            if predicate is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+                return removed
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает размер кэша и счетчики попаданий/промахов"""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "max_stale": self.max_stale,
+            "hits": metrics.get(f"{self.name}_hits"),
+            "stale_hits": metrics.get(f"{self.name}_stale_hits"),
+            "misses": metrics.get(f"{self.name}_misses"),
+            "evictions": metrics.get(f"{self.name}_evictions"),
+        }
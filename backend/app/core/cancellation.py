@@ -0,0 +1,131 @@
+"""
+Отмена SQL-запросов брошенных HTTP-запросов
+
+QueryCancelScope собирает соединения, на которых сейчас выполняются запросы одного
+HTTP-запроса (см. query_connection в core/database.py). Когда клиент отключился,
+cancel() отправляет PostgreSQL отмену текущих запросов (connection.cancel()), а новые
+запросы этого scope сразу завершаются QueryCancelled - брошенный дашборд перестает
+занимать БД и соединения пула.
+"""
+import asyncio
+import contextlib
+import contextvars
+import threading
+from typing import Awaitable, Iterator, Optional, Set, TypeVar
+
+import psycopg2
+
+from .metrics import metrics
+
+
+T = TypeVar("T")
+
+
+class QueryCancelled(Exception):
+    """Запрос не выполнен: HTTP-запрос, которому он нужен, отменен"""
+
+
+class QueryCancelScope:
+    """Соединения с выполняющимися SQL-запросами одного HTTP-запроса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections: Set = set()
+        self.cancelled = False
+
+    def register(self, conn) -> None:
+        """
+        Соединение начинает запрос этого scope (вызывается в потоке БД)
+
+        Raises:
+            QueryCancelled: scope уже отменен
+        """
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled("Query cancelled: client disconnected")
+            self._connections.add(conn)
+
+    def unregister(self, conn) -> None:
+        with self._lock:
+            self._connections.discard(conn)
+
+    def cancel(self) -> int:
+        """
+        Отменяет выполняющиеся запросы и запрещает новые
+
+        Returns:
+            Количество соединений, которым отправлена отмена
+        """
+        with self._lock:
+            if self.cancelled:
+                return 0
+            self.cancelled = True
+            connections = list(self._connections)
+        cancelled = 0
+        for conn in connections:
+            try:
+                conn.cancel()
+                cancelled += 1
+            except psycopg2.Error as e:
+                print(f"⚠️ Could not cancel query: {e}")
+        if cancelled:
+            print(f"🛑 Cancelled {cancelled} running queries of an abandoned request")
+            metrics.inc("db_queries_cancelled", cancelled)
+        return cancelled
+
+
+# Scope текущей задачи (устанавливается в потоке секции, см. using_cancel_scope)
+_current_cancel_scope: contextvars.ContextVar[Optional[QueryCancelScope]] = contextvars.ContextVar(
+    "cancel_scope", default=None
+)
+
+
+@contextlib.contextmanager
+def using_cancel_scope(scope: Optional[QueryCancelScope]) -> Iterator[None]:
+    """Запросы внутри блока отменяются вместе со scope (None - не отменяются)"""
+    token = _current_cancel_scope.set(scope)
+    try:
+        yield
+    finally:
+        _current_cancel_scope.reset(token)
+
+
+def current_cancel_scope() -> Optional[QueryCancelScope]:
+    return _current_cancel_scope.get()
+
+
+class ClientDisconnected(Exception):
+    """Клиент закрыл соединение, не дождавшись ответа"""
+
+
+async def cancel_on_disconnect(request, awaitable: Awaitable[T]) -> T:
+    """
+    Ждет awaitable, пока клиент не отключился; при отключении отменяет его
+
+    Отключение определяется по сообщению http.disconnect от ASGI-сервера (без опроса).
+    Отмена доходит до вычисления (например, SingleFlight.run), которое отменяет свои SQL-запросы.
+
+    Raises:
+        ClientDisconnected: клиент отключился раньше, чем awaitable завершился
+    """
+    task = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    if not task.done():
+        task.cancel()
+        metrics.inc("http_requests_abandoned")
+        raise ClientDisconnected()
+    return task.result()
+
+
+async def _wait_for_disconnect(request) -> None:
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
@@ -0,0 +1,214 @@
+"""
+Сжатие ответов (brotli, gzip) с выбором по заголовку Accept-Encoding
+"""
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from .http_cache import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен - используем только gzip
+    brotli = None
+
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Разбирает Accept-Encoding в словарь {кодировка: q}
+
+    Args:
+        header: Значение заголовка, например "gzip, deflate, br;q=0.9"
+    """
+    result = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        result[name] = q
+    return result
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 - формат gzip
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware для сжатия ответов
+
+    Кодировка выбирается по Accept-Encoding клиента (brotli предпочтительнее gzip).
+    Тело сжимается по частям по мере отправки: сжатый ответ не накапливается целиком,
+    а потоковые ответы (NDJSON, SSE) доходят до клиента без задержки.
+    Ответы меньше minimum_size байт (если известен размер) не сжимаются.
+    К ETag сжатого ответа добавляется суффикс кодировки ("...-gzip"), чтобы разные
+    представления имели разные сильные ETag.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def _choose_encoding(self, scope) -> Optional[str]:
+        header = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                header = value.decode("latin-1")
+                break
+        accepted = parse_accept_encoding(header)
+
+        candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+        best, best_q = None, 0.0
+        for name in candidates:
+            q = accepted.get(name, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = name, q
+        return best
+
+    def create_encoder(self, encoding: str):
+        if encoding == "br":
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+
+class _CompressionResponder:
+    """Сжимает один ответ: перехватывает http.response.start и http.response.body"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self._start_message = None
+        self._encoder = None
+        self._passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self._start_message = message
+            if message["status"] == 304:
+                # Тела нет, но ETag должен совпадать с ETag сжатого представления
+                headers = self._headers_list(message)
+                self._rewrite_etag(headers)
+                self._start_message = {**message, "headers": headers}
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._start_message is not None:
+            start, self._start_message = self._start_message, None
+            await self._start(start, body, more_body)
+
+        if self._passthrough:
+            await self._send(message)
+            return
+
+        compressed = self._encoder.compress(body)
+        compressed += self._encoder.flush() if more_body else self._encoder.finish()
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    async def _start(self, message, body: bytes, more_body: bool) -> None:
+        """Решает, сжимать ли ответ, и отправляет заголовки"""
+        headers = self._headers_list(message)
+        header_map = {name.lower(): value for name, value in headers}
+        content_type = header_map.get(b"content-type", b"").decode("latin-1")
+        content_length = header_map.get(b"content-length")
+
+        size = int(content_length) if content_length is not None else (None if more_body else len(body))
+        if (
+            message["status"] in (204, 304)
+            or b"content-encoding" in header_map
+            or not content_type.startswith(COMPRESSIBLE_TYPES)
+            or (size is not None and size < self.middleware.minimum_size)
+        ):
+            self._passthrough = True
+            await self._send(message)
+            return
+
+        self._encoder = self.middleware.create_encoder(self.encoding)
+        headers = [(name, value) for name, value in headers if name.lower() != b"content-length"]
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        self._add_vary(headers)
+        self._rewrite_etag(headers)
+        await self._send({**message, "headers": headers})
+
+    def _headers_list(self, message) -> List[Tuple[bytes, bytes]]:
+        return [(bytes(name), bytes(value)) for name, value in message.get("headers", [])]
+
+    def _add_vary(self, headers: List[Tuple[bytes, bytes]]) -> None:
+        for index, (name, value) in enumerate(headers):
+            if name.lower() == b"vary":
+                if b"accept-encoding" not in value.lower():
+                    headers[index] = (name, value + b", Accept-Encoding")
+                return
+        headers.append((b"vary", b"Accept-Encoding"))
+
+    def _rewrite_etag(self, headers: List[Tuple[bytes, bytes]]) -> None:
+        for index, (name, value) in enumerate(headers):
+            if name.lower() == b"etag":
+                etag = encoded_etag(value.decode("latin-1"), self.encoding)
+                headers[index] = (name, etag.encode("latin-1"))
@@ -1,24 +1,68 @@
 """
 Подключение к базе данных
 """
+import asyncio
+import contextlib
+import contextvars
+import functools
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import psycopg2
+import psycopg2.extensions
 from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from .cancellation import current_cancel_scope
 from .config import settings
+from .metrics import metrics
+from .replicas import create_replica_router
 
 # Создаем engine для подключения к PostgreSQL
 engine = create_engine(
     settings.database_url,
     pool_pre_ping=True,  # Проверка соединения перед использованием
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
     echo=settings.DEBUG,  # Логирование SQL запросов в debug режиме
 )
 
-# Создаем фабрику сессий
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Реплики для аналитических запросов (None - все запросы на основной БД)
+replica_router = create_replica_router(engine)
+
+# Отдельный небольшой пул для служебных запросов (/api/health, вход и регистрация):
+# секции дашбордов занимают соединения engine, и служебные запросы не ждут их в очереди
+service_engine = create_engine(
+    settings.database_url,
+    pool_pre_ping=True,
+    pool_size=settings.DB_SERVICE_POOL_SIZE,
+    max_overflow=0,
+    echo=settings.DEBUG,
+)
+
+# Создаем фабрику сессий (пользователи, авторизация - на служебном пуле)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=service_engine)
 
 # Базовый класс для моделей
 Base = declarative_base()
 
+# Ограниченный пул потоков для синхронных SQL-запросов.
+# Запросы выполняются вне event loop, поэтому медленный дашборд одного пользователя
+# не блокирует остальные запросы (health, логин, дашборды других пользователей).
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_EXECUTOR_WORKERS,
+    thread_name_prefix="db-query",
+)
+
+# Потоки для служебных запросов: /api/health не стоит в очереди db_executor
+# за секциями дашбордов, которые могут выполняться до DASHBOARD_SECTION_TIMEOUT
+service_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_SERVICE_POOL_SIZE,
+    thread_name_prefix="db-service",
+)
+
 
 def get_db():
     """
@@ -34,7 +78,7 @@ def get_db():
 
 def execute_query(query: str, params: dict = None):
     """
-    Выполняет SQL запрос и возвращает результаты
+    Выполняет аналитический SQL запрос (на реплике, если они настроены) и возвращает результаты
     
     Args:
         query: SQL запрос
@@ -43,22 +87,441 @@ def execute_query(query: str, params: dict = None):
     Returns:
         Список словарей с результатами
     """
-    db = SessionLocal()
-    try:
-        result = db.execute(text(query), params or {})
+    return execute_rows(query, params).dicts()
+
+
+class QueryResult:
+    """
+    Результат запроса в колоночной форме: имена колонок один раз, строки - кортежи
+    
+    Строки не превращаются в словари: в кэше, в постоянном хранилище и при
+    сериализации ответа (см. core/serialization.py) используется эта же форма.
+    """
+    __slots__ = ("columns", "rows")
+    
+    def __init__(self, columns: List[str], rows: List[Sequence[Any]]):
+        self.columns = columns
+        self.rows = rows
+    
+    @classmethod
+    def from_dicts(cls, rows: List[Dict[str, Any]]) -> "QueryResult":
+        """Из списка словарей (прежний формат результатов секций)"""
+        columns = list(rows[0].keys()) if rows else []
+        return cls(columns, [tuple(row.values()) for row in rows])
+    
+    def dicts(self) -> List[Dict[str, Any]]:
+        """Строки словарями {колонка: значение}"""
+        return [dict(zip(self.columns, row)) for row in self.rows]
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def __bool__(self) -> bool:
+        return bool(self.rows)
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, QueryResult):
+            return NotImplemented
+        return self.columns == other.columns and list(map(tuple, self.rows)) == list(map(tuple, other.rows))
+    
+    def __repr__(self) -> str:
+        return f"QueryResult(columns={self.columns!r}, rows={len(self.rows)})"
+
+
+# NUMERIC -> float при чтении строк (вместо Decimal), регистрируется на курсоре
+DECIMAL_AS_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values,
+    "DECIMAL_AS_FLOAT",
+    lambda value, cursor: float(value) if value is not None else None,
+)
+
+# Строковые литералы, идентификаторы в кавычках и комментарии пропускаются, :: - приведение типа
+_PARAMETER_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|::|(?<![\w:]):(\w+)")
+
+
+def bind_parameters(query: str, placeholder: Callable[[str], str]) -> Tuple[str, List[str]]:
+    """
+    Заменяет параметры :name в тексте запроса
+    
+    Args:
+        query: SQL запрос с параметрами :name
+        placeholder: Функция имя параметра -> текст подстановки
         
-        # Преобразуем результат в список словарей
-        columns = result.keys()
-        rows = result.fetchall()
+    Returns:
+        Текст запроса и имена параметров в порядке первого появления
+    """
+    names: List[str] = []
+    
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name is None:
+            return match.group(0)
+        if name not in names:
+            names.append(name)
+        return placeholder(name)
+    
+    return _PARAMETER_PATTERN.sub(replace, query), names
+
+
+def fetch_result(cursor) -> QueryResult:
+    """Читает результат выполненного запроса с курсора psycopg2 в QueryResult"""
+    columns = [column.name for column in cursor.description]
+    return QueryResult(columns, cursor.fetchall())
+
+
+class QueryConnection:
+    """
+    Соединение для одного SQL-запроса (см. query_connection)
+    
+    prefix - команды, которые нужно отправить в одном обращении к серверу вместе с первой
+    командой запроса (начало снимка и SAVEPOINT в unit of work, SET LOCAL statement_timeout),
+    без отдельных round trip.
+    """
+    __slots__ = ("conn", "prefix", "unit_of_work", "local_settings")
+    
+    def __init__(self, conn, prefix: str = "", unit_of_work: Optional["UnitOfWork"] = None):
+        self.conn = conn
+        self.prefix = prefix
+        self.unit_of_work = unit_of_work
+        self.local_settings = ""
+    
+    def set_local(self, commands: str) -> None:
+        """SET LOCAL для запроса: отправляются с первой командой и заново после отката"""
+        self.local_settings = commands
+        self.prefix += commands
+    
+    def take_prefix(self) -> str:
+        """Префикс для первой команды (один раз)"""
+        prefix, self.prefix = self.prefix, ""
+        return prefix
+    
+    def rollback(self) -> None:
+        """Отменяет ошибку запроса: до SAVEPOINT в unit of work, иначе всю транзакцию"""
+        if self.unit_of_work is not None:
+            self.unit_of_work.rollback_query()
+        elif not self.conn.closed:
+            self.conn.rollback()
+        # Откат отменяет и SET LOCAL - повторная попытка запроса отправит их снова
+        self.prefix = self.local_settings
+
+
+class UnitOfWork:
+    """
+    Все SQL-запросы дашборда на одном соединении в одной транзакции
+    REPEATABLE READ READ ONLY: секции видят один и тот же снимок данных
+    
+    Соединение берется из пула при первом запросе (дашборд целиком из кэша не занимает
+    соединение). Запросы из потоков секций выполняются на нем по очереди (_lock). Каждый запрос
+    начинается с SAVEPOINT: ошибка или таймаут одной секции не прерывает транзакцию остальных.
+    Начало снимка и SAVEPOINT отправляются в одном обращении к серверу вместе с запросом.
+    
+    closed и признак выполняющегося запроса меняются только под _state_lock: соединение
+    возвращает в пул ровно одна сторона - close, если запроса нет, или поток запроса,
+    завершившийся после close.
+    """
+    SAVEPOINT = "dashboard_query"
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._conn = None
+        self._busy = False
+        self.closed = False
+    
+    def _connection(self) -> QueryConnection:
+        prefix = f"SAVEPOINT {self.SAVEPOINT}; "
+        if self._conn is None:
+            self._conn = read_connection()
+            # psycopg2 сам отправляет BEGIN перед первой командой
+            prefix = "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY; " + prefix
+            metrics.inc("unit_of_work_connections")
+        metrics.inc("unit_of_work_queries")
+        return QueryConnection(self._conn, prefix, self)
+    
+    def rollback_query(self) -> None:
+        """Откат неудачного запроса до его SAVEPOINT; если не удалось - unit of work закрывается"""
+        try:
+            with self._conn.cursor() as cursor:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {self.SAVEPOINT}")
+        except psycopg2.Error as e:
+            print(f"⚠️ Unit of work is broken, following queries use separate connections: {e}")
+            with self._state_lock:
+                self.closed = True
+    
+    def close(self) -> None:
+        """
+        Завершает транзакцию и возвращает соединение в пул
         
-        return [dict(zip(columns, row)) for row in rows]
+        Если запрос еще выполняется (секция не уложилась в таймаут), соединение
+        освободит поток этого запроса по завершении - close не ждет его.
+        """
+        with self._state_lock:
+            self.closed = True
+            conn = self._detach()
+        self._release(conn)
+    
+    def _begin_query(self) -> bool:
+        """Начало запроса потоком, получившим _lock: False - unit of work уже закрыт"""
+        with self._state_lock:
+            if self.closed:
+                return False
+            self._busy = True
+            return True
+    
+    def _end_query(self) -> None:
+        """Конец запроса: если unit of work закрыли во время запроса, соединение возвращает этот поток"""
+        with self._state_lock:
+            self._busy = False
+            conn = self._detach() if self.closed else None
+        self._release(conn)
+    
+    def _detach(self):
+        """Забирает соединение для возврата в пул, если его не использует запрос (под _state_lock)"""
+        if self._busy:
+            return None
+        conn, self._conn = self._conn, None
+        return conn
+    
+    @staticmethod
+    def _release(conn) -> None:
+        if conn is None:
+            return
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            pass
+        conn.close()
+
+
+class ConnectionWait:
+    """
+    Сколько поток секции ждал в очереди к соединению unit of work, секунды
+    
+    Пишется потоком секции (using_connection_wait), читается event loop: таймаут секции
+    отсчитывается без этого ожидания (см. DashboardService._await_section).
+    """
+    __slots__ = ("seconds", "queued_since")
+    
+    def __init__(self):
+        self.seconds = 0.0
+        self.queued_since: Optional[float] = None  # time.monotonic() начала текущего ожидания
+    
+    def total(self) -> float:
+        """Время ожидания с учетом текущего"""
+        queued_since = self.queued_since
+        current = time.monotonic() - queued_since if queued_since is not None else 0.0
+        return self.seconds + current
+    
+    @contextlib.contextmanager
+    def queued(self) -> Iterator[None]:
+        """Ожидание соединения внутри блока"""
+        self.queued_since = time.monotonic()
+        try:
+            yield
+        finally:
+            self.seconds += time.monotonic() - self.queued_since
+            self.queued_since = None
+
+
+# Учет ожидания соединения unit of work текущей задачей (None - не учитывается)
+_connection_wait: contextvars.ContextVar[Optional[ConnectionWait]] = contextvars.ContextVar(
+    "connection_wait", default=None
+)
+
+
+@contextlib.contextmanager
+def using_connection_wait(wait: Optional[ConnectionWait]) -> Iterator[None]:
+    """Ожидание соединения unit of work внутри блока суммируется в wait"""
+    token = _connection_wait.set(wait)
+    try:
+        yield
     finally:
-        db.close()
+        _connection_wait.reset(token)
+
+
+# Unit of work текущей задачи (устанавливается в потоке секции, см. using_unit_of_work)
+_current_unit_of_work: contextvars.ContextVar[Optional[UnitOfWork]] = contextvars.ContextVar(
+    "unit_of_work", default=None
+)
+
+
+@contextlib.contextmanager
+def using_unit_of_work(unit_of_work: Optional[UnitOfWork]) -> Iterator[None]:
+    """Запросы внутри блока выполняются в unit_of_work (None - каждый на своем соединении)"""
+    token = _current_unit_of_work.set(unit_of_work)
+    try:
+        yield
+    finally:
+        _current_unit_of_work.reset(token)
+
+
+# statement_timeout запросов текущей задачи, секунды (None - DB_STATEMENT_TIMEOUT)
+_statement_timeout: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "statement_timeout", default=None
+)
+
+
+@contextlib.contextmanager
+def using_statement_timeout(seconds: Optional[float]) -> Iterator[None]:
+    """Запросы внутри блока выполняются с SET LOCAL statement_timeout (0 - без ограничения)"""
+    token = _statement_timeout.set(seconds)
+    try:
+        yield
+    finally:
+        _statement_timeout.reset(token)
+
+
+def _local_settings() -> str:
+    seconds = _statement_timeout.get()
+    if seconds is None:
+        seconds = settings.DB_STATEMENT_TIMEOUT
+    if seconds <= 0:
+        return ""
+    return f"SET LOCAL statement_timeout = {max(1, round(seconds * 1000))}; "
+
+
+def read_connection():
+    """DBAPI-соединение для аналитического запроса: реплика или основная БД"""
+    if replica_router is not None:
+        return replica_router.raw_connection()
+    return engine.raw_connection()
+
+
+@contextlib.contextmanager
+def query_connection() -> Iterator[QueryConnection]:
+    """
+    Соединение psycopg2 для одного SQL-запроса: соединение текущего unit of work
+    или отдельное соединение из пула (возвращается в пул после запроса)
+    
+    Запрос выполняется с statement_timeout текущей задачи (using_statement_timeout) и
+    отменяется вместе с ее QueryCancelScope (core/cancellation.py). Ошибка соединения
+    с репликой исключает реплику из маршрутизации (см. core/replicas.py).
+    """
+    unit_of_work = _current_unit_of_work.get()
+    if unit_of_work is not None and not unit_of_work.closed:
+        wait = _connection_wait.get()
+        with wait.queued() if wait is not None else contextlib.nullcontext():
+            unit_of_work._lock.acquire()
+        try:
+            if unit_of_work._begin_query():
+                try:
+                    with _running_query(unit_of_work._connection()) as connection:
+                        yield connection
+                finally:
+                    unit_of_work._end_query()
+                return
+        finally:
+            unit_of_work._lock.release()
+    
+    conn = read_connection()
+    try:
+        with _running_query(QueryConnection(conn)) as connection:
+            yield connection
+    finally:
+        # Пул завершает транзакцию при возврате соединения (reset on return)
+        conn.close()
+
+
+@contextlib.contextmanager
+def _running_query(connection: QueryConnection) -> Iterator[QueryConnection]:
+    connection.set_local(_local_settings())
+    scope = current_cancel_scope()
+    if scope is not None:
+        scope.register(connection.conn)
+    try:
+        yield connection
+    except psycopg2.Error as e:
+        _report_error(connection.conn, e)
+        raise
+    finally:
+        if scope is not None:
+            scope.unregister(connection.conn)
+
+
+def _report_error(conn, error: psycopg2.Error) -> None:
+    if replica_router is not None:
+        replica_router.report_error(conn, error)
+
+
+def execute_rows(query: str, params: dict = None, decimal_as_float: bool = False) -> QueryResult:
+    """
+    Выполняет SQL запрос на соединении пула напрямую через psycopg2, без ORM Session
+    и без словаря на каждую строку
+    
+    Args:
+        query: SQL запрос с параметрами :name
+        params: Параметры для запроса (опционально)
+        decimal_as_float: Возвращать NUMERIC как float вместо Decimal
+        
+    Returns:
+        QueryResult: колонки и строки-кортежи
+    """
+    params = params or {}
+    statement, names = bind_parameters(query.replace("%", "%%"), lambda name: f"%({name})s")
+    with query_connection() as connection:
+        try:
+            with connection.conn.cursor() as cursor:
+                if decimal_as_float:
+                    psycopg2.extensions.register_type(DECIMAL_AS_FLOAT, cursor)
+                cursor.execute(connection.take_prefix() + statement, {name: params[name] for name in names})
+                return fetch_result(cursor)
+        except psycopg2.Error:
+            connection.rollback()
+            raise
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """
+    Выполняет синхронную функцию, работающую с БД, в пуле потоков db_executor
+    
+    Контекст (contextvars) текущей задачи передается в поток.
+    
+    Args:
+        func: Синхронная функция
+        *args, **kwargs: Аргументы функции
+        
+    Returns:
+        Результат функции
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(db_executor, call)
+
+
+async def run_in_service_executor(func, *args, **kwargs):
+    """
+    Выполняет синхронную служебную функцию (проверка БД и т.п.) в пуле потоков service_executor
+    
+    Args:
+        func: Синхронная функция, работающая с service_engine / SessionLocal
+        *args, **kwargs: Аргументы функции
+        
+    Returns:
+        Результат функции
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(service_executor, functools.partial(func, *args, **kwargs))
+
+
+async def execute_query_async(query: str, params: dict = None):
+    """
+    Асинхронный вариант execute_query: запрос выполняется в пуле потоков,
+    event loop в это время обслуживает другие запросы
+    
+    Args:
+        query: SQL запрос
+        params: Параметры для запроса (опционально)
+        
+    Returns:
+        Список словарей с результатами
+    """
+    return await run_in_db_executor(execute_query, query, params)
 
 
 def test_connection() -> bool:
     """
-    Проверяет подключение к базе данных
+    Проверяет подключение к базе данных (служебный пул соединений)
     
     Returns:
         True если подключение успешно, False иначе
@@ -0,0 +1,74 @@
+"""
+HTTP-кэширование ответов: ETag и условные запросы (If-None-Match)
+"""
+import hashlib
+from typing import Any, Optional
+
+from .serialization import dumps
+
+
+def compute_etag(content: Any, weak: bool = False) -> str:
+    """
+    Вычисляет ETag по содержимому ответа
+    
+    Args:
+        content: JSON-совместимые данные ответа
+        weak: Слабый ETag (W/"...") - content не совпадает с телом ответа байт в байт
+        
+    Returns:
+        ETag в кавычках, например "3f1a..." или W/"3f1a..."
+    """
+    # Колоночная форма дешевле и однозначно определяет данные (строки QueryResult без словарей)
+    etag = '"' + hashlib.sha256(dumps(content, columnar=True)).hexdigest()[:32] + '"'
+    return "W/" + etag if weak else etag
+
+
+# Суффиксы, которые CompressionMiddleware добавляет к ETag сжатого ответа
+ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    ETag сжатого представления: "abc" -> "abc-gzip"
+    
+    Args:
+        etag: ETag несжатого ответа
+        encoding: Content-Encoding (gzip, br)
+    """
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return etag
+
+
+def _strip_encoding(etag: str) -> str:
+    for suffix in ENCODING_SUFFIXES:
+        if etag.endswith(suffix + '"'):
+            return etag[:-len(suffix) - 1] + '"'
+    return etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Проверяет заголовок If-None-Match (слабое сравнение, RFC 9110)
+    
+    ETag сжатых представлений (с суффиксом кодировки) считаются той же версией данных.
+    
+    Args:
+        if_none_match: Значение заголовка If-None-Match
+        etag: Текущий ETag ресурса
+        
+    Returns:
+        True, если у клиента актуальная версия и можно ответить 304
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if _strip_encoding(candidate) == current:
+            return True
+    return False
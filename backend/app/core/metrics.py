@@ -0,0 +1,40 @@
+"""
+Простые счетчики метрик приложения (доступны через /api/metrics)
+"""
+import threading
+from typing import Callable, Dict
+
+
+class Metrics:
+    """Потокобезопасный реестр счетчиков и вычисляемых показателей"""
+    
+    def __init__(self):
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, name: str, value: float = 1) -> None:
+        """Увеличивает счетчик name на value"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+    
+    def get(self, name: str) -> float:
+        """Возвращает текущее значение счетчика"""
+        with self._lock:
+            return self._counters.get(name, 0)
+    
+    def register_gauge(self, name: str, func: Callable[[], float]) -> None:
+        """Регистрирует показатель, который вычисляется в момент запроса метрик"""
+        self._gauges[name] = func
+    
+    def snapshot(self) -> Dict[str, float]:
+        """Возвращает значения всех счетчиков и показателей"""
+        with self._lock:
+            result = dict(self._counters)
+        for name, func in self._gauges.items():
+            result[name] = func()
+        return result
+
+
+# Создаем singleton экземпляр реестра метрик
+metrics = Metrics()
@@ -0,0 +1,146 @@
+"""
+Серверные prepared statements для фиксированных SQL-запросов дашборда
+
+Запрос с параметрами :name регистрируется на соединении один раз (PREPARE) и дальше
+выполняется через EXECUTE: PostgreSQL не разбирает большой CTE заново при каждом вызове.
+Планирование выполняется при EXECUTE; общий (generic) план может переиспользоваться
+только после пяти выполнений, если он не хуже планов под конкретные параметры.
+"""
+import datetime
+import hashlib
+import time
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from .config import settings
+from .database import DECIMAL_AS_FLOAT, QueryConnection, QueryResult, bind_parameters, execute_rows, fetch_result, query_connection
+from .metrics import metrics
+
+
+# Ключ в info соединения пула (живет столько же, сколько DBAPI-соединение):
+# имена prepared statements, подготовленных на соединении
+CONNECTION_INFO_KEY = "prepared_statements"
+
+# SQLSTATE PostgreSQL
+INVALID_SQL_STATEMENT_NAME = "26000"  # prepared statement не существует (соединение сменилось)
+DUPLICATE_PREPARED_STATEMENT = "42P05"  # prepared statement уже существует
+
+# Типы параметров PREPARE по типам значений Python (bool проверяется раньше int)
+_PARAMETER_TYPES = (
+    (bool, "boolean"),
+    (int, "bigint"),
+    (float, "double precision"),
+    (Decimal, "numeric"),
+    (datetime.datetime, "timestamp"),
+    (datetime.date, "date"),
+    (str, "text"),
+)
+
+
+def convert_parameters(query: str) -> Tuple[str, List[str]]:
+    """
+    Заменяет параметры :name на $1, $2, ... для PREPARE
+
+    Returns:
+        Текст запроса и имена параметров в порядке номеров
+    """
+    numbers = {}
+
+    def placeholder(name: str) -> str:
+        numbers.setdefault(name, len(numbers) + 1)
+        return f"${numbers[name]}"
+
+    return bind_parameters(query, placeholder)
+
+
+def _parameter_type(value: Any) -> Optional[str]:
+    for python_type, sql_type in _PARAMETER_TYPES:
+        if isinstance(value, python_type):
+            return sql_type
+    return None
+
+
+def _statement_name(query: str, types: List[str]) -> str:
+    digest = hashlib.sha1("\0".join([query, *types]).encode("utf-8")).hexdigest()
+    return f"dash_{digest[:20]}"
+
+
+def execute_prepared(query: str, params: dict = None, decimal_as_float: bool = False) -> QueryResult:
+    """
+    Выполняет запрос как prepared statement и возвращает результаты (как execute_rows)
+
+    При DB_PREPARED_STATEMENTS=false, пуле pgbouncer в режиме transaction
+    (DB_POOL_MODE=transaction) или параметрах, тип которых нельзя определить (None),
+    запрос выполняется обычным execute_rows.
+
+    Args:
+        query: SQL запрос с параметрами :name
+        params: Параметры для запроса (опционально)
+        decimal_as_float: Возвращать NUMERIC как float вместо Decimal
+
+    Returns:
+        QueryResult: колонки и строки-кортежи
+    """
+    params = params or {}
+    if not settings.DB_PREPARED_STATEMENTS or settings.DB_POOL_MODE == "transaction":
+        return execute_rows(query, params, decimal_as_float)
+
+    prepared_query, names = convert_parameters(query)
+    types = [_parameter_type(params.get(name)) for name in names]
+    if None in types:
+        metrics.inc("prepared_statements_skipped")
+        return execute_rows(query, params, decimal_as_float)
+
+    name = _statement_name(prepared_query, types)
+    execute = f"EXECUTE {name}" + (
+        "(" + ", ".join(f"%({parameter})s" for parameter in names) + ")" if names else ""
+    )
+    arguments = {parameter: params[parameter] for parameter in names} or None
+
+    # Соединение psycopg2 (текст PREPARE передается без подстановки параметров)
+    with query_connection() as connection:
+        prepared = connection.conn.info.setdefault(CONNECTION_INFO_KEY, set())
+        for attempt in range(2):
+            try:
+                with connection.conn.cursor() as cursor:
+                    if decimal_as_float:
+                        psycopg2.extensions.register_type(DECIMAL_AS_FLOAT, cursor)
+                    if name in prepared:
+                        metrics.inc("prepared_statements_reused")
+                    else:
+                        _prepare(connection, cursor, name, types, prepared_query)
+                        prepared.add(name)
+                    cursor.execute(connection.take_prefix() + execute, arguments)
+                    return fetch_result(cursor)
+            except psycopg2.Error as e:
+                connection.rollback()
+                if attempt or e.pgcode != INVALID_SQL_STATEMENT_NAME:
+                    raise
+                # Соединение с сервером сменилось (например, за pgbouncer) - готовим заново
+                print(f"⚠️ Prepared statement {name} not found on connection, preparing again")
+                metrics.inc("prepared_statements_lost")
+                prepared.clear()
+
+
+def _prepare(connection: QueryConnection, cursor, name: str, types: List[str], prepared_query: str) -> None:
+    """
+    PREPARE на соединении
+
+    Время PREPARE с обращением к серверу суммируется в prepared_statements_prepare_roundtrip_ms.
+    Это не сэкономленное время планирования: PostgreSQL планирует запрос при EXECUTE,
+    время планирования - в EXPLAIN (Planning Time) или pg_stat_statements.total_plan_time.
+    """
+    statement = f"PREPARE {name}" + (f" ({', '.join(types)})" if types else "") + f" AS {prepared_query}"
+    started = time.perf_counter()
+    try:
+        cursor.execute(connection.take_prefix() + statement)
+    except psycopg2.Error as e:
+        if e.pgcode != DUPLICATE_PREPARED_STATEMENT:
+            raise
+        # Уже подготовлен на этом серверном соединении (например, другим клиентом pgbouncer)
+        connection.rollback()
+    metrics.inc("prepared_statements_prepare_roundtrip_ms", (time.perf_counter() - started) * 1000)
+    metrics.inc("prepared_statements_prepared")
@@ -0,0 +1,170 @@
+"""
+Маршрутизация аналитических запросов на реплики PostgreSQL
+
+Запросы дашборда (execute_query, execute_rows, execute_prepared) читают с реплик по
+очереди (round-robin). Реплика, к которой не удалось подключиться, исключается на
+DB_REPLICA_EJECT_SECONDS; реплика, отставшая больше DB_REPLICA_MAX_LAG секунд,
+пропускается до следующей проверки отставания. Если подходящих реплик нет, запрос
+выполняется на основной БД. Запись (таблица users, кэш закрытых периодов, обновление
+представлений) всегда идет через основной engine.
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+
+import psycopg2
+from sqlalchemy import create_engine
+
+from .config import settings
+from .metrics import metrics
+
+
+# Отставание реплики в секундах: 0, если все полученные WAL уже применены
+# (иначе на простаивающей основной БД время последней транзакции выглядело бы как отставание)
+LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+# Ключ в info DBAPI-соединения: имя реплики, которой принадлежит соединение
+CONNECTION_INFO_KEY = "replica"
+
+
+class Replica:
+    """Реплика: свой пул соединений и состояние доступности"""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_engine(
+            url,
+            pool_pre_ping=True,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+        self.ejected_until = 0.0
+        self.lag: Optional[float] = None
+        self.lag_checked_at = 0.0
+
+    def available(self, now: float) -> bool:
+        """Не исключена и не отстает (по последней проверке)"""
+        if now < self.ejected_until:
+            return False
+        return self.lag is None or self.lag <= settings.DB_REPLICA_MAX_LAG or self.lag_check_due(now)
+
+    def lag_check_due(self, now: float) -> bool:
+        return now - self.lag_checked_at >= settings.DB_REPLICA_LAG_CHECK_INTERVAL
+
+    def check_lag(self, conn, now: float) -> float:
+        """Измеряет отставание на только что взятом соединении и завершает транзакцию проверки"""
+        with conn.cursor() as cursor:
+            cursor.execute(LAG_QUERY)
+            self.lag = float(cursor.fetchone()[0])
+        # Следующий запрос (например, SET TRANSACTION unit of work) должен начать новую транзакцию
+        conn.rollback()
+        self.lag_checked_at = now
+        return self.lag
+
+    def status(self, now: float) -> Dict:
+        return {
+            "name": self.name,
+            "available": self.available(now),
+            "ejected_for": max(0.0, round(self.ejected_until - now, 1)),
+            "lag": self.lag,
+        }
+
+
+class ReplicaRouter:
+    """
+    Выбор соединения для аналитического запроса: реплика по round-robin или основная БД
+
+    Args:
+        primary: Engine основной БД (запасной вариант)
+        urls: DSN реплик
+    """
+
+    def __init__(self, primary, urls: List[str]):
+        self.primary = primary
+        self.replicas = [Replica(f"replica{index + 1}", url) for index, url in enumerate(urls)]
+        self._next = 0
+        self._lock = threading.Lock()
+        metrics.register_gauge("replicas_available", self.available_count)
+
+    def available_count(self) -> int:
+        now = time.monotonic()
+        return sum(replica.available(now) for replica in self.replicas)
+
+    def _candidates(self) -> List[Replica]:
+        """Доступные реплики, начиная со следующей по очереди"""
+        with self._lock:
+            start = self._next
+            self._next = (start + 1) % len(self.replicas)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        now = time.monotonic()
+        return [replica for replica in ordered if replica.available(now)]
+
+    def raw_connection(self):
+        """
+        DBAPI-соединение для аналитического запроса (возвращается в пул через close())
+
+        Отставание реплики проверяется на взятом соединении не чаще раза в
+        DB_REPLICA_LAG_CHECK_INTERVAL секунд.
+        """
+        for replica in self._candidates():
+            try:
+                conn = replica.engine.raw_connection()
+            except psycopg2.Error as e:
+                self.eject(replica, e)
+                continue
+            now = time.monotonic()
+            if replica.lag_check_due(now):
+                try:
+                    lag = replica.check_lag(conn, now)
+                except psycopg2.Error as e:
+                    conn.close()
+                    self.eject(replica, e)
+                    continue
+                if lag > settings.DB_REPLICA_MAX_LAG:
+                    conn.close()
+                    print(f"⚠️ {replica.name} lags {lag:.1f}s behind primary, skipping")
+                    metrics.inc("replica_lagging")
+                    continue
+            conn.info[CONNECTION_INFO_KEY] = replica.name
+            metrics.inc("replica_queries")
+            return conn
+
+        metrics.inc("replica_fallbacks")
+        return self.primary.raw_connection()
+
+    def eject(self, replica: Replica, error: Exception) -> None:
+        """Исключает реплику на DB_REPLICA_EJECT_SECONDS"""
+        replica.ejected_until = time.monotonic() + settings.DB_REPLICA_EJECT_SECONDS
+        print(f"⚠️ {replica.name} ejected for {settings.DB_REPLICA_EJECT_SECONDS:.0f}s: {error}")
+        metrics.inc("replica_ejections")
+
+    def report_error(self, conn, error: Exception) -> None:
+        """
+        Ошибка запроса на соединении: реплика исключается, если соединение с ней потеряно;
+        ошибки самого запроса (в том числе отмена по statement_timeout) на доступность не влияют
+        """
+        name = conn.info.get(CONNECTION_INFO_KEY)
+        if name is None or not conn.closed:
+            return
+        for replica in self.replicas:
+            if replica.name == name:
+                self.eject(replica, error)
+
+    def status(self) -> List[Dict]:
+        """Состояние реплик (для /api/health)"""
+        now = time.monotonic()
+        return [replica.status(now) for replica in self.replicas]
+
+
+def create_replica_router(primary) -> Optional[ReplicaRouter]:
+    """Маршрутизатор по DB_REPLICA_URLS или None, если реплики не настроены"""
+    urls = settings.db_replica_urls_list
+    if not urls:
+        return None
+    print(f"📚 Analytic queries use {len(urls)} read replica(s)")
+    return ReplicaRouter(primary, urls)
@@ -0,0 +1,59 @@
+"""
+Быстрая JSON-сериализация ответов (orjson) без повторной валидации Pydantic
+"""
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import Response
+
+from .database import QueryResult
+
+
+def _default(value: Any) -> Any:
+    """Типы, которые orjson не сериализует сам (datetime и date он сериализует в ISO 8601)"""
+    if isinstance(value, Decimal):
+        # Как и Pydantic в режиме JSON - строкой, без потери точности
+        return str(value)
+    if isinstance(value, QueryResult):
+        # Строки результата - объектами {колонка: значение}
+        return value.dicts()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _default_columnar(value: Any) -> Any:
+    """Как _default, но строки QueryResult - массивами значений (колонки передаются отдельно)"""
+    if isinstance(value, QueryResult):
+        return value.rows
+    return _default(value)
+
+
+def dumps(content: Any, columnar: bool = False) -> bytes:
+    """
+    Сериализует данные в JSON (UTF-8)
+    
+    Args:
+        content: Словари/списки со строками БД (Decimal, datetime, date, QueryResult и т.п.)
+        columnar: Строки QueryResult - массивами значений, без словаря на каждую строку
+        
+    Returns:
+        JSON в байтах
+    """
+    return orjson.dumps(content, default=_default_columnar if columnar else _default)
+
+
+class FastJSONResponse(Response):
+    """
+    JSON-ответ через orjson
+    
+    Содержимое не проходит через response_model: данные должны быть уже в форме схемы
+    (см. DashboardService._build_item).
+    """
+    media_type = "application/json"
+    
+    def __init__(self, content: Any, columnar: bool = False, **kwargs):
+        self.columnar = columnar
+        super().__init__(content, **kwargs)
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content, columnar=self.columnar)
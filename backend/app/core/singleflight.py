@@ -0,0 +1,62 @@
+"""
+Объединение одинаковых одновременных вычислений (single-flight)
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from .metrics import metrics
+
+
+class SingleFlight:
+    """
+    Пока вычисление с ключом key выполняется, повторные вызовы с тем же ключом
+    не запускают его заново, а ждут результат первого.
+    
+    Количество объединенных вызовов считается в metrics как <name>_coalesced.
+    Вычисление отменяется, только когда отменены все ожидающие его вызовы
+    (<name>_abandoned): например, все клиенты закрыли вкладку.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        # Сколько вызовов ждут вычисление: future вычисления -> количество
+        self._waiters: Dict[asyncio.Future, int] = {}
+        metrics.register_gauge(f"{name}_in_flight", lambda: len(self._calls))
+    
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет func() или присоединяется к уже идущему вычислению с тем же ключом
+        
+        Args:
+            key: Ключ вычисления
+            func: Функция без аргументов, возвращающая корутину
+            
+        Returns:
+            Результат вычисления (общий для всех объединенных вызовов)
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            metrics.inc(f"{self.name}_coalesced")
+        else:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        
+        # shield: отмена одного из ожидающих не отменяет общее вычисление, пока его ждут другие
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if self._waiters[future] == 1 and not future.done():
+                future.cancel()
+                metrics.inc(f"{self.name}_abandoned")
+            raise
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+    
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
@@ -1,13 +1,19 @@
 """
 Главный файл FastAPI приложения
 """
-from fastapi import FastAPI
+import asyncio
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from .core.config import settings
-from .core.database import test_connection
+from .core.compression import CompressionMiddleware
+from .core.database import test_connection, run_in_service_executor, db_executor, service_executor, replica_router
+from .core.metrics import metrics
 from .api import auth, dashboard
+from .api.auth import get_current_admin
+from .services.monthly_rollups import monthly_rollups
+from .services.source_views import source_views
 
 # Создаем FastAPI приложение
 app = FastAPI(
@@ -38,6 +44,15 @@ else:
         allow_headers=["*"],
     )
 
+# Сжатие ответов (важно, когда backend работает без nginx: Render, Railway)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
 # Подключаем роутеры
 app.include_router(auth.router, prefix="/api")
 app.include_router(dashboard.router, prefix="/api")
@@ -55,14 +70,23 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    """Проверка здоровья сервиса"""
-    db_status = test_connection()
+    """Проверка здоровья сервиса (служебные пул потоков и соединения - не ждет секции дашбордов)"""
+    db_status = await run_in_service_executor(test_connection)
     
-    return {
+    result = {
         "status": "healthy" if db_status else "unhealthy",
         "database": "connected" if db_status else "disconnected",
         "service": settings.APP_NAME
     }
+    if replica_router is not None:
+        result["replicas"] = replica_router.status()
+    return result
+
+
+@app.get("/api/metrics")
+async def get_metrics(current_user: dict = Depends(get_current_admin)):
+    """Счетчики производительности: кэш дашбордов, время секций, реплики (только для администраторов)"""
+    return metrics.snapshot()
 
 
 @app.on_event("startup")
@@ -73,16 +97,39 @@ async def startup_event():
     print(f"🔗 Planfix API: {settings.PLANFIX_API_URL}")
     
     # Проверяем подключение к базе данных
-    if test_connection():
+    if await run_in_service_executor(test_connection):
         print("✅ Database connection successful")
     else:
         print("❌ Database connection failed")
+    
+    # Периодическое обновление единых представлений (если не настроен внешний refresh_views.py)
+    if settings.DASHBOARD_UNIFIED_VIEWS and settings.DASHBOARD_VIEWS_REFRESH_INTERVAL <= 0:
+        print("⚠️ DASHBOARD_UNIFIED_VIEWS=true without DASHBOARD_VIEWS_REFRESH_INTERVAL: "
+              "views are refreshed only by refresh_views.py, dashboards show data as of the last refresh")
+    if settings.DASHBOARD_VIEWS_REFRESH_INTERVAL > 0:
+        app.state.views_refresh_task = asyncio.create_task(
+            source_views.refresh_periodically(settings.DASHBOARD_VIEWS_REFRESH_INTERVAL)
+        )
+    
+    # Периодическое обновление помесячных агрегатов (если не настроен внешний refresh_rollups.py)
+    if settings.DASHBOARD_ROLLUPS_REFRESH_INTERVAL > 0:
+        app.state.rollups_refresh_task = asyncio.create_task(
+            monthly_rollups.refresh_periodically(
+                settings.DASHBOARD_ROLLUPS_REFRESH_INTERVAL, settings.DASHBOARD_ROLLUPS_FULL_REFRESH_INTERVAL
+            )
+        )
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Событие при остановке приложения"""
     print(f"👋 Shutting down {settings.APP_NAME}...")
+    for name in ("views_refresh_task", "rollups_refresh_task"):
+        refresh_task = getattr(app.state, name, None)
+        if refresh_task:
+            refresh_task.cancel()
+    db_executor.shutdown(wait=False)
+    service_executor.shutdown(wait=False)
 
 
 # Обработчик ошибок
@@ -2,7 +2,7 @@
 Pydantic схемы для валидации данных
 """
 from pydantic import BaseModel, EmailStr
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 
 
 class LoginRequest(BaseModel):
@@ -39,15 +39,27 @@ class DashboardItem(BaseModel):
     id: str
     title: str
     description: Optional[str] = None
-    data: List[Dict[str, Any]]
+    data: List[Union[Dict[str, Any], List[Any]]]  # Строки-объекты или массивы значений (format=columnar)
     columns: List[str]
-    details: Optional[List[Dict[str, Any]]] = None  # Для детализации (например, список задач)
+    details: Optional[List[Union[Dict[str, Any], List[Any]]]] = None  # Для детализации (например, список задач)
+    details_columns: Optional[List[str]] = None  # Колонки детализации
+    age_seconds: Optional[float] = None  # Возраст данных, если они взяты из кэша
+    stale: bool = False  # Данные устарели и обновляются в фоне
+
+
+class DashboardSectionError(BaseModel):
+    """Секция дашборда, которую не удалось вычислить"""
+    id: str
+    title: str
+    reason: str  # "timeout" или "error"
+    detail: Optional[str] = None
 
 
 class DashboardResponse(BaseModel):
     """Ответ с данными дашборда"""
     user_name: str
     items: List[DashboardItem]
+    failed_sections: List[DashboardSectionError] = []
 
 
 class ErrorResponse(BaseModel):
@@ -0,0 +1,122 @@
+"""
+Постоянное хранилище результатов секций дашборда за закрытые финансовые годы
+"""
+import datetime
+import json
+from decimal import Decimal
+from typing import Any, Optional
+
+from sqlalchemy import text
+
+from ..core.database import QueryResult, engine
+
+
+def _encode_value(value: Any) -> Any:
+    """Кодирует значения, которых нет в JSON, так чтобы их можно было восстановить"""
+    if isinstance(value, QueryResult):
+        return {"$rows": {"columns": value.columns, "rows": value.rows}}
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+    if isinstance(value, datetime.datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_value(obj: dict) -> Any:
+    if len(obj) == 1:
+        if "$decimal" in obj:
+            return Decimal(obj["$decimal"])
+        if "$datetime" in obj:
+            return datetime.datetime.fromisoformat(obj["$datetime"])
+        if "$date" in obj:
+            return datetime.date.fromisoformat(obj["$date"])
+        if "$rows" in obj:
+            return QueryResult(obj["$rows"]["columns"], obj["$rows"]["rows"])
+    return obj
+
+
+def _upgrade(result: Any) -> Any:
+    """Результаты, сохраненные до QueryResult (списки словарей), в колоночную форму"""
+    if isinstance(result, list):
+        return QueryResult.from_dicts(result)
+    if isinstance(result, dict):
+        return {key: _upgrade(value) for key, value in result.items()}
+    return result
+
+
+class ClosedPeriodStore:
+    """
+    Результаты секций за закрытые финансовые годы в таблице dashboard_closed_period_cache
+    (migrations/002_create_dashboard_closed_period_cache.sql)
+    
+    Ключ: (ФИО, id секции, начало финансового года). Записи не устаревают -
+    удаляются только явно (invalidate), например после догрузки данных.
+    """
+    
+    def get(self, user_name: str, section_id: str, period_start: datetime.date) -> Optional[Any]:
+        """
+        Возвращает сохраненный результат секции
+        
+        Returns:
+            Результат секции или None, если его нет
+        """
+        with engine.connect() as conn:
+            row = conn.execute(
+                text("""
+                SELECT payload FROM dashboard_closed_period_cache
+                WHERE user_name = :user_name
+                  AND section_id = :section_id
+                  AND period_start = :period_start
+                """),
+                {"user_name": user_name, "section_id": section_id, "period_start": period_start}
+            ).fetchone()
+        if row is None:
+            return None
+        return _upgrade(json.loads(row[0], object_hook=_decode_value))
+    
+    def put(self, user_name: str, section_id: str, period_start: datetime.date, result: Any) -> None:
+        """Сохраняет результат секции за закрытый период"""
+        payload = json.dumps(result, default=_encode_value, ensure_ascii=False)
+        with engine.begin() as conn:
+            conn.execute(
+                text("""
+                INSERT INTO dashboard_closed_period_cache (user_name, section_id, period_start, payload)
+                VALUES (:user_name, :section_id, :period_start, :payload)
+                ON CONFLICT (user_name, section_id, period_start)
+                DO UPDATE SET payload = EXCLUDED.payload, computed_at = CURRENT_TIMESTAMP
+                """),
+                {
+                    "user_name": user_name,
+                    "section_id": section_id,
+                    "period_start": period_start,
+                    "payload": payload,
+                }
+            )
+    
+    def invalidate(self, user_name: Optional[str] = None, period_start: Optional[datetime.date] = None) -> int:
+        """
+        Удаляет сохраненные результаты
+        
+        Args:
+            user_name: ФИО пользователя (по умолчанию - все пользователи)
+            period_start: Начало финансового года (по умолчанию - все периоды)
+            
+        Returns:
+            Количество удаленных записей
+        """
+        with engine.begin() as conn:
+            result = conn.execute(
+                text("""
+                DELETE FROM dashboard_closed_period_cache
+                WHERE (CAST(:user_name AS VARCHAR) IS NULL OR user_name = :user_name)
+                  AND (CAST(:period_start AS DATE) IS NULL OR period_start = :period_start)
+                """),
+                {"user_name": user_name, "period_start": period_start}
+            )
+            return result.rowcount
+
+
+# Создаем singleton экземпляр хранилища
+closed_period_store = ClosedPeriodStore()
@@ -0,0 +1,146 @@
+"""
+Реестр секций дашборда
+
+Каждая секция объявляет свой loader (метод DashboardService с SQL-запросами секции),
+параметры запроса, от которых зависит, источники данных и политику кэша. По реестру
+DashboardService собирает секции запроса: аргументы loader'а, ключ кэша, хранение
+закрытых периодов и общее чтение источников (shared scan).
+"""
+from typing import List, NamedTuple, Optional, Tuple
+
+
+class SectionSpec(NamedTuple):
+    """Описание секции дашборда"""
+    id: str
+    title: str
+    description: str
+    # Метод DashboardService, выполняющий SQL секции: loader(ФИО, *параметры params)
+    loader: str
+    # Параметры loader'а в порядке аргументов: fiscal_year и order_status из запроса,
+    # periods - границы периодов выбранного года. От fiscal_year и order_status
+    # зависит ключ кэша
+    params: Tuple[str, ...] = ()
+    # Сущности-источники (proscheti, obrazci, proizv): секции с общими источниками
+    # читают их один раз на запрос (shared_loader, DASHBOARD_SHARED_SCAN)
+    sources: Tuple[str, ...] = ()
+    # Метод DashboardService, вычисляющий секцию из общего чтения источников
+    shared_loader: Optional[str] = None
+    # Политика кэша: TTL и время отдачи устаревшего результата, секунды
+    # (None - DASHBOARD_CACHE_TTL / DASHBOARD_CACHE_MAX_STALE; переопределяются
+    # DASHBOARD_SECTION_TTLS / DASHBOARD_SECTION_MAX_STALE)
+    ttl: Optional[float] = None
+    max_stale: Optional[float] = None
+    # Результат за закрытый финансовый год хранится в БД (DASHBOARD_CLOSED_PERIOD_CACHE).
+    # Только для секций, которые зависят лишь от дат внутри года: секция с текущими
+    # статусами (заказы клиентов) меняется и после закрытия года
+    closed_period: bool = False
+    # Потоковая выдача отдает секцию первой
+    streamed_first: bool = False
+
+
+# Секции в порядке отображения
+SECTIONS: Tuple[SectionSpec, ...] = (
+    # 1. Просроченные задачи (самое важное - показываем первым!)
+    SectionSpec(
+        id="overdue_tasks",
+        title="⚠️ Просроченные задачи",
+        description="Количество и среднее время просрочки по категориям",
+        loader="_get_overdue_tasks_data",
+        sources=("proscheti", "obrazci", "proizv"),
+        shared_loader="_overdue_tasks_from_scan",
+        max_stale=60,
+        streamed_first=True,
+    ),
+    # 2. Ждем ответа от продаж (задачи со статусом "Нужно прикрепить документы")
+    SectionSpec(
+        id="waiting_sales",
+        title="⏳ Ждем ответа от продаж",
+        description="Задачи, требующие документов от продаж",
+        loader="_get_waiting_sales_data",
+        sources=("proscheti", "obrazci", "proizv"),
+        shared_loader="_waiting_sales_from_scan",
+        max_stale=60,
+    ),
+    # 3. Конверсии КП в образцы
+    SectionSpec(
+        id="conversions",
+        title="Конверсии КП в образцы",
+        description="Показатели конверсии коммерческих предложений в образцы по периодам",
+        loader="_get_conversions_data",
+        params=("fiscal_year", "periods"),
+        sources=("proscheti", "obrazci"),
+        shared_loader="_conversions_from_scan",
+    ),
+    # 4. Конверсии КП в производство
+    SectionSpec(
+        id="production_conversions",
+        title="Конверсии КП в производство",
+        description="Показатели конверсии коммерческих предложений в производство по периодам",
+        loader="_get_production_conversions_data",
+        params=("fiscal_year", "periods"),
+        sources=("proscheti", "proizv"),
+        shared_loader="_production_conversions_from_scan",
+    ),
+    # 5. Среднее время согласования КП по месяцам (всегда текущий финансовый год)
+    SectionSpec(
+        id="approval_time",
+        title="Среднее время согласования КП",
+        description="Среднее количество дней на согласование КП по месяцам текущего года",
+        loader="_get_approval_time_data",
+        params=("periods",),
+        sources=("proscheti",),
+        max_stale=3600,
+    ),
+    # 6. Среднее время принятия производства по месяцам
+    SectionSpec(
+        id="production_acceptance_time",
+        title="Среднее время принятия производства",
+        description="Среднее количество дней на принятие производства по месяцам финансового года",
+        loader="_get_production_acceptance_time_data",
+        params=("fiscal_year", "periods"),
+        sources=("proizv",),
+        max_stale=3600,
+        closed_period=True,
+    ),
+    # 7. Заказы от клиентов по финансовому году
+    SectionSpec(
+        id="client_orders",
+        title="Заказы от клиентов",
+        description="Количество заказов от клиентов за финансовый год",
+        loader="_get_client_orders_data",
+        params=("fiscal_year", "order_status", "periods"),
+        sources=("proizv",),
+        shared_loader="_client_orders_from_scan",
+    ),
+)
+
+SECTION_IDS = tuple(spec.id for spec in SECTIONS)
+
+
+def parse_sections(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    id секций из параметра ?sections= ("client_orders,conversions")
+
+    Returns:
+        id секций в порядке реестра или None (все секции), если параметр пуст
+
+    Raises:
+        ValueError: неизвестный id секции
+    """
+    if not value:
+        return None
+    requested = {section_id.strip() for section_id in value.split(",") if section_id.strip()}
+    if not requested:
+        return None
+    unknown = sorted(requested - set(SECTION_IDS))
+    if unknown:
+        raise ValueError(f"Unknown dashboard sections: {', '.join(unknown)}. Available: {', '.join(SECTION_IDS)}")
+    return tuple(section_id for section_id in SECTION_IDS if section_id in requested)
+
+
+def select_sections(section_ids: Optional[Tuple[str, ...]] = None) -> List[Tuple[int, SectionSpec]]:
+    """(позиция в реестре, секция) для запрошенных id или для всех секций"""
+    return [
+        (position, spec) for position, spec in enumerate(SECTIONS)
+        if section_ids is None or spec.id in section_ids
+    ]
@@ -1,617 +1,817 @@
 """
 Сервис для работы с дашбордами и SQL-запросами
 """
-from typing import List, Dict, Any
-from ..core.database import execute_query
+import asyncio
+import datetime
+import itertools
+import operator
+import traceback
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+from psycopg2.errors import QueryCanceled
+from ..core.cache import TTLCache
+from ..core.cancellation import QueryCancelScope, using_cancel_scope
+from ..core.config import settings
+from ..core.database import (
+    ConnectionWait, QueryResult, UnitOfWork, execute_query, run_in_db_executor,
+    using_connection_wait, using_statement_timeout, using_unit_of_work
+)
+from ..core.metrics import metrics
+from ..core.prepared_statements import execute_prepared
+from ..core.singleflight import SingleFlight
+from .closed_period_store import closed_period_store
+from .dashboard_sections import select_sections
+from .fiscal_calendar import FiscalPeriods, fiscal_calendar
+from .monthly_rollups import monthly_rollups
+from .shared_scan import SharedScan
+from .source_views import source_views, using_base_tables
+
+
+# Категории просроченных задач в порядке сводки
+OVERDUE_CATEGORIES = ("Просчеты", "Образцы", "Производства")
+
+# Категории задач и сущности-источники (детализация просрочек и ожидания продаж)
+CATEGORY_ENTITIES = (("Просчеты", "proscheti"), ("Образцы", "obrazci"), ("Производства", "proizv"))
+
+# Периоды конверсий: (ключ параметров FiscalPeriods, название периода)
+CONVERSION_PERIODS = (
+    ("current_quarter", "Текущий квартал"),
+    ("previous_quarter", "Прошлый квартал"),
+    ("fiscal_year", "Финансовый год"),
+)
+
+# Пользователь, задачи которого не учитываются в секциях дашборда
+EXCLUDED_USER = "Артем Василевский"
+
+
+def _exact_sum(values) -> Decimal:
+    """
+    Сумма NUMERIC-значений как SUM в PostgreSQL (при DASHBOARD_DECIMAL_AS_FLOAT значения
+    приходят float - складываются их десятичные представления, без ошибок округления float)
+    """
+    total = Decimal(0)
+    for value in values:
+        total += Decimal(repr(value)) if isinstance(value, float) else value
+    return total
 
 
 class DashboardService:
     """Сервис для получения данных дашбордов"""
     
-    def get_dashboard_data(self, user_full_name: str, fiscal_year: str = "current", order_status: str = "active") -> List[Dict[str, Any]]:
+    def __init__(self):
+        # Кэш результатов секций: ключ (ФИО, fiscal_year, order_status, id секции)
+        self.cache = TTLCache(
+            "dashboard_cache",
+            ttl=settings.DASHBOARD_CACHE_TTL,
+            max_entries=settings.DASHBOARD_CACHE_MAX_ENTRIES,
+            max_stale=settings.DASHBOARD_CACHE_MAX_STALE,
+            max_bytes=int(settings.DASHBOARD_CACHE_MAX_MB * 1024 * 1024),
+        )
+        # Фоновые пересчеты устаревших секций: ключ кэша -> задача
+        self._refresh_tasks: Dict[tuple, asyncio.Task] = {}
+        # Одинаковые одновременные запросы дашборда (несколько вкладок, повторы) вычисляются один раз
+        self.in_flight = SingleFlight("dashboard_requests")
+    
+    def _dashboard_sections(self, user_full_name: str, fiscal_year: str, order_status: str, section_ids: Optional[Tuple[str, ...]] = None, periods: Optional[FiscalPeriods] = None) -> List[Dict[str, Any]]:
+        """
+        Секции запроса по реестру (services/dashboard_sections.py) в порядке отображения
+        
+        Каждая секция: id, title, description, position (место в полном дашборде), loader
+        (метод с SQL-запросами), args и cache_key. Loader возвращает список строк или словарь
+        {"summary": [...], "details": [...]}. shared_loader - тот же результат из общего чтения
+        источников запроса (SharedScan, DASHBOARD_SHARED_SCAN): вызывается с SharedScan и теми же args.
+        В cache_key параметры, от которых секция не зависит, заменены на None.
+        closed_period - ключ (ФИО, начало года) в постоянном хранилище, если секция
+        целиком относится к закрытому финансовому году.
+        Границы периодов вычисляются один раз на запрос (fiscal_calendar) и передаются
+        loader'ам, зависящим от дат.
+        
+        Args:
+            section_ids: id секций, которые нужно вычислить (None - все)
+            periods: Границы периодов запроса (по умолчанию вычисляются по текущей дате)
+        """
+        values = {
+            "fiscal_year": fiscal_year,
+            "order_status": order_status,
+            "periods": periods or fiscal_calendar.periods(fiscal_year),
+        }
+        closed_start = fiscal_calendar.closed_fiscal_year_start(fiscal_year)
+        sections = []
+        for position, spec in select_sections(section_ids):
+            section = {
+                "id": spec.id,
+                "title": spec.title,
+                "description": spec.description,
+                "position": position,
+                "loader": getattr(self, spec.loader),
+                "args": (user_full_name, *(values[name] for name in spec.params)),
+                "cache_key": (
+                    user_full_name,
+                    fiscal_year if "fiscal_year" in spec.params else None,
+                    order_status if "order_status" in spec.params else None,
+                    spec.id,
+                ),
+                "spec": spec,
+            }
+            if spec.shared_loader:
+                section["shared_loader"] = getattr(self, spec.shared_loader)
+            if spec.closed_period and closed_start:
+                section["closed_period"] = (user_full_name, closed_start)
+            sections.append(section)
+        return sections
+    
+    async def get_dashboard_data(self, user_full_name: str, fiscal_year: str = "current", order_status: str = "active", section_ids: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
         """
-        Получает все данные дашборда для конкретного пользователя
+        Получает данные дашборда для конкретного пользователя
+        
+        Секции вычисляются одновременно в пуле потоков БД (run_in_db_executor),
+        у каждой секции свой таймаут (DASHBOARD_SECTION_TIMEOUT / DASHBOARD_SECTION_TIMEOUTS).
+        Секция, завершившаяся ошибкой или по таймауту, попадает в failed_sections.
         
         Args:
             user_full_name: Полное ФИО пользователя
             fiscal_year: "current" для текущего года, "previous" для прошлого
             order_status: "active" для активных заказов, "completed" для завершенных, "all" для всех
+            section_ids: Вычислить только эти секции (parse_sections); None - все
             
         Returns:
-            Список элементов дашборда с данными
+            Словарь: items (элементы дашборда с данными) и failed_sections (секции с ошибками)
         """
+        # Пока такой же дашборд уже вычисляется, ждем его результат вместо нового запуска
+        return await self.in_flight.run(
+            (user_full_name, fiscal_year, order_status, section_ids),
+            lambda: self._compute_dashboard(user_full_name, fiscal_year, order_status, section_ids)
+        )
+    
+    async def _compute_dashboard(self, user_full_name: str, fiscal_year: str, order_status: str, section_ids: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        """Вычисляет секции дашборда (см. get_dashboard_data)"""
+        periods = fiscal_calendar.periods(fiscal_year)
+        sections = self._dashboard_sections(user_full_name, fiscal_year, order_status, section_ids, periods)
+        unit_of_work = self._attach_unit_of_work(sections)
+        cancel_scope = self._attach_cancel_scope(sections)
+        self._attach_shared_scan(sections, user_full_name, periods)
+        try:
+            results = await asyncio.gather(*[self._run_section(section) for section in sections])
+        except asyncio.CancelledError:
+            # Все ожидавшие дашборд клиенты отключились - останавливаем его SQL в БД
+            cancel_scope.cancel()
+            raise
+        finally:
+            if unit_of_work:
+                unit_of_work.close()
+        
         dashboard_items = []
+        failed_sections = []
+        for section, (item, error) in zip(sections, results):
+            if error:
+                failed_sections.append(error)
+            elif item:
+                dashboard_items.append(item)
         
-        # 1. Просроченные задачи (самое важное - показываем первым!)
-        overdue_tasks_data = self._get_overdue_tasks_data(user_full_name)
-        if overdue_tasks_data and overdue_tasks_data.get("summary"):
-            dashboard_items.append({
-                "id": "overdue_tasks",
-                "title": "⚠️ Просроченные задачи",
-                "description": "Количество и среднее время просрочки по категориям",
-                "data": overdue_tasks_data["summary"],
-                "columns": list(overdue_tasks_data["summary"][0].keys()) if overdue_tasks_data["summary"] else [],
-                "details": overdue_tasks_data.get("details", [])  # Добавляем детализацию
-            })
-        
-        # 2. Ждем ответа от продаж (задачи со статусом "Нужно прикрепить документы")
-        waiting_sales_data = self._get_waiting_sales_data(user_full_name)
-        if waiting_sales_data and waiting_sales_data.get("details") and len(waiting_sales_data.get("details", [])) > 0:
-            dashboard_items.append({
-                "id": "waiting_sales",
-                "title": "⏳ Ждем ответа от продаж",
-                "description": "Задачи, требующие документов от продаж",
-                "data": [],  # Пустой массив, так как не нужна сводная таблица
-                "columns": [],
-                "details": waiting_sales_data.get("details", [])  # Только детализация
-            })
-        
-        # 3. Конверсии КП в образцы
-        conversions = self._get_conversions_data(user_full_name, fiscal_year)
-        if conversions:
-            dashboard_items.append({
-                "id": "conversions",
-                "title": "Конверсии КП в образцы",
-                "description": "Показатели конверсии коммерческих предложений в образцы по периодам",
-                "data": conversions,
-                "columns": list(conversions[0].keys()) if conversions else []
-            })
-        
-        # 4. Конверсии КП в производство
-        production_conversions = self._get_production_conversions_data(user_full_name, fiscal_year)
-        if production_conversions:
-            dashboard_items.append({
-                "id": "production_conversions",
-                "title": "Конверсии КП в производство",
-                "description": "Показатели конверсии коммерческих предложений в производство по периодам",
-                "data": production_conversions,
-                "columns": list(production_conversions[0].keys()) if production_conversions else []
-            })
-        
-        # 4. Среднее время согласования КП по месяцам
-        approval_time = self._get_approval_time_data(user_full_name)
-        if approval_time:
-            dashboard_items.append({
-                "id": "approval_time",
-                "title": "Среднее время согласования КП",
-                "description": "Среднее количество дней на согласование КП по месяцам текущего года",
-                "data": approval_time,
-                "columns": list(approval_time[0].keys()) if approval_time else []
-            })
-        
-        # 6. Среднее время принятия производства по месяцам
-        production_acceptance_time = self._get_production_acceptance_time_data(user_full_name, fiscal_year)
-        if production_acceptance_time:
-            dashboard_items.append({
-                "id": "production_acceptance_time",
-                "title": "Среднее время принятия производства",
-                "description": "Среднее количество дней на принятие производства по месяцам финансового года",
-                "data": production_acceptance_time,
-                "columns": list(production_acceptance_time[0].keys()) if production_acceptance_time else []
-            })
-        
-        # 7. Заказы от клиентов по финансовому году
-        client_orders_data = self._get_client_orders_data(user_full_name, fiscal_year, order_status)
-        if client_orders_data and client_orders_data.get("summary"):
-            dashboard_items.append({
-                "id": "client_orders",
-                "title": "Заказы от клиентов",
-                "description": "Количество заказов от клиентов за финансовый год",
-                "data": client_orders_data["summary"],
-                "columns": list(client_orders_data["summary"][0].keys()) if client_orders_data["summary"] else [],
-                "details": client_orders_data.get("details", [])  # Добавляем детализацию
-            })
-        
-        return dashboard_items
+        return {
+            "items": dashboard_items,
+            "failed_sections": failed_sections
+        }
     
-    def _get_conversions_data(self, user_full_name: str, fiscal_year: str = "current") -> List[Dict]:
+    async def stream_dashboard_data(self, user_full_name: str, fiscal_year: str = "current", order_status: str = "active", section_ids: Optional[Tuple[str, ...]] = None) -> AsyncIterator[Tuple[str, int, Dict[str, Any]]]:
         """
-        Получает данные по конверсиям КП для пользователя за разные периоды
+        Отдает секции дашборда по мере вычисления (для потоковой выдачи)
+        
+        Секция с streamed_first (просроченные задачи) всегда идет первой: секции,
+        вычисленные раньше нее, ждут и отдаются сразу после. Остальные - в порядке завершения.
         
         Args:
-            user_full_name: ФИО пользователя
-            fiscal_year: "current" или "previous"
+            user_full_name: Полное ФИО пользователя
+            fiscal_year: "current" для текущего года, "previous" для прошлого
+            order_status: "active" для активных заказов, "completed" для завершенных, "all" для всех
+            section_ids: Вычислить только эти секции (parse_sections); None - все
+            
+        Yields:
+            Кортежи ("item", позиция секции, элемент дашборда) или ("failed", позиция, ошибка секции).
+            Позиция - место секции в полном дашборде. Секции без данных пропускаются.
         """
-        print(f"🔍 Executing conversions query for user: '{user_full_name}', fiscal year: {fiscal_year}")
+        periods = fiscal_calendar.periods(fiscal_year)
+        sections = self._dashboard_sections(user_full_name, fiscal_year, order_status, section_ids, periods)
+        unit_of_work = self._attach_unit_of_work(sections)
+        cancel_scope = self._attach_cancel_scope(sections)
+        self._attach_shared_scan(sections, user_full_name, periods)
         
-        # Сначала проверяем, какие пользователи есть в БД
+        async def run(section: Dict[str, Any]):
+            return section, await self._run_section(section)
+        
+        tasks = [asyncio.ensure_future(run(section)) for section in sections]
+        # Без секции, которую нужно отдать первой, секции отдаются в порядке завершения
+        first_done = not any(section["spec"].streamed_first for section in sections)
+        pending = []
         try:
-            debug_query = """
-            SELECT DISTINCT "user" 
-            FROM (
-                SELECT "user" FROM proscheti_gr_artema
-                UNION
-                SELECT "user" FROM proscheti_gr_zheni
-            ) all_users
-            WHERE "user" IS NOT NULL
-            ORDER BY "user"
-            LIMIT 50
-            """
-            all_users_in_db = execute_query(debug_query, {})
-            print(f"👥 Users found in database tables: {[u['user'] for u in all_users_in_db]}")
+            for future in asyncio.as_completed(tasks):
+                section, (item, error) = await future
+                position = section["position"]
+                pending.append((position, item, error))
+                if not first_done:
+                    if not section["spec"].streamed_first:
+                        continue
+                    first_done = True
+                    pending.sort(key=lambda result: result[0] != position)  # просроченные задачи - первыми
+                
+                for position, item, error in pending:
+                    if error:
+                        yield "failed", position, error
+                    elif item:
+                        yield "item", position, item
+                pending = []
+        finally:
+            # Клиент отключился - незавершенные секции не нужны (результаты уже вычисленных остаются в кэше),
+            # их SQL отменяется в БД
+            if not all(task.done() for task in tasks):
+                metrics.inc("dashboard_streams_abandoned")
+                cancel_scope.cancel()
+            for task in tasks:
+                task.cancel()
+            if unit_of_work:
+                unit_of_work.close()
+    
+    def _attach_unit_of_work(self, sections: List[Dict[str, Any]]) -> Optional[UnitOfWork]:
+        """
+        Общий unit of work для SQL всех секций запроса (DASHBOARD_SNAPSHOT): одно соединение
+        и один снимок данных REPEATABLE READ READ ONLY
+        
+        Returns:
+            UnitOfWork (закрывается после вычисления секций) или None
+        """
+        if not settings.DASHBOARD_SNAPSHOT:
+            return None
+        unit_of_work = UnitOfWork()
+        for section in sections:
+            section["unit_of_work"] = unit_of_work
+        return unit_of_work
+    
+    def _attach_cancel_scope(self, sections: List[Dict[str, Any]]) -> QueryCancelScope:
+        """
+        Общий QueryCancelScope для SQL секций запроса: если клиент отключился,
+        выполняющиеся запросы отменяются в БД (core/cancellation.py)
+        """
+        cancel_scope = QueryCancelScope()
+        for section in sections:
+            section["cancel_scope"] = cancel_scope
+        return cancel_scope
+    
+    def _attach_shared_scan(self, sections: List[Dict[str, Any]], user_full_name: str, periods: FiscalPeriods) -> Optional[SharedScan]:
+        """
+        Общее чтение источников для секций с shared_loader (DASHBOARD_SHARED_SCAN): строки
+        пользователя из каждой таблицы читаются один раз на запрос (services/shared_scan.py)
+        
+        Общее чтение получают только секции, у которых есть общий источник (sources в реестре)
+        с другой такой секцией запроса: одна секция (например, ?sections=client_orders)
+        выполняет свой SQL, читающий только нужные ей строки.
+        """
+        if not settings.DASHBOARD_SHARED_SCAN:
+            return None
+        candidates = [section for section in sections if "shared_loader" in section]
+        readers: Dict[str, int] = {}
+        for section in candidates:
+            for entity in section["spec"].sources:
+                readers[entity] = readers.get(entity, 0) + 1
+        shared = [
+            section for section in candidates
+            if any(readers[entity] > 1 for entity in section["spec"].sources)
+        ]
+        if not shared:
+            return None
+        shared_scan = SharedScan(user_full_name, self._query, periods)
+        for section in shared:
+            section["shared_scan"] = shared_scan
+        return shared_scan
+    
+    async def _run_section(self, section: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Возвращает элемент дашборда для секции: из кэша или выполняя loader с таймаутом
+        
+        Stale-while-revalidate: устаревший результат (старше TTL, но в пределах max_stale секции)
+        отдается сразу с пометкой stale, а секция пересчитывается в фоне. Результат старше
+        TTL + max_stale не отдается - запрос ждет пересчета.
+        
+        Returns:
+            Кортеж (элемент дашборда или None, если данных нет; ошибка секции или None)
+        """
+        ttl, max_stale = self._cache_policy(section)
+        cached = self.cache.lookup(section["cache_key"], ttl, max_stale)
+        if cached is not None:
+            if cached.stale:
+                self._schedule_refresh(section)
+            item = self._build_item(section, cached.value)
+            if item:
+                item["age_seconds"] = round(cached.age, 1)
+                item["stale"] = cached.stale
+            return item, None
+        
+        try:
+            result = await self._load_section(section)
+        except (asyncio.TimeoutError, QueryCanceled) as e:
+            # QueryCanceled - SQL секции остановлен в БД по statement_timeout
+            if isinstance(e, QueryCanceled):
+                timeout = self._statement_timeout(section)
+            else:
+                timeout = self._section_timeout(section)
+            print(f"⏱️ Section '{section['id']}' timed out after {timeout} s")
+            return None, {
+                "id": section["id"],
+                "title": section["title"],
+                "reason": "timeout",
+                "detail": f"Секция не успела загрузиться за {timeout:g} с"
+            }
         except Exception as e:
-            print(f"⚠️ Could not fetch users list: {e}")
+            # Текст ошибки (SQL, имена таблиц и колонок) остается в логе сервера, клиенту - общее сообщение
+            print(f"❌ Section '{section['id']}' failed: {e!r}")
+            traceback.print_exc()
+            return None, {
+                "id": section["id"],
+                "title": section["title"],
+                "reason": "error",
+                "detail": f"Не удалось загрузить секцию {section['id']}"
+            }
         
-        # Определяем смещение для финансового года
-        year_offset = 0 if fiscal_year == "current" else -1
+        return self._build_item(section, result), None
+    
+    def _cache_policy(self, section: Dict[str, Any]) -> Tuple[float, float]:
+        """(ttl, max_stale) секции: из реестра, с переопределением в настройках"""
+        spec = section["spec"]
+        return settings.dashboard_cache_policy(section["id"], spec.ttl, spec.max_stale)
+    
+    def _section_timeout(self, section: Dict[str, Any]) -> float:
+        return settings.dashboard_section_timeouts.get(section["id"], settings.DASHBOARD_SECTION_TIMEOUT)
+    
+    def _statement_timeout(self, section: Dict[str, Any]) -> float:
+        """
+        statement_timeout SQL секции: DB_STATEMENT_TIMEOUTS или таймаут секции - запрос
+        останавливается в БД, когда секция уже не ждет результата
+        """
+        return settings.statement_timeouts.get(section["id"], self._section_timeout(section))
+    
+    async def _load_section(self, section: Dict[str, Any]):
+        """
+        Выполняет loader секции в пуле потоков БД с таймаутом и сохраняет результат в кэш
         
-        query = f"""
-        WITH user_data AS (
-            -- Объединяем данные из обеих таблиц
-            SELECT 
-                CONCAT(
-                    'Текущий квартал (',
-                    TO_CHAR(DATE_TRUNC('quarter', NOW()), 'DD.MM.YYYY'),
-                    ' - ',
-                    TO_CHAR(DATE_TRUNC('quarter', NOW() + INTERVAL '3 month') - INTERVAL '1 day', 'DD.MM.YYYY'),
-                    ')'
-                ) as "Период",
-                COUNT(DISTINCT proscheti.task_id) as "Кол-во КП",
-                COUNT(DISTINCT obrazci.task_id) as "Кол-во образцов",
-                CASE 
-                    WHEN COUNT(DISTINCT proscheti.task_id) = 0 THEN 0
-                    ELSE ROUND(
-                        CAST(COUNT(DISTINCT obrazci.task_id) AS NUMERIC) * 100.0 / 
-                        NULLIF(COUNT(DISTINCT proscheti.task_id), 0), 
-                        2
-                    )
-                END as "Конверсия"
-            FROM (
-                SELECT task_id, "user", cp_finish FROM proscheti_gr_artema
-                WHERE "user" = :user_name
-                UNION ALL
-                SELECT task_id, "user", cp_finish FROM proscheti_gr_zheni
-                WHERE "user" = :user_name
-            ) proscheti
-            LEFT JOIN (
-                SELECT task_id, "user", date_create FROM obrazci_gr_artema
-                WHERE "user" = :user_name
-                UNION ALL
-                SELECT task_id, "user", date_create FROM obrazci_gr_zheni
-                WHERE "user" = :user_name
-            ) obrazci ON proscheti."user" = obrazci."user"
-            WHERE 
-                proscheti.cp_finish >= DATE_TRUNC('quarter', NOW())
-                AND proscheti.cp_finish < DATE_TRUNC('quarter', NOW() + INTERVAL '3 month')
-                AND (
-                    obrazci.date_create IS NULL 
-                    OR (
-                        obrazci.date_create >= DATE_TRUNC('quarter', NOW())
-                        AND obrazci.date_create < DATE_TRUNC('quarter', NOW() + INTERVAL '3 month')
-                    )
-                )
-            
-            UNION ALL
-            
-            -- Прошлый квартал
-            SELECT 
-                CONCAT(
-                    'Прошлый квартал (',
-                    TO_CHAR(DATE_TRUNC('quarter', NOW() - INTERVAL '3 month'), 'DD.MM.YYYY'),
-                    ' - ',
-                    TO_CHAR(DATE_TRUNC('quarter', NOW()) - INTERVAL '1 day', 'DD.MM.YYYY'),
-                    ')'
-                ) as "Период",
-                COUNT(DISTINCT proscheti.task_id) as "Кол-во КП",
-                COUNT(DISTINCT obrazci.task_id) as "Кол-во образцов",
-                CASE 
-                    WHEN COUNT(DISTINCT proscheti.task_id) = 0 THEN 0
-                    ELSE ROUND(
-                        CAST(COUNT(DISTINCT obrazci.task_id) AS NUMERIC) * 100.0 / 
-                        NULLIF(COUNT(DISTINCT proscheti.task_id), 0), 
-                        2
-                    )
-                END as "Конверсия"
-            FROM (
-                SELECT task_id, "user", cp_finish FROM proscheti_gr_artema
-                WHERE "user" = :user_name
-                UNION ALL
-                SELECT task_id, "user", cp_finish FROM proscheti_gr_zheni
-                WHERE "user" = :user_name
-            ) proscheti
-            LEFT JOIN (
-                SELECT task_id, "user", date_create FROM obrazci_gr_artema
-                WHERE "user" = :user_name
-                UNION ALL
-                SELECT task_id, "user", date_create FROM obrazci_gr_zheni
-                WHERE "user" = :user_name
-            ) obrazci ON proscheti."user" = obrazci."user"
-            WHERE 
-                proscheti.cp_finish >= DATE_TRUNC('quarter', NOW() - INTERVAL '3 month')
-                AND proscheti.cp_finish < DATE_TRUNC('quarter', NOW())
-                AND (
-                    obrazci.date_create IS NULL 
-                    OR (
-                        obrazci.date_create >= DATE_TRUNC('quarter', NOW() - INTERVAL '3 month')
-                        AND obrazci.date_create < DATE_TRUNC('quarter', NOW())
-                    )
-                )
-            
-            UNION ALL
-            
-            -- Финансовый год (1 марта - 28 февраля) с учетом выбранного года
-            SELECT 
-                CONCAT(
-                    'Финансовый год (',
-                    TO_CHAR(
-                        CASE 
-                            WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                            THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                            ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int - 1 + {year_offset}, 3, 1)
-                        END,
-                        'DD.MM.YYYY'
-                    ),
-                    ' - ',
-                    TO_CHAR(
-                        CASE 
-                            WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                            THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + 1 + {year_offset}, 3, 1) - INTERVAL '1 day'
-                            ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1) - INTERVAL '1 day'
-                        END,
-                        'DD.MM.YYYY'
-                    ),
-                    ')'
-                ) as "Период",
-                COUNT(DISTINCT proscheti.task_id) as "Кол-во КП",
-                COUNT(DISTINCT obrazci.task_id) as "Кол-во образцов",
-                CASE 
-                    WHEN COUNT(DISTINCT proscheti.task_id) = 0 THEN 0
-                    ELSE ROUND(
-                        CAST(COUNT(DISTINCT obrazci.task_id) AS NUMERIC) * 100.0 / 
-                        NULLIF(COUNT(DISTINCT proscheti.task_id), 0), 
-                        2
-                    )
-                END as "Конверсия"
-            FROM (
-                SELECT task_id, "user", cp_finish FROM proscheti_gr_artema
-                WHERE "user" = :user_name
-                UNION ALL
-                SELECT task_id, "user", cp_finish FROM proscheti_gr_zheni
-                WHERE "user" = :user_name
-            ) proscheti
-            LEFT JOIN (
-                SELECT task_id, "user", date_create FROM obrazci_gr_artema
-                WHERE "user" = :user_name
-                UNION ALL
-                SELECT task_id, "user", date_create FROM obrazci_gr_zheni
-                WHERE "user" = :user_name
-            ) obrazci ON proscheti."user" = obrazci."user"
-            WHERE 
-                proscheti.cp_finish >= 
-                    CASE 
-                        WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                        THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                        ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int - 1 + {year_offset}, 3, 1)
-                    END
-                AND proscheti.cp_finish < 
-                    CASE 
-                        WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                        THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + 1 + {year_offset}, 3, 1)
-                        ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                    END
-                AND (
-                    obrazci.date_create IS NULL 
-                    OR (
-                        obrazci.date_create >= 
-                            CASE 
-                                WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                                THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                                ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int - 1 + {year_offset}, 3, 1)
-                            END
-                        AND obrazci.date_create < 
-                            CASE 
-                                WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                                THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + 1 + {year_offset}, 3, 1)
-                                ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                            END
-                    )
-                )
+        Raises:
+            asyncio.TimeoutError: Секция не уложилась в таймаут
+            Exception: Ошибка выполнения SQL-запросов секции
+        """
+        wait = ConnectionWait()
+        result = await self._await_section(
+            asyncio.ensure_future(run_in_db_executor(self._call_loader, section, wait)),
+            self._section_timeout(section),
+            wait,
         )
-        SELECT 
-            "Период",
-            "Кол-во КП",
-            "Кол-во образцов",
-            CONCAT("Конверсия", '%') as "Конверсия"
-        FROM user_data
-        ORDER BY 
-            CASE 
-                WHEN "Период" LIKE 'Текущий квартал%' THEN 1
-                WHEN "Период" LIKE 'Прошлый квартал%' THEN 2
-                WHEN "Период" LIKE 'Финансовый год%' THEN 3
-            END
+        ttl, max_stale = self._cache_policy(section)
+        self.cache.set(section["cache_key"], result, retain=ttl + max_stale)
+        return result
+    
+    async def _await_section(self, future: asyncio.Future, timeout: float, wait: ConnectionWait):
+        """
+        Как asyncio.wait_for, но без времени, которое секция простояла в очереди к соединению
+        unit of work (DASHBOARD_SNAPSHOT): запросы секций на одном соединении выполняются по
+        очереди, и таймаут секции отсчитывается только пока выполняются ее собственные запросы
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                remaining = deadline + wait.total() - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                done, _ = await asyncio.wait({future}, timeout=remaining)
+                if done:
+                    return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+    
+    def _call_loader(self, section: Dict[str, Any], wait: Optional[ConnectionWait] = None):
         """
+        Выполняет loader секции (в потоке БД)
         
+        Секции за закрытый финансовый год берутся из постоянного хранилища
+        и вычисляются только при первом обращении. SQL секции выполняется в unit of work
+        запроса, если он есть (после закрытия - фоновый пересчет - на отдельных соединениях),
+        со statement_timeout секции и отменяется, если клиент отключился. Ожидание
+        соединения unit of work суммируется в wait.
+        """
+        with using_unit_of_work(section.get("unit_of_work")):
+            with using_connection_wait(wait):
+                with using_cancel_scope(section.get("cancel_scope")):
+                    with using_statement_timeout(self._statement_timeout(section)):
+                        return self._load_from_store_or_loader(section)
+    
+    def _load_from_store_or_loader(self, section: Dict[str, Any]):
+        """
+        Результат секции из хранилища закрытых периодов или loader'а
+        
+        Результат для хранилища вычисляется собственным SQL секции по исходным таблицам
+        (using_base_tables): сохраненный навсегда результат не должен зависеть от того,
+        когда последний раз обновлялись представления и помесячные агрегаты.
+        """
+        closed_period = section.get("closed_period")
+        if not closed_period or not settings.DASHBOARD_CLOSED_PERIOD_CACHE:
+            return self._run_loader(section)
+        
+        user_full_name, period_start = closed_period
         try:
-            result = execute_query(query, {"user_name": user_full_name})
+            stored = closed_period_store.get(user_full_name, section["id"], period_start)
+        except Exception as e:
+            print(f"⚠️ Closed period cache unavailable: {e}")
+            return self._run_loader(section)
+        if stored is not None:
+            metrics.inc("dashboard_closed_period_hits")
+            return stored
+        
+        with using_base_tables():
+            result = section["loader"](*section["args"])
+        try:
+            closed_period_store.put(user_full_name, section["id"], period_start, result)
+            metrics.inc("dashboard_closed_period_stored")
+        except Exception as e:
+            print(f"⚠️ Could not store closed period result for section '{section['id']}': {e}")
+        return result
+    
+    def _run_loader(self, section: Dict[str, Any]):
+        """Результат секции из общего чтения источников запроса или собственным SQL loader'а"""
+        shared_scan = section.get("shared_scan")
+        if shared_scan is not None:
+            return section["shared_loader"](shared_scan, *section["args"])
+        return section["loader"](*section["args"])
+    
+    def _schedule_refresh(self, section: Dict[str, Any]) -> None:
+        """Запускает фоновый пересчет секции, если он еще не запущен"""
+        key = section["cache_key"]
+        if key in self._refresh_tasks:
+            return
+        # Пересчет не привязан к запросу, который его запустил: не отменяется вместе с ним
+        # и выполняет собственный SQL секции
+        section = dict(section, unit_of_work=None, cancel_scope=None, shared_scan=None)
+        task = asyncio.create_task(self._refresh_section(section))
+        self._refresh_tasks[key] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(key, None))
+    
+    async def _refresh_section(self, section: Dict[str, Any]) -> None:
+        """Фоновый пересчет устаревшей секции"""
+        try:
+            await self._load_section(section)
+            metrics.inc("dashboard_background_refreshes")
+        except Exception as e:
+            print(f"⚠️ Background refresh of section '{section['id']}' failed: {e!r}")
+            metrics.inc("dashboard_background_refresh_errors")
+    
+    def invalidate_cache(self, user_full_name: Optional[str] = None, closed_periods: bool = False) -> int:
+        """
+        Удаляет результаты секций из кэша
+        
+        Args:
+            user_full_name: ФИО пользователя; если не указано - кэш очищается полностью
+            closed_periods: Удалить также сохраненные результаты за закрытые финансовые годы
+                (например, после догрузки данных)
+            
+        Returns:
+            Количество удаленных записей
+        """
+        if user_full_name is None:
+            removed = self.cache.invalidate()
+        else:
+            removed = self.cache.invalidate(lambda key: key[0] == user_full_name)
+        if closed_periods:
+            removed += closed_period_store.invalidate(user_full_name)
+        return removed
+    
+    def _query(self, query: str, params: Optional[Dict[str, Any]] = None) -> QueryResult:
+        """
+        Выполняет SQL секции дашборда (prepared statement, колоночный результат)
+        
+        Returns:
+            QueryResult: колонки и строки-кортежи, без словаря на каждую строку
+        """
+        return execute_prepared(query, params, decimal_as_float=settings.DASHBOARD_DECIMAL_AS_FLOAT)
+    
+    def _build_item(self, section: Dict[str, Any], result) -> Optional[Dict[str, Any]]:
+        """
+        Собирает элемент дашборда из результата loader'а
+        
+        Элемент сразу имеет форму схемы DashboardItem (все поля в том же порядке),
+        поэтому ответ сериализуется напрямую, без валидации каждой строки Pydantic.
+        data и details остаются QueryResult: строки превращаются в JSON-объекты или
+        массивы только при сериализации (core/serialization.py).
+        
+        Returns:
+            Элемент дашборда или None, если у секции нет данных
+        """
+        details = None
+        if isinstance(result, dict):
+            # Секции со сводкой и детализацией (просрочки, ожидание продаж, заказы клиентов)
+            data = result.get("summary") or QueryResult([], [])
+            details = result.get("details") or QueryResult([], [])
+            if not data and not details:
+                return None
+        else:
+            data = result
+            if not data:
+                return None
+        
+        return {
+            "id": section["id"],
+            "title": section["title"],
+            "description": section["description"],
+            "data": data,
+            "columns": data.columns if data else [],
+            "details": details,
+            "details_columns": details.columns if details else None,
+            "age_seconds": None,
+            "stale": False,
+        }
+    
+    def _get_conversions_data(self, user_full_name: str, fiscal_year: str = "current", periods: Optional[FiscalPeriods] = None) -> QueryResult:
+        """
+        Получает данные по конверсиям КП для пользователя за разные периоды
+        
+        Args:
+            user_full_name: ФИО пользователя
+            fiscal_year: "current" или "previous"
+            periods: Границы периодов (по умолчанию вычисляются по текущей дате)
+        """
+        print(f"🔍 Executing conversions query for user: '{user_full_name}', fiscal year: {fiscal_year}")
+        
+        periods = periods or fiscal_calendar.periods(fiscal_year)
+        query = self._conversions_query()
+        
+        try:
+            result = self._query(query, {"user_name": user_full_name, **periods.params()})
             print(f"✅ Query executed, rows returned: {len(result)}")
             if result:
-                print(f"📊 Sample row: {result[0]}")
+                print(f"📊 Sample row: {result.rows[0]}")
             return result
         except Exception as e:
             print(f"Error executing conversions query: {e}")
-            import traceback
             traceback.print_exc()
-            return []
+            raise
     
-    def _get_production_conversions_data(self, user_full_name: str, fiscal_year: str = "current") -> List[Dict]:
+    def _get_production_conversions_data(self, user_full_name: str, fiscal_year: str = "current", periods: Optional[FiscalPeriods] = None) -> QueryResult:
         """
         Получает данные по конверсиям КП в производство для пользователя за разные периоды
         
         Args:
             user_full_name: ФИО пользователя
             fiscal_year: "current" или "previous"
+            periods: Границы периодов (по умолчанию вычисляются по текущей дате)
         """
         print(f"🔍 Executing production conversions query for user: '{user_full_name}', fiscal year: {fiscal_year}")
         
-        # Определяем смещение для финансового года
-        year_offset = 0 if fiscal_year == "current" else -1
+        periods = periods or fiscal_calendar.periods(fiscal_year)
+        query = self._production_conversions_query()
         
-        query = f"""
-        WITH user_data AS (
-            -- Текущий квартал
-            SELECT 
-                CONCAT(
-                    'Текущий квартал (',
-                    TO_CHAR(DATE_TRUNC('quarter', NOW()), 'DD.MM.YYYY'),
-                    ' - ',
-                    TO_CHAR(DATE_TRUNC('quarter', NOW() + INTERVAL '3 month') - INTERVAL '1 day', 'DD.MM.YYYY'),
-                    ')'
-                ) as "Период",
-                COUNT(DISTINCT proscheti.task_id) as "Кол-во КП",
-                COUNT(DISTINCT proizv.task_id) as "Кол-во производств",
-                CASE 
-                    WHEN COUNT(DISTINCT proscheti.task_id) = 0 THEN 0
-                    ELSE ROUND(
-                        CAST(COUNT(DISTINCT proizv.task_id) AS NUMERIC) * 100.0 / 
-                        NULLIF(COUNT(DISTINCT proscheti.task_id), 0), 
-                        2
-                    )
-                END as "Конверсия"
-            FROM (
-                SELECT task_id, "user", cp_finish, status FROM proscheti_gr_artema
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                  AND (status = 'Завершенная' OR status = 'КП Согласовано')
-                UNION ALL
-                SELECT task_id, "user", cp_finish, status FROM proscheti_gr_zheni
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                  AND (status = 'Завершенная' OR status = 'КП Согласовано')
-            ) proscheti
-            LEFT JOIN (
-                SELECT task_id, "user", date_create FROM proizv_gr_artema
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                UNION ALL
-                SELECT task_id, "user", date_create FROM proizv_gr_zheni
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            ) proizv ON proscheti."user" = proizv."user"
-            WHERE 
-                proscheti.cp_finish >= DATE_TRUNC('quarter', NOW())
-                AND proscheti.cp_finish < DATE_TRUNC('quarter', NOW() + INTERVAL '3 month')
-                AND (
-                    proizv.date_create IS NULL 
-                    OR (
-                        proizv.date_create >= DATE_TRUNC('quarter', NOW())
-                        AND proizv.date_create < DATE_TRUNC('quarter', NOW() + INTERVAL '3 month')
-                    )
-                )
-            
-            UNION ALL
-            
-            -- Прошлый квартал
-            SELECT 
-                CONCAT(
-                    'Прошлый квартал (',
-                    TO_CHAR(DATE_TRUNC('quarter', NOW() - INTERVAL '3 month'), 'DD.MM.YYYY'),
-                    ' - ',
-                    TO_CHAR(DATE_TRUNC('quarter', NOW()) - INTERVAL '1 day', 'DD.MM.YYYY'),
-                    ')'
-                ) as "Период",
-                COUNT(DISTINCT proscheti.task_id) as "Кол-во КП",
-                COUNT(DISTINCT proizv.task_id) as "Кол-во производств",
-                CASE 
-                    WHEN COUNT(DISTINCT proscheti.task_id) = 0 THEN 0
-                    ELSE ROUND(
-                        CAST(COUNT(DISTINCT proizv.task_id) AS NUMERIC) * 100.0 / 
-                        NULLIF(COUNT(DISTINCT proscheti.task_id), 0), 
-                        2
-                    )
-                END as "Конверсия"
-            FROM (
-                SELECT task_id, "user", cp_finish, status FROM proscheti_gr_artema
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                  AND (status = 'Завершенная' OR status = 'КП Согласовано')
-                UNION ALL
-                SELECT task_id, "user", cp_finish, status FROM proscheti_gr_zheni
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                  AND (status = 'Завершенная' OR status = 'КП Согласовано')
-            ) proscheti
-            LEFT JOIN (
-                SELECT task_id, "user", date_create FROM proizv_gr_artema
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                UNION ALL
-                SELECT task_id, "user", date_create FROM proizv_gr_zheni
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            ) proizv ON proscheti."user" = proizv."user"
-            WHERE 
-                proscheti.cp_finish >= DATE_TRUNC('quarter', NOW() - INTERVAL '3 month')
-                AND proscheti.cp_finish < DATE_TRUNC('quarter', NOW())
-                AND (
-                    proizv.date_create IS NULL 
-                    OR (
-                        proizv.date_create >= DATE_TRUNC('quarter', NOW() - INTERVAL '3 month')
-                        AND proizv.date_create < DATE_TRUNC('quarter', NOW())
-                    )
-                )
+        try:
+            result = self._query(query, {"user_name": user_full_name, **periods.params()})
+            print(f"✅ Production query executed, rows returned: {len(result)}")
+            if result:
+                print(f"📊 Sample row: {result.rows[0]}")
+            return result
+        except Exception as e:
+            print(f"Error executing production conversions query: {e}")
+            traceback.print_exc()
+            raise
+    
+    def _conversions_from_scan(self, shared_scan: SharedScan, user_full_name: str, fiscal_year: str = "current", periods: Optional[FiscalPeriods] = None) -> QueryResult:
+        """Конверсии КП в образцы из общего чтения источников (как _conversions_query)"""
+        periods = periods or fiscal_calendar.periods(fiscal_year)
+        result = self._conversion_periods_result(
+            self._cp_periods(shared_scan.rows("proscheti")),
+            self._target_periods(shared_scan.rows("obrazci")),
+            shared_scan.has_rows("obrazci"),
+            "Кол-во образцов",
+            periods,
+        )
+        print(f"✅ Conversions from shared scan, rows returned: {len(result)}")
+        return result
+    
+    def _production_conversions_from_scan(self, shared_scan: SharedScan, user_full_name: str, fiscal_year: str = "current", periods: Optional[FiscalPeriods] = None) -> QueryResult:
+        """Конверсии КП в производство из общего чтения источников (как _production_conversions_query)"""
+        periods = periods or fiscal_calendar.periods(fiscal_year)
+        cp_rows = []
+        target_rows = []
+        has_targets = False
+        if user_full_name != EXCLUDED_USER:
+            cp_rows = self._cp_periods(shared_scan.rows("proscheti"), ("Завершенная", "КП Согласовано"))
+            target_rows = self._target_periods(shared_scan.rows("proizv"))
+            has_targets = shared_scan.has_rows("proizv")
+        result = self._conversion_periods_result(cp_rows, target_rows, has_targets, "Кол-во производств", periods)
+        print(f"✅ Production conversions from shared scan, rows returned: {len(result)}")
+        return result
+    
+    def _cp_periods(self, proscheti: QueryResult, statuses: Optional[Tuple[str, ...]] = None) -> List[tuple]:
+        """(task_id, попадания в периоды CONVERSION_PERIODS) КП из общего чтения, только со статусами statuses"""
+        task_id, status = proscheti.columns.index("task_id"), proscheti.columns.index("status")
+        flags = [proscheti.columns.index(f"in_{key}") for key, _ in CONVERSION_PERIODS]
+        return [
+            (row[task_id], tuple(bool(row[flag]) for flag in flags))
+            for row in proscheti.rows
+            if statuses is None or row[status] in statuses
+        ]
+    
+    def _target_periods(self, target: QueryResult) -> List[tuple]:
+        """(task_id, попадания в периоды CONVERSION_PERIODS) целевых задач: задача с пустой date_create - в каждом периоде"""
+        task_id, date_create = target.columns.index("task_id"), target.columns.index("date_create")
+        flags = [target.columns.index(f"in_{key}") for key, _ in CONVERSION_PERIODS]
+        return [
+            (row[task_id], tuple(row[date_create] is None or bool(row[flag]) for flag in flags))
+            for row in target.rows
+        ]
+    
+    def _conversion_periods_result(self, cp_rows: List[tuple], target_rows: List[tuple], has_targets: bool, target_column: str, periods: FiscalPeriods) -> QueryResult:
+        """
+        Конверсия КП в целевые задачи по периодам в памяти - результат _conversion_periods_query
+        
+        Попадание дат в периоды вычислено в БД (колонки in_<период> общего чтения).
+        
+        Args:
+            cp_rows: (task_id, попадания в периоды) КП пользователя (_cp_periods)
+            target_rows: (task_id, попадания в периоды) целевых задач пользователя (_target_periods)
+            has_targets: Есть ли у пользователя целевые задачи, в том числе вне периодов
+            target_column: Название колонки с количеством целевых задач
+            periods: Границы периодов
+        """
+        bounds = periods.params()
+        result = []
+        for index, (key, title) in enumerate(CONVERSION_PERIODS):
+            start, end = bounds[f"{key}_start"], bounds[f"{key}_end"]
+            cp_in_period = [task_id for task_id, in_periods in cp_rows if in_periods[index]]
+            target_in_period = [task_id for task_id, in_periods in target_rows if in_periods[index]]
+            # COUNT(DISTINCT task_id) не считает NULL
+            cp_tasks = len({task_id for task_id in cp_in_period if task_id is not None})
+            target_tasks = len({task_id for task_id in target_in_period if task_id is not None})
             
-            UNION ALL
+            cp_count = cp_tasks if cp_in_period and (not has_targets or target_in_period) else 0
+            target_count = target_tasks if cp_in_period else 0
+            if cp_count == 0:
+                conversion = "0%"
+            else:
+                # ROUND(... , 2) в PostgreSQL округляет половину от нуля
+                value = (Decimal(target_count) * 100 / cp_count).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                conversion = f"{value}%"
             
-            -- Финансовый год (1 марта - 28 февраля) с учетом выбранного года
-            SELECT 
+            period = f"{title} ({start:%d.%m.%Y} - {end - datetime.timedelta(days=1):%d.%m.%Y})"
+            result.append((period, cp_count, target_count, conversion))
+        return QueryResult(["Период", "Кол-во КП", target_column, "Конверсия"], result)
+    
+    def _conversions_query(self) -> str:
+        """SQL конверсий КП в образцы (см. _conversion_periods_query)"""
+        # Источники данных: единое представление или обе таблицы групп (см. source_views)
+        proscheti = source_views.source("proscheti", 'task_id, cp_finish', '"user" = :user_name')
+        obrazci = source_views.source("obrazci", 'task_id, date_create', '"user" = :user_name')
+        return self._conversion_periods_query(proscheti, obrazci, "Кол-во образцов")
+    
+    def _production_conversions_query(self) -> str:
+        """SQL конверсий КП в производство (см. _conversion_periods_query)"""
+        # Источники данных: единое представление или обе таблицы групп (см. source_views)
+        proscheti = source_views.source("proscheti", 'task_id, cp_finish', """
+            "user" = :user_name
+              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+              AND (status = 'Завершенная' OR status = 'КП Согласовано')
+        """)
+        proizv = source_views.source("proizv", 'task_id, date_create', """
+            "user" = :user_name
+              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+        """)
+        return self._conversion_periods_query(proscheti, proizv, "Кол-во производств")
+    
+    def _conversion_periods_query(self, proscheti: str, target: str, target_column: str) -> str:
+        """
+        SQL конверсии КП в целевые задачи (образцы или производства) по периодам
+        
+        Все периоды считаются за один проход по КП и один проход по целевым задачам
+        (агрегаты с FILTER). КП и целевые задачи агрегируются независимо, без соединения
+        всех КП пользователя со всеми его целевыми задачами (LEFT JOIN по "user", N×M строк),
+        как раньше. Результат прежний, включая особенность соединения: если у пользователя
+        есть целевые задачи, но ни одна не попадает в период и ни у одной не пуста дата,
+        КП за период не учитываются.
+        
+        Границы периодов - параметры :<период>_start / :<период>_end (FiscalPeriods.params()).
+        
+        Args:
+            proscheti: SELECT task_id, cp_finish из КП пользователя
+            target: SELECT task_id, date_create из целевых задач пользователя
+            target_column: Название колонки с количеством целевых задач
+        """
+        cp_aggregates = []
+        target_aggregates = []
+        period_rows = []
+        for sort_order, (key, title) in enumerate(CONVERSION_PERIODS, 1):
+            cp_in_period = f"cp_finish >= :{key}_start AND cp_finish < :{key}_end"
+            cp_aggregates.append(f"""
+                COUNT(*) FILTER (WHERE {cp_in_period}) AS {key}_rows,
+                COUNT(DISTINCT task_id) FILTER (WHERE {cp_in_period}) AS {key}_tasks""")
+            target_in_period = f"date_create IS NULL OR (date_create >= :{key}_start AND date_create < :{key}_end)"
+            target_aggregates.append(f"""
+                COUNT(*) FILTER (WHERE {target_in_period}) AS {key}_matched,
+                COUNT(DISTINCT task_id) FILTER (WHERE {target_in_period}) AS {key}_tasks""")
+            period_rows.append(f"""
+            SELECT
+                {sort_order} AS sort_order,
                 CONCAT(
-                    'Финансовый год (',
-                    TO_CHAR(
-                        CASE 
-                            WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                            THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                            ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int - 1 + {year_offset}, 3, 1)
-                        END,
-                        'DD.MM.YYYY'
-                    ),
+                    '{title} (',
+                    TO_CHAR(CAST(:{key}_start AS date), 'DD.MM.YYYY'),
                     ' - ',
-                    TO_CHAR(
-                        CASE 
-                            WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                            THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + 1 + {year_offset}, 3, 1) - INTERVAL '1 day'
-                            ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1) - INTERVAL '1 day'
-                        END,
-                        'DD.MM.YYYY'
-                    ),
+                    TO_CHAR(CAST(:{key}_end AS date) - 1, 'DD.MM.YYYY'),
                     ')'
-                ) as "Период",
-                COUNT(DISTINCT proscheti.task_id) as "Кол-во КП",
-                COUNT(DISTINCT proizv.task_id) as "Кол-во производств",
-                CASE 
-                    WHEN COUNT(DISTINCT proscheti.task_id) = 0 THEN 0
-                    ELSE ROUND(
-                        CAST(COUNT(DISTINCT proizv.task_id) AS NUMERIC) * 100.0 / 
-                        NULLIF(COUNT(DISTINCT proscheti.task_id), 0), 
-                        2
-                    )
-                END as "Конверсия"
-            FROM (
-                SELECT task_id, "user", cp_finish, status FROM proscheti_gr_artema
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                  AND (status = 'Завершенная' OR status = 'КП Согласовано')
-                UNION ALL
-                SELECT task_id, "user", cp_finish, status FROM proscheti_gr_zheni
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                  AND (status = 'Завершенная' OR status = 'КП Согласовано')
-            ) proscheti
-            LEFT JOIN (
-                SELECT task_id, "user", date_create FROM proizv_gr_artema
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                UNION ALL
-                SELECT task_id, "user", date_create FROM proizv_gr_zheni
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            ) proizv ON proscheti."user" = proizv."user"
-            WHERE 
-                proscheti.cp_finish >= 
-                    CASE 
-                        WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                        THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                        ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int - 1 + {year_offset}, 3, 1)
-                    END
-                AND proscheti.cp_finish < 
-                    CASE 
-                        WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                        THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + 1 + {year_offset}, 3, 1)
-                        ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                    END
-                AND (
-                    proizv.date_create IS NULL 
-                    OR (
-                        proizv.date_create >= 
-                            CASE 
-                                WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                                THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                                ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int - 1 + {year_offset}, 3, 1)
-                            END
-                        AND proizv.date_create < 
-                            CASE 
-                                WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                                THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + 1 + {year_offset}, 3, 1)
-                                ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                            END
-                    )
-                )
+                ) AS period,
+                CASE
+                    WHEN cp.{key}_rows > 0 AND (t.row_count = 0 OR t.{key}_matched > 0) THEN cp.{key}_tasks
+                    ELSE 0
+                END AS cp_count,
+                CASE WHEN cp.{key}_rows > 0 THEN t.{key}_tasks ELSE 0 END AS target_count
+            FROM cp, t""")
+        
+        cp_columns = ",".join(cp_aggregates)
+        target_columns = ",".join(target_aggregates)
+        user_data = "\n            UNION ALL".join(period_rows)
+        
+        return f"""
+        WITH proscheti AS (
+            {proscheti}
+        ),
+        target AS (
+            {target}
+        ),
+        cp AS (
+            SELECT{cp_columns}
+            FROM proscheti
+        ),
+        t AS (
+            SELECT
+                COUNT(*) AS row_count,{target_columns}
+            FROM target
+        ),
+        user_data AS ({user_data}
         )
         SELECT 
-            "Период",
-            "Кол-во КП",
-            "Кол-во производств",
-            CONCAT("Конверсия", '%') as "Конверсия"
+            period AS "Период",
+            cp_count AS "Кол-во КП",
+            target_count AS "{target_column}",
+            CONCAT(
+                CASE 
+                    WHEN cp_count = 0 THEN 0
+                    ELSE ROUND(CAST(target_count AS NUMERIC) * 100.0 / NULLIF(cp_count, 0), 2)
+                END,
+                '%'
+            ) AS "Конверсия"
         FROM user_data
-        ORDER BY 
-            CASE 
-                WHEN "Период" LIKE 'Текущий квартал%' THEN 1
-                WHEN "Период" LIKE 'Прошлый квартал%' THEN 2
-                WHEN "Период" LIKE 'Финансовый год%' THEN 3
-            END
+        ORDER BY sort_order
         """
+    
+    def _get_approval_time_data(self, user_full_name: str, periods: Optional[FiscalPeriods] = None) -> QueryResult:
+        """
+        Получает среднее время согласования КП по месяцам для пользователя
+        
+        Args:
+            user_full_name: ФИО пользователя
+            periods: Границы периодов (по умолчанию вычисляются по текущей дате)
+        """
+        print(f"🔍 Executing approval time query for user: '{user_full_name}'")
+        
+        query = self._approval_time_query()
+        
+        periods = periods or fiscal_calendar.periods()
         
         try:
-            result = execute_query(query, {"user_name": user_full_name})
-            print(f"✅ Production query executed, rows returned: {len(result)}")
+            result = self._query(query, {"user_name": user_full_name, **periods.params()})
+            print(f"✅ Approval time query executed, rows returned: {len(result)}")
             if result:
-                print(f"📊 Sample row: {result[0]}")
+                print(f"📊 Sample row: {result.rows[0]}")
             return result
         except Exception as e:
-            print(f"Error executing production conversions query: {e}")
-            import traceback
+            print(f"Error executing approval time query: {e}")
             traceback.print_exc()
-            return []
+            raise
+    
+    def _approval_time_query(self) -> str:
+        """SQL среднего времени согласования КП по месяцам (см. _monthly_average_query)"""
+        # Текущий финансовый год (с 1 марта), в который всегда входит текущий месяц,
+        # без будущих месяцев (показываем только до текущего месяца включительно)
+        return self._monthly_average_query(
+            monthly_rollups.monthly_query("approval_time", "current_fiscal_year_start", "next_month_start")
+        )
     
-    def _get_approval_time_data(self, user_full_name: str) -> List[Dict]:
+    def _production_acceptance_time_query(self) -> str:
+        """SQL среднего времени принятия производства по месяцам выбранного финансового года"""
+        return self._monthly_average_query(
+            monthly_rollups.monthly_query("production_acceptance_time", "fiscal_year_start", "fiscal_year_end")
+        )
+    
+    def _monthly_average_query(self, monthly: str) -> str:
         """
-        Получает среднее время согласования КП по месяцам для пользователя
+        Месяц, среднее и изменение к предыдущему месяцу (LAG) по среднему за месяц
         
         Args:
-            user_full_name: ФИО пользователя
+            monthly: SELECT month_date, avg_days - помесячные агрегаты и сырые строки
+                после их водяного знака (см. monthly_rollups)
         """
-        print(f"🔍 Executing approval time query for user: '{user_full_name}'")
-        
-        query = """
-        WITH monthly_data AS (
-            SELECT
-                DATE_TRUNC('month', cp_sogl)::date AS month_date,
-                AVG(serch_sogl_day) AS avg_days
-            FROM (
-                SELECT cp_sogl, serch_sogl_day, "user" FROM proscheti_gr_artema
-                WHERE "user" = :user_name
-                  AND serch_date IS NOT NULL
-                  AND cp_sogl IS NOT NULL
-                  AND (serch_date <> '1970-01-01' OR serch_date IS NULL)
-                  AND (cp_sogl <> '1970-01-01' OR cp_sogl IS NULL)
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                UNION ALL
-                SELECT cp_sogl, serch_sogl_day, "user" FROM proscheti_gr_zheni
-                WHERE "user" = :user_name
-                  AND serch_date IS NOT NULL
-                  AND cp_sogl IS NOT NULL
-                  AND (serch_date <> '1970-01-01' OR serch_date IS NULL)
-                  AND (cp_sogl <> '1970-01-01' OR cp_sogl IS NULL)
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            ) combined
-            WHERE 
-              -- Финансовый год: с 1 марта по 28 февраля
-              -- Если текущий месяц >= марта, показываем финансовый год с марта текущего года по февраль следующего
-              -- Если текущий месяц < марта, показываем финансовый год с марта прошлого года по февраль текущего
-              -- Это гарантирует, что текущий месяц всегда включен в отображаемый период
-              (
-                (EXTRACT(MONTH FROM NOW()) >= 3 
-                 AND cp_sogl >= (DATE_TRUNC('year', NOW()) + INTERVAL '2 months')::date
-                 AND cp_sogl < (DATE_TRUNC('year', NOW()) + INTERVAL '14 months')::date)
-                OR
-                (EXTRACT(MONTH FROM NOW()) < 3
-                 AND cp_sogl >= (DATE_TRUNC('year', NOW()) - INTERVAL '10 months')::date
-                 AND cp_sogl < (DATE_TRUNC('year', NOW()) + INTERVAL '2 months')::date)
-              )
-              -- Исключаем будущие месяцы (показываем только до текущего месяца)
-              AND DATE_TRUNC('month', cp_sogl)::date <= DATE_TRUNC('month', NOW())::date
-            GROUP BY DATE_TRUNC('month', cp_sogl)::date
-            ORDER BY DATE_TRUNC('month', cp_sogl)::date
-        ),
+        return f"""
+        WITH monthly_data AS ({monthly}),
         with_changes AS (
             SELECT
                 month_date,
@@ -642,20 +842,8 @@ class DashboardService:
         FROM with_changes
         ORDER BY month_date
         """
-        
-        try:
-            result = execute_query(query, {"user_name": user_full_name})
-            print(f"✅ Approval time query executed, rows returned: {len(result)}")
-            if result:
-                print(f"📊 Sample row: {result[0]}")
-            return result
-        except Exception as e:
-            print(f"Error executing approval time query: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
     
-    def _get_overdue_tasks_data(self, user_full_name: str) -> List[Dict]:
+    def _get_overdue_tasks_data(self, user_full_name: str) -> Dict[str, QueryResult]:
         """
         Получает данные по просроченным задачам с группировкой и детализацией
         
@@ -663,83 +851,83 @@ class DashboardService:
             user_full_name: ФИО пользователя
             
         Returns:
-            Список словарей: summary (сводка) + details (детализация по типам)
+            Словарь: summary (сводка) + details (детализация по типам)
         """
         print(f"🔍 Executing overdue tasks query for user: '{user_full_name}'")
         
-        # Сводная таблица
-        summary_query = """
-        WITH proscheti_overdue AS (
-            SELECT
-                COUNT(*) AS count,
-                AVG(prosr_day) AS avg_days
-            FROM (
-                SELECT prosr_day FROM proscheti_gr_artema
-                WHERE "user" = :user_name
-                  AND prosrok_now = 'Да'
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                UNION ALL
-                SELECT prosr_day FROM proscheti_gr_zheni
-                WHERE "user" = :user_name
-                  AND prosrok_now = 'Да'
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            ) combined
-        ),
-        obrazci_overdue AS (
-            SELECT
-                COUNT(*) AS count,
-                AVG(prosr_day) AS avg_days
-            FROM (
-                SELECT prosr_day FROM obrazci_gr_artema
-                WHERE "user" = :user_name
-                  AND prosrok_now = 'Да'
-                  AND (status <> 'Завершенная' OR status IS NULL)
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                UNION ALL
-                SELECT prosr_day FROM obrazci_gr_zheni
-                WHERE "user" = :user_name
-                  AND prosrok_now = 'Да'
-                  AND (status <> 'Завершенная' OR status IS NULL)
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            ) combined
-        ),
-        proizv_overdue AS (
-            SELECT
-                COUNT(*) AS count,
-                AVG(prosr_day) AS avg_days
-            FROM (
-                SELECT prosr_day FROM proizv_gr_artema
-                WHERE "user" = :user_name
-                  AND prosrok_now = 'Да'
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                UNION ALL
-                SELECT prosr_day FROM proizv_gr_zheni
-                WHERE "user" = :user_name
-                  AND prosrok_now = 'Да'
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            ) combined
-        )
-        SELECT
-            'Просчеты' AS "Категория",
-            COALESCE(p.count, 0) AS "Кол-во",
-            ROUND(COALESCE(p.avg_days, 0)::numeric, 1) AS "Ср. дней"
-        FROM proscheti_overdue p
-        UNION ALL
-        SELECT
-            'Образцы' AS "Категория",
-            COALESCE(o.count, 0) AS "Кол-во",
-            ROUND(COALESCE(o.avg_days, 0)::numeric, 1) AS "Ср. дней"
-        FROM obrazci_overdue o
-        UNION ALL
-        SELECT
-            'Производства' AS "Категория",
-            COALESCE(pr.count, 0) AS "Кол-во",
-            ROUND(COALESCE(pr.avg_days, 0)::numeric, 1) AS "Ср. дней"
-        FROM proizv_overdue pr
+        try:
+            # Один проход по источникам: сводка считается из строк детализации
+            details = self._query(self._overdue_tasks_query(), {"user_name": user_full_name})
+            summary = self._overdue_summary(details)
+            
+            print(f"✅ Overdue tasks summary: {len(summary)} categories")
+            print(f"✅ Overdue tasks details: {len(details)} tasks")
+            
+            # Возвращаем и сводку, и детализацию
+            return {
+                "summary": summary,
+                "details": details
+            }
+        except Exception as e:
+            print(f"Error executing overdue tasks query: {e}")
+            traceback.print_exc()
+            raise
+    
+    def _overdue_tasks_from_scan(self, shared_scan: SharedScan, user_full_name: str) -> Dict[str, QueryResult]:
         """
+        Просроченные задачи из общего чтения источников: те же строки и порядок,
+        что у _overdue_tasks_query (ORDER BY category, prosr_day DESC - NULL первыми)
+        """
+        details = []
+        if user_full_name != EXCLUDED_USER:
+            for category, entity in CATEGORY_ENTITIES:
+                rows = shared_scan.rows(entity)
+                task_id, task_name, prosr_day, status, prosrok_now = (
+                    rows.columns.index(name) for name in ("task_id", "task_name", "prosr_day", "status", "prosrok_now")
+                )
+                for row in rows.rows:
+                    if row[prosrok_now] != "Да":
+                        continue
+                    # Завершенные образцы не считаются просроченными
+                    if entity == "obrazci" and row[status] == "Завершенная":
+                        continue
+                    details.append((
+                        category, row[task_id], row[task_name], row[prosr_day],
+                        "Без статуса" if row[status] is None else row[status],
+                    ))
+        details.sort(key=lambda row: (row[0], row[3] is not None, -(row[3] or 0)))
+        details = QueryResult(["category", "task_id", "task_name", "prosr_day", "status"], details)
+        summary = self._overdue_summary(details)
+        
+        print(f"✅ Overdue tasks from shared scan: {len(details)} tasks")
+        return {
+            "summary": summary,
+            "details": details
+        }
+    
+    def _overdue_tasks_query(self) -> str:
+        """SQL детализации просроченных задач: категория, task_id, task_name, prosr_day, status"""
+        # Просрочка и статус должны быть текущими: всегда исходные таблицы групп,
+        # а не единые представления (они обновляются только после загрузки данных)
+        proscheti = source_views.source("proscheti", 'task_id, task_name, prosr_day, status', """
+            "user" = :user_name
+              AND prosrok_now = 'Да'
+              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+        """, base_tables=True)
+        obrazci = source_views.source("obrazci", 'task_id, task_name, prosr_day, status', """
+            "user" = :user_name
+              AND prosrok_now = 'Да'
+              AND (status <> 'Завершенная' OR status IS NULL)
+              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+        """, base_tables=True)
+        proizv = source_views.source("proizv", 'task_id, task_name, prosr_day, status', """
+            "user" = :user_name
+              AND prosrok_now = 'Да'
+              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+        """, base_tables=True)
         
         # Детализация задач с task_id, task_name, prosr_day и status
-        details_query = """
+        return f"""
         SELECT
             'Просчеты' AS category,
             task_id,
@@ -747,15 +935,7 @@ class DashboardService:
             prosr_day,
             COALESCE(status, 'Без статуса') AS status
         FROM (
-            SELECT task_id, task_name, prosr_day, status FROM proscheti_gr_artema
-            WHERE "user" = :user_name
-              AND prosrok_now = 'Да'
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            UNION ALL
-            SELECT task_id, task_name, prosr_day, status FROM proscheti_gr_zheni
-            WHERE "user" = :user_name
-              AND prosrok_now = 'Да'
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+            {proscheti}
         ) proscheti
         
         UNION ALL
@@ -767,17 +947,7 @@ class DashboardService:
             prosr_day,
             COALESCE(status, 'Без статуса') AS status
         FROM (
-            SELECT task_id, task_name, prosr_day, status FROM obrazci_gr_artema
-            WHERE "user" = :user_name
-              AND prosrok_now = 'Да'
-              AND (status <> 'Завершенная' OR status IS NULL)
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            UNION ALL
-            SELECT task_id, task_name, prosr_day, status FROM obrazci_gr_zheni
-            WHERE "user" = :user_name
-              AND prosrok_now = 'Да'
-              AND (status <> 'Завершенная' OR status IS NULL)
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+            {obrazci}
         ) obrazci
         
         UNION ALL
@@ -789,126 +959,70 @@ class DashboardService:
             prosr_day,
             COALESCE(status, 'Без статуса') AS status
         FROM (
-            SELECT task_id, task_name, prosr_day, status FROM proizv_gr_artema
-            WHERE "user" = :user_name
-              AND prosrok_now = 'Да'
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            UNION ALL
-            SELECT task_id, task_name, prosr_day, status FROM proizv_gr_zheni
-            WHERE "user" = :user_name
-              AND prosrok_now = 'Да'
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+            {proizv}
         ) proizv
         
         ORDER BY category, prosr_day DESC
         """
+    
+    def _overdue_summary(self, details: QueryResult) -> QueryResult:
+        """
+        Сводка просроченных задач по категориям из строк детализации: количество и
+        среднее число дней просрочки (как ROUND(AVG(prosr_day)::numeric, 1) в SQL)
         
-        try:
-            summary = execute_query(summary_query, {"user_name": user_full_name})
-            details = execute_query(details_query, {"user_name": user_full_name})
-            
-            print(f"✅ Overdue tasks summary: {len(summary)} categories")
-            print(f"✅ Overdue tasks details: {len(details)} tasks")
+        Args:
+            details: Детализация, отсортированная по категории
             
-            # Возвращаем и сводку, и детализацию
-            return {
-                "summary": summary,
-                "details": details
-            }
-        except Exception as e:
-            print(f"Error executing overdue tasks query: {e}")
-            import traceback
-            traceback.print_exc()
-            return {"summary": [], "details": []}
+        Returns:
+            QueryResult: Категория, Кол-во, Ср. дней - все категории, в том числе без задач
+        """
+        category_index = details.columns.index("category")
+        days_index = details.columns.index("prosr_day")
+        totals = {category: (0, []) for category in OVERDUE_CATEGORIES}
+        for category, rows in itertools.groupby(details.rows, key=operator.itemgetter(category_index)):
+            days = [row[days_index] for row in rows]
+            totals[category] = (len(days), [value for value in days if value is not None])
+        
+        summary = []
+        for category in OVERDUE_CATEGORIES:
+            count, days = totals[category]
+            avg_days = Decimal(0)
+            if days:
+                avg_days = Decimal(sum(days)) / len(days)
+            avg_days = avg_days.quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
+            if settings.DASHBOARD_DECIMAL_AS_FLOAT:
+                avg_days = float(avg_days)
+            summary.append((category, count, avg_days))
+        return QueryResult(["Категория", "Кол-во", "Ср. дней"], summary)
     
-    def _get_production_acceptance_time_data(self, user_full_name: str, fiscal_year: str = "current") -> List[Dict]:
+    def _get_production_acceptance_time_data(self, user_full_name: str, fiscal_year: str = "current", periods: Optional[FiscalPeriods] = None) -> QueryResult:
         """
         Получает среднее время принятия производства по месяцам для пользователя
         
         Args:
             user_full_name: ФИО пользователя
             fiscal_year: "current" или "previous"
+            periods: Границы периодов (по умолчанию вычисляются по текущей дате)
         """
         print(f"🔍 Executing production acceptance time query for user: '{user_full_name}', fiscal year: {fiscal_year}")
         
-        # Определяем смещение для финансового года
-        year_offset = 0 if fiscal_year == "current" else -1
+        # Границы выбранного финансового года
+        periods = periods or fiscal_calendar.periods(fiscal_year)
         
-        query = f"""
-        WITH monthly_data AS (
-            SELECT
-                DATE_TRUNC('month', date_accept)::date AS month_date,
-                AVG(colvo_days_accept) AS avg_days
-            FROM (
-                SELECT date_accept, colvo_days_accept FROM proizv_gr_artema
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                  AND date_accept IS NOT NULL
-                UNION ALL
-                SELECT date_accept, colvo_days_accept FROM proizv_gr_zheni
-                WHERE "user" = :user_name
-                  AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-                  AND date_accept IS NOT NULL
-            ) combined
-            WHERE date_accept >= 
-                CASE 
-                    WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                    THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                    ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int - 1 + {year_offset}, 3, 1)
-                END
-            AND date_accept < 
-                CASE 
-                    WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                    THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + 1 + {year_offset}, 3, 1)
-                    ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                END
-            GROUP BY DATE_TRUNC('month', date_accept)::date
-            ORDER BY DATE_TRUNC('month', date_accept)::date
-        ),
-        with_changes AS (
-            SELECT
-                month_date,
-                avg_days,
-                LAG(avg_days) OVER (ORDER BY month_date) AS prev_month_avg
-            FROM monthly_data
-        )
-        SELECT
-            CASE EXTRACT(MONTH FROM month_date)
-                WHEN 1 THEN 'Январь'
-                WHEN 2 THEN 'Февраль'
-                WHEN 3 THEN 'Март'
-                WHEN 4 THEN 'Апрель'
-                WHEN 5 THEN 'Май'
-                WHEN 6 THEN 'Июнь'
-                WHEN 7 THEN 'Июль'
-                WHEN 8 THEN 'Август'
-                WHEN 9 THEN 'Сентябрь'
-                WHEN 10 THEN 'Октябрь'
-                WHEN 11 THEN 'Ноябрь'
-                WHEN 12 THEN 'Декабрь'
-            END || ', ' || EXTRACT(YEAR FROM month_date)::text AS "Месяц",
-            ROUND(avg_days::numeric, 1) AS "Среднее время (дней)",
-            CASE
-                WHEN prev_month_avg IS NULL THEN NULL
-                ELSE ROUND((avg_days - prev_month_avg)::numeric, 1)
-            END AS "Изменение"
-        FROM with_changes
-        ORDER BY month_date
-        """
+        query = self._production_acceptance_time_query()
         
         try:
-            result = execute_query(query, {"user_name": user_full_name})
+            result = self._query(query, {"user_name": user_full_name, **periods.params()})
             print(f"✅ Production acceptance time query executed, rows returned: {len(result)}")
             if result:
-                print(f"📊 Sample row: {result[0]}")
+                print(f"📊 Sample row: {result.rows[0]}")
             return result
         except Exception as e:
             print(f"Error executing production acceptance time query: {e}")
-            import traceback
             traceback.print_exc()
-            return []
+            raise
     
-    def _get_client_orders_data(self, user_full_name: str, fiscal_year: str = "current", status_filter: str = "active") -> Dict:
+    def _get_client_orders_data(self, user_full_name: str, fiscal_year: str = "current", status_filter: str = "active", periods: Optional[FiscalPeriods] = None) -> Dict:
         """
         Получает данные по заказам от клиентов для пользователя за финансовый год
         Возвращает summary (таблица) и details (список заказов по клиентам)
@@ -917,13 +1031,74 @@ class DashboardService:
             user_full_name: ФИО пользователя
             fiscal_year: "current" или "previous"
             status_filter: "active" (не завершенные) или "completed" (завершенные)
+            periods: Границы периодов (по умолчанию вычисляются по текущей дате)
         """
         print(f"🔍 Executing client orders query for user: '{user_full_name}', fiscal year: {fiscal_year}, status: {status_filter}")
         
-        # Определяем смещение для финансового года
-        year_offset = 0 if fiscal_year == "current" else -1
+        # Границы выбранного финансового года
+        periods = periods or fiscal_calendar.periods(fiscal_year)
         
-        # Определяем условие фильтрации по статусу
+        try:
+            params = {"user_name": user_full_name, **periods.params()}
+            result = self._client_orders_result(self._query(self._client_orders_query(status_filter), params))
+            
+            print(f"✅ Client orders query executed")
+            print(f"   Summary rows: {len(result['summary'])}")
+            print(f"   Details rows: {len(result['details'])}")
+            
+            return result
+        except Exception as e:
+            print(f"Error executing client orders query: {e}")
+            traceback.print_exc()
+            raise
+    
+    def _client_orders_from_scan(self, shared_scan: SharedScan, user_full_name: str, fiscal_year: str = "current", status_filter: str = "active", periods: Optional[FiscalPeriods] = None) -> Dict:
+        """
+        Заказы от клиентов из общего чтения производств: те же строки, что у
+        _client_orders_query (производства прочитаны в порядке kontr_name, task_name).
+        Финансовый год - периоды общего чтения (те же periods, что у секции).
+        """
+        zero = 0.0 if settings.DASHBOARD_DECIMAL_AS_FLOAT else Decimal(0)
+        
+        proizv = shared_scan.rows("proizv")
+        client, task_name, nad_zad_name, task_id, sum_project, status, in_fiscal_year = (
+            proizv.columns.index(name)
+            for name in ("kontr_name", "task_name", "nad_zad_name", "task_id", "sum_project", "status", "in_fiscal_year")
+        )
+        orders = []
+        for row in proizv.rows:
+            # date_create в финансовом году (сравнение в БД, NULL при пустой дате)
+            if not row[in_fiscal_year]:
+                continue
+            if status_filter == "active" and (row[status] is None or row[status] == "Завершенная"):
+                continue
+            if status_filter == "completed" and row[status] != "Завершенная":
+                continue
+            # COALESCE(NULLIF(task_name, ''), nad_zad_name, 'Без названия')
+            order_name = row[task_name] if row[task_name] else row[nad_zad_name]
+            orders.append((
+                row[client],
+                "Без названия" if order_name is None else order_name,
+                row[task_id],
+                zero if row[sum_project] is None else row[sum_project],
+                "Без статуса" if row[status] is None else row[status],
+                row[nad_zad_name],
+            ))
+        
+        result = self._client_orders_result(QueryResult(
+            ["client", "order_name", "task_id", "sum_project", "status", "nad_zad_name"], orders
+        ))
+        print(f"✅ Client orders from shared scan: {len(result['details'])} orders")
+        return result
+    
+    def _client_orders_query(self, status_filter: str = "active") -> str:
+        """
+        Заказы пользователя за финансовый год - один проход по производствам
+        
+        Детализация (client, order_name, task_id, sum_project, status) и nad_zad_name для
+        сводки по клиентам (см. _client_orders_result), отсортированы по клиенту.
+        """
+        # Определяем условие фильтрации по статусу (три фиксированных варианта запроса)
         status_condition = ""
         if status_filter == "active":
             status_condition = "AND status IS NOT NULL AND status != 'Завершенная'"
@@ -931,115 +1106,66 @@ class DashboardService:
             status_condition = "AND status = 'Завершенная'"
         # Для "all" не добавляем условие фильтрации
         
-        # Запрос для summary (сводная таблица по клиентам с суммой)
-        summary_query = f"""
-        WITH client_data AS (
-            SELECT
-                kontr_name,
-                COUNT(DISTINCT CASE WHEN nad_zad_name IS NOT NULL THEN nad_zad_name END) AS order_count,
-                SUM(COALESCE(sum_project, 0)) AS total_sum
-            FROM (
-                SELECT kontr_name, nad_zad_name, sum_project, status, "user", date_create FROM proizv_gr_artema
-                WHERE "user" = :user_name
-                  AND date_create IS NOT NULL
-                UNION ALL
-                SELECT kontr_name, nad_zad_name, sum_project, status, "user", date_create FROM proizv_gr_zheni
-                WHERE "user" = :user_name
-                  AND date_create IS NOT NULL
-            ) combined
-            WHERE date_create >= 
-                CASE 
-                    WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                    THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                    ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int - 1 + {year_offset}, 3, 1)
-                END
-            AND date_create < 
-                CASE 
-                    WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                    THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + 1 + {year_offset}, 3, 1)
-                    ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                END
-            {status_condition}
-            GROUP BY kontr_name
-        ),
-        with_total AS (
-            SELECT
-                kontr_name AS "Клиент",
-                order_count AS "Кол-во заказов",
-                COALESCE(total_sum, 0) AS "Сумма",
-                1 AS sort_order
-            FROM client_data
-            
-            UNION ALL
-            
-            SELECT
-                'ИТОГО' AS "Клиент",
-                SUM(order_count) AS "Кол-во заказов",
-                COALESCE(SUM(total_sum), 0) AS "Сумма",
-                2 AS sort_order
-            FROM client_data
-        )
-        SELECT
-            "Клиент",
-            "Кол-во заказов",
-            "Сумма"
-        FROM with_total
-        ORDER BY
-            sort_order,
-            CASE WHEN sort_order = 1 THEN "Кол-во заказов" END DESC,
-            CASE WHEN sort_order = 1 THEN "Клиент" END ASC
-        """
-        
-        # Запрос для details (детальный список заказов с task_id, task_name, sum_project и status)
-        details_query = f"""
+        # Источники данных: единое представление или обе таблицы групп (см. source_views)
+        proizv = source_views.source("proizv", 'kontr_name, nad_zad_name, task_name, task_id, sum_project, status, "user", date_create', """
+            "user" = :user_name
+              AND date_create IS NOT NULL
+        """)
+        
+        return f"""
         SELECT 
             kontr_name AS client,
             COALESCE(NULLIF(task_name, ''), nad_zad_name, 'Без названия') AS order_name,
             task_id,
             COALESCE(sum_project, 0) AS sum_project,
-            COALESCE(status, 'Без статуса') AS status
+            COALESCE(status, 'Без статуса') AS status,
+            nad_zad_name
         FROM (
-            SELECT kontr_name, nad_zad_name, task_name, task_id, sum_project, status, "user", date_create FROM proizv_gr_artema
-            WHERE "user" = :user_name
-              AND date_create IS NOT NULL
-            UNION ALL
-            SELECT kontr_name, nad_zad_name, task_name, task_id, sum_project, status, "user", date_create FROM proizv_gr_zheni
-            WHERE "user" = :user_name
-              AND date_create IS NOT NULL
+            {proizv}
         ) combined
-        WHERE date_create >= 
-            CASE 
-                WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-                ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int - 1 + {year_offset}, 3, 1)
-            END
-        AND date_create < 
-            CASE 
-                WHEN EXTRACT(MONTH FROM NOW()) >= 3 
-                THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + 1 + {year_offset}, 3, 1)
-                ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
-            END
+        WHERE date_create >= :fiscal_year_start
+        AND date_create < :fiscal_year_end
         {status_condition}
         ORDER BY kontr_name, task_name
         """
+    
+    def _client_orders_result(self, orders: QueryResult) -> Dict[str, QueryResult]:
+        """
+        Сводка и детализация заказов из строк _client_orders_query
         
-        try:
-            summary = execute_query(summary_query, {"user_name": user_full_name})
-            details = execute_query(details_query, {"user_name": user_full_name})
-            
-            print(f"✅ Client orders query executed")
-            print(f"   Summary rows: {len(summary)}")
-            print(f"   Details rows: {len(details)}")
-            
-            return {
-                "summary": summary,
-                "details": details
-            }
-        except Exception as e:
-            print(f"Error executing client orders query: {e}")
-            import traceback
-            traceback.print_exc()
-            return {"summary": [], "details": []}
+        Сводка - по клиентам: количество разных надзадач (nad_zad_name) и сумма sum_project,
+        по убыванию количества (при равенстве - в порядке клиентов из SQL), последней строкой
+        ИТОГО. Типы значений те же, что у прежнего SQL-агрегата: сумма - NUMERIC, количество -
+        NUMERIC (строка ИТОГО - SUM(bigint) в том же UNION ALL), итог без клиентов - NULL.
+        
+        Returns:
+            {"summary": Клиент, Кол-во заказов, Сумма; "details": строки без nad_zad_name}
+        """
+        client_index = orders.columns.index("client")
+        sum_index = orders.columns.index("sum_project")
+        order_index = orders.columns.index("nad_zad_name")
+        as_float = settings.DASHBOARD_DECIMAL_AS_FLOAT
+        
+        clients = []
+        for client, rows in itertools.groupby(orders.rows, key=operator.itemgetter(client_index)):
+            rows = list(rows)
+            order_count = len({row[order_index] for row in rows if row[order_index] is not None})
+            clients.append((client, order_count, _exact_sum(row[sum_index] for row in rows)))
+        # sorted устойчива: при равном количестве клиенты остаются в порядке ORDER BY kontr_name
+        clients.sort(key=lambda client: -client[1])
+        
+        total_count = Decimal(sum(client[1] for client in clients)) if clients else None
+        total_sum = _exact_sum(client[2] for client in clients)
+        summary = [(client, Decimal(order_count), client_sum) for client, order_count, client_sum in clients]
+        summary.append(("ИТОГО", total_count, total_sum))
+        if as_float:
+            summary = [tuple(float(value) if isinstance(value, Decimal) else value for value in row) for row in summary]
+        
+        details = QueryResult(orders.columns[:order_index], [row[:order_index] for row in orders.rows])
+        return {
+            "summary": QueryResult(["Клиент", "Кол-во заказов", "Сумма"], summary),
+            "details": details,
+        }
     
     def _get_waiting_sales_data(self, user_full_name: str) -> Dict:
         """
@@ -1054,8 +1180,67 @@ class DashboardService:
         """
         print(f"🔍 Executing waiting sales query for user: '{user_full_name}'")
         
+        try:
+            details = self._query(self._waiting_sales_query(), {"user_name": user_full_name})
+            
+            print(f"✅ Waiting sales query executed")
+            print(f"   Details rows: {len(details)}")
+            
+            return {
+                "summary": QueryResult([], []),  # Не нужна сводная таблица
+                "details": details
+            }
+        except Exception as e:
+            print(f"Error executing waiting sales query: {e}")
+            traceback.print_exc()
+            raise
+    
+    def _waiting_sales_from_scan(self, shared_scan: SharedScan, user_full_name: str) -> Dict:
+        """
+        Задачи, ожидающие документов от продаж, из общего чтения источников: те же строки
+        и порядок, что у _waiting_sales_query (ORDER BY category, waiting_days DESC)
+        """
+        details = []
+        if user_full_name != EXCLUDED_USER:
+            for category, entity in CATEGORY_ENTITIES:
+                rows = shared_scan.rows(entity)
+                task_id, task_name, waiting_days, status, date_create = (
+                    rows.columns.index(name) for name in ("task_id", "task_name", "waiting_days", "status", "date_create")
+                )
+                details.extend(
+                    (category, row[task_id], row[task_name], row[waiting_days], row[status])
+                    for row in rows.rows
+                    if row[status] == "Нужно прикрепить документы" and row[date_create] is not None
+                )
+        details.sort(key=lambda row: (row[0], -row[3]))
+        
+        print(f"✅ Waiting sales from shared scan: {len(details)} tasks")
+        return {
+            "summary": QueryResult([], []),  # Не нужна сводная таблица
+            "details": QueryResult(["category", "task_id", "task_name", "waiting_days", "status"], details)
+        }
+    
+    def _waiting_sales_query(self) -> str:
+        """SQL задач, ожидающих документов: категория, task_id, task_name, waiting_days, status"""
+        # Статус должен быть текущим: всегда исходные таблицы групп (см. _overdue_tasks_query)
+        proscheti = source_views.source("proscheti", 'task_id, task_name, date_create, status', """
+            "user" = :user_name
+              AND status = 'Нужно прикрепить документы'
+              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+        """, base_tables=True)
+        obrazci = source_views.source("obrazci", 'task_id, task_name, date_create, status', """
+            "user" = :user_name
+              AND status = 'Нужно прикрепить документы'
+              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+        """, base_tables=True)
+        proizv = source_views.source("proizv", 'task_id, task_name, date_create, status', """
+            "user" = :user_name
+              AND status = 'Нужно прикрепить документы'
+              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+        """, base_tables=True)
+        
         # Детализация задач с task_id, task_name, status и количеством дней ожидания
-        details_query = """
+        return f"""
         SELECT
             'Просчеты' AS category,
             task_id,
@@ -1063,15 +1248,7 @@ class DashboardService:
             ROUND(EXTRACT(EPOCH FROM (NOW() - date_create)) / 86400)::int AS waiting_days,
             COALESCE(status, 'Нужно прикрепить документы') AS status
         FROM (
-            SELECT task_id, task_name, date_create, status FROM proscheti_gr_artema
-            WHERE "user" = :user_name
-              AND status = 'Нужно прикрепить документы'
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            UNION ALL
-            SELECT task_id, task_name, date_create, status FROM proscheti_gr_zheni
-            WHERE "user" = :user_name
-              AND status = 'Нужно прикрепить документы'
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+            {proscheti}
         ) proscheti
         WHERE date_create IS NOT NULL
         
@@ -1084,15 +1261,7 @@ class DashboardService:
             ROUND(EXTRACT(EPOCH FROM (NOW() - date_create)) / 86400)::int AS waiting_days,
             COALESCE(status, 'Нужно прикрепить документы') AS status
         FROM (
-            SELECT task_id, task_name, date_create, status FROM obrazci_gr_artema
-            WHERE "user" = :user_name
-              AND status = 'Нужно прикрепить документы'
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            UNION ALL
-            SELECT task_id, task_name, date_create, status FROM obrazci_gr_zheni
-            WHERE "user" = :user_name
-              AND status = 'Нужно прикрепить документы'
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+            {obrazci}
         ) obrazci
         WHERE date_create IS NOT NULL
         
@@ -1105,36 +1274,12 @@ class DashboardService:
             ROUND(EXTRACT(EPOCH FROM (NOW() - date_create)) / 86400)::int AS waiting_days,
             COALESCE(status, 'Нужно прикрепить документы') AS status
         FROM (
-            SELECT task_id, task_name, date_create, status FROM proizv_gr_artema
-            WHERE "user" = :user_name
-              AND status = 'Нужно прикрепить документы'
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
-            UNION ALL
-            SELECT task_id, task_name, date_create, status FROM proizv_gr_zheni
-            WHERE "user" = :user_name
-              AND status = 'Нужно прикрепить документы'
-              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+            {proizv}
         ) proizv
         WHERE date_create IS NOT NULL
         
         ORDER BY category, waiting_days DESC
         """
-        
-        try:
-            details = execute_query(details_query, {"user_name": user_full_name})
-            
-            print(f"✅ Waiting sales query executed")
-            print(f"   Details rows: {len(details)}")
-            
-            return {
-                "summary": [],  # Не нужна сводная таблица
-                "details": details
-            }
-        except Exception as e:
-            print(f"Error executing waiting sales query: {e}")
-            import traceback
-            traceback.print_exc()
-            return {"summary": [], "details": []}
     
     def _get_preparation_time_data(self, user_full_name: str) -> List[Dict]:
         """
@@ -1182,7 +1327,8 @@ class DashboardService:
                     # Находим FROM и добавляем WHERE после него
                     query += ' WHERE "user" = :user_name'
             
-            result = execute_query(query, {"user_name": user_full_name})
+            with using_statement_timeout(settings.statement_timeouts.get("custom_query")):
+                result = execute_query(query, {"user_name": user_full_name})
             return result
         except Exception as e:
             print(f"Error executing custom query: {e}")
@@ -0,0 +1,108 @@
+"""
+Финансовый календарь: границы кварталов и финансового года (1 марта - 28/29 февраля)
+
+Границы вычисляются в Python один раз на запрос дашборда и передаются в SQL
+параметрами (:fiscal_year_start, :current_quarter_end, ...). Текст запросов секций
+не зависит от даты и выбранного года, а условия по колонкам дат остаются простыми
+диапазонами, для которых планировщик использует индексы.
+"""
+import datetime
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+
+# Месяц начала финансового года (март)
+FISCAL_YEAR_START_MONTH = 3
+
+
+class FiscalPeriods(NamedTuple):
+    """Границы периодов дашборда: начало включительно, конец не включительно"""
+    fiscal_year_start: datetime.date
+    fiscal_year_end: datetime.date
+    current_quarter_start: datetime.date
+    current_quarter_end: datetime.date
+    previous_quarter_start: datetime.date
+    previous_quarter_end: datetime.date
+    # Текущий финансовый год (независимо от выбранного) до конца текущего месяца
+    current_fiscal_year_start: datetime.date
+    next_month_start: datetime.date
+
+    def params(self) -> Dict[str, Any]:
+        """Параметры для SQL-запросов секций"""
+        return self._asdict()
+
+
+def _add_months(date: datetime.date, months: int) -> datetime.date:
+    """Первое число месяца, отстоящего от date на months месяцев"""
+    index = date.year * 12 + date.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+class FiscalCalendar:
+    """
+    Границы периодов относительно текущей даты
+
+    Args:
+        clock: Источник текущего времени (для тестов можно передать функцию с фиксированной датой)
+    """
+
+    def __init__(self, clock: Callable[[], datetime.datetime] = datetime.datetime.now):
+        self.clock = clock
+
+    def today(self) -> datetime.date:
+        return self.clock().date()
+
+    def fiscal_year_bounds(self, fiscal_year: str = "current") -> Tuple[datetime.date, datetime.date]:
+        """
+        Начало и конец финансового года
+
+        Args:
+            fiscal_year: "current" - год, в который входит текущая дата, "previous" - предыдущий
+        """
+        today = self.today()
+        start_year = today.year if today.month >= FISCAL_YEAR_START_MONTH else today.year - 1
+        if fiscal_year == "previous":
+            start_year -= 1
+        start = datetime.date(start_year, FISCAL_YEAR_START_MONTH, 1)
+        return start, _add_months(start, 12)
+
+    def quarter_bounds(self, offset: int = 0) -> Tuple[datetime.date, datetime.date]:
+        """
+        Начало и конец календарного квартала
+
+        Args:
+            offset: 0 - текущий квартал, -1 - прошлый
+        """
+        today = self.today()
+        start = _add_months(datetime.date(today.year, today.month - (today.month - 1) % 3, 1), 3 * offset)
+        return start, _add_months(start, 3)
+
+    def closed_fiscal_year_start(self, fiscal_year: str) -> Optional[datetime.date]:
+        """
+        Начало закрытого финансового года для fiscal_year="previous"
+
+        Returns:
+            Дата начала прошлого финансового года или None для текущего (он еще не закрыт)
+        """
+        if fiscal_year != "previous":
+            return None
+        return self.fiscal_year_bounds("previous")[0]
+
+    def periods(self, fiscal_year: str = "current") -> FiscalPeriods:
+        """Все границы периодов для запроса дашборда"""
+        fiscal_year_start, fiscal_year_end = self.fiscal_year_bounds(fiscal_year)
+        current_quarter_start, current_quarter_end = self.quarter_bounds(0)
+        previous_quarter_start, previous_quarter_end = self.quarter_bounds(-1)
+        return FiscalPeriods(
+            fiscal_year_start=fiscal_year_start,
+            fiscal_year_end=fiscal_year_end,
+            current_quarter_start=current_quarter_start,
+            current_quarter_end=current_quarter_end,
+            previous_quarter_start=previous_quarter_start,
+            previous_quarter_end=previous_quarter_end,
+            current_fiscal_year_start=self.fiscal_year_bounds("current")[0],
+            next_month_start=_add_months(self.today(), 1),
+        )
+
+
+# Создаем singleton экземпляр
+fiscal_calendar = FiscalCalendar()
@@ -0,0 +1,267 @@
+"""
+Помесячные агрегаты для секций-временных рядов
+(migrations/005_create_monthly_rollups.sql)
+
+Секции "Среднее время согласования КП" и "Среднее время принятия производства" считают
+среднее по месяцам. Вместо AVG по всей истории пользователя они читают сумму и количество
+за месяц из таблицы агрегатов (ключ - пользователь и месяц, до 12 строк на финансовый год),
+а сырые строки агрегируют только за месяцы после водяного знака covered_until, поэтому
+новые месяцы не ждут обновления агрегатов. Агрегаты и сырые строки после водяного знака
+читаются из исходных таблиц групп, а не из единых представлений (source_views).
+
+Агрегаты обновляются инкрементально (refresh_rollups.py): пересчитываются месяцы от
+прежнего водяного знака (с запасом DASHBOARD_ROLLUPS_LOOKBACK_MONTHS на догрузку данных)
+до начала текущего месяца, и водяной знак сдвигается. Месяцы раньше этого запаса
+инкрементальное обновление не пересчитывает: исправленный serch_sogl_day, задача,
+переданная другому пользователю, или догруженная история попадают в агрегаты только при
+полном пересчете (refresh(full=True), refresh_rollups.py --full или фоновое обновление
+раз в DASHBOARD_ROLLUPS_FULL_REFRESH_INTERVAL). До него средние за эти месяцы отличаются
+от расчета по сырым данным.
+"""
+import asyncio
+import datetime
+import time
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import text
+
+from ..core.config import settings
+from ..core.database import engine, execute_query, run_in_db_executor
+from ..core.metrics import metrics
+from .fiscal_calendar import _add_months, fiscal_calendar
+from .source_views import base_tables_only, source_views
+
+
+# Водяные знаки агрегатов: месяцы раньше covered_until уже в таблице агрегатов
+WATERMARKS_TABLE = "dashboard_rollup_watermarks"
+
+
+class Rollup(NamedTuple):
+    """Помесячный агрегат value_column по месяцу date_column"""
+    table: str
+    entity: str
+    date_column: str
+    value_column: str
+    # Фильтр строк секции (без "user" = :user_name)
+    condition: str
+
+
+ROLLUPS = {
+    "approval_time": Rollup(
+        table="approval_time_monthly",
+        entity="proscheti",
+        date_column="cp_sogl",
+        value_column="serch_sogl_day",
+        condition="""
+              serch_date IS NOT NULL
+              AND cp_sogl IS NOT NULL
+              AND (serch_date <> '1970-01-01' OR serch_date IS NULL)
+              AND (cp_sogl <> '1970-01-01' OR cp_sogl IS NULL)
+              AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+        """,
+    ),
+    "production_acceptance_time": Rollup(
+        table="production_acceptance_monthly",
+        entity="proizv",
+        date_column="date_accept",
+        value_column="colvo_days_accept",
+        condition="""
+              ("user" <> 'Артем Василевский' OR "user" IS NULL)
+              AND date_accept IS NOT NULL
+        """,
+    ),
+}
+
+
+class MonthlyRollups:
+    """Чтение и инкрементальное обновление помесячных агрегатов"""
+
+    def __init__(self):
+        # Созданы ли таблицы агрегатов в БД (None - еще не проверяли)
+        self._available: Optional[bool] = None
+
+    def available(self) -> bool:
+        """
+        Читать ли агрегаты
+
+        Наличие таблиц проверяется один раз: без миграции 005 секции считают
+        средние по сырым строкам, как раньше.
+        """
+        if not settings.DASHBOARD_MONTHLY_ROLLUPS:
+            return False
+        if self._available is None:
+            try:
+                tables = [WATERMARKS_TABLE] + [rollup.table for rollup in ROLLUPS.values()]
+                checks = ", ".join(f"to_regclass('{table}') IS NOT NULL AS {table}" for table in tables)
+                row = execute_query(f"SELECT {checks}")[0]
+                self._available = all(row.values())
+            except Exception as e:
+                print(f"⚠️ Could not check monthly rollups: {e}")
+                return False
+            if not self._available:
+                print("⚠️ Monthly rollup tables not found (migration 005), averaging raw rows")
+        return self._available
+
+    def monthly_query(self, name: str, start: str, end: str) -> str:
+        """
+        SELECT month_date, avg_days пользователя :user_name за месяцы [:start, :end)
+
+        Месяцы до водяного знака - из таблицы агрегатов (сумма / количество, как AVG),
+        остальные - AVG по сырым строкам исходных таблиц (как у агрегатов). Без агрегатов -
+        только по сырым строкам.
+
+        Args:
+            name: Ключ ROLLUPS (id секции)
+            start: Имя параметра начала периода (первое число месяца)
+            end: Имя параметра конца периода (первое число месяца, не включительно)
+
+        Внутри using_base_tables агрегаты не читаются.
+        """
+        rollup = ROLLUPS[name]
+        use_rollups = not base_tables_only() and self.available()
+        rows = source_views.source(
+            rollup.entity, f'{rollup.date_column}, {rollup.value_column}, "user"',
+            f'"user" = :user_name\n              AND {rollup.condition.strip()}',
+            base_tables=use_rollups,
+        )
+        month = f"DATE_TRUNC('month', {rollup.date_column})::date"
+        if not use_rollups:
+            return f"""
+            SELECT
+                {month} AS month_date,
+                AVG({rollup.value_column}) AS avg_days
+            FROM (
+                {rows}
+            ) combined
+            WHERE {rollup.date_column} >= :{start}
+              AND {rollup.date_column} < :{end}
+            GROUP BY {month}
+            """
+
+        covered_until = f"COALESCE((SELECT covered_until FROM {WATERMARKS_TABLE} WHERE rollup = '{name}'), '-infinity'::date)"
+        return f"""
+            SELECT
+                month AS month_date,
+                days_sum / NULLIF(days_count, 0) AS avg_days
+            FROM {rollup.table}
+            WHERE "user" = :user_name
+              AND month >= :{start}
+              AND month < LEAST(:{end}, {covered_until})
+            UNION ALL
+            SELECT
+                {month} AS month_date,
+                AVG({rollup.value_column}) AS avg_days
+            FROM (
+                {rows}
+            ) combined
+            WHERE {rollup.date_column} >= GREATEST(:{start}, {covered_until})
+              AND {rollup.date_column} < :{end}
+            GROUP BY {month}
+            """
+
+    def refresh(self, full: bool = False) -> Dict[str, int]:
+        """
+        Пересчитывает агрегаты за месяцы от водяного знака до начала текущего месяца
+
+        Каждый агрегат обновляется в своей транзакции: секции видят либо прежние
+        агрегаты с прежним водяным знаком, либо новые. Одновременные обновления
+        одного агрегата выполняются по очереди (блокировка строки водяного знака).
+
+        Args:
+            full: Пересчитать всю историю
+
+        Returns:
+            Количество записанных строк (пользователь, месяц) каждого агрегата
+        """
+        covered_until = fiscal_calendar.today().replace(day=1)
+        written = {}
+        for name, rollup in ROLLUPS.items():
+            started = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    written[name] = self._refresh_rollup(conn, name, rollup, covered_until, full)
+            except Exception:
+                metrics.inc("monthly_rollups_refresh_errors")
+                raise
+            print(f"🔄 Refreshed {rollup.table}: {written[name]} rows in {time.perf_counter() - started:.2f} s")
+        metrics.inc("monthly_rollups_refreshes")
+        self._available = None
+        return written
+
+    def _refresh_rollup(self, conn, name: str, rollup: Rollup, covered_until: datetime.date, full: bool) -> int:
+        conn.execute(
+            text(f"INSERT INTO {WATERMARKS_TABLE} (rollup) VALUES (:rollup) ON CONFLICT (rollup) DO NOTHING"),
+            {"rollup": name},
+        )
+        previous = conn.execute(
+            text(f"SELECT covered_until FROM {WATERMARKS_TABLE} WHERE rollup = :rollup FOR UPDATE"),
+            {"rollup": name},
+        ).scalar()
+
+        # Месяцы [refresh_from, covered_until) пересчитываются целиком
+        params = {"covered_until": covered_until}
+        refresh_condition = ""
+        if previous is not None and not full:
+            params["refresh_from"] = min(_add_months(previous, -settings.DASHBOARD_ROLLUPS_LOOKBACK_MONTHS), covered_until)
+            refresh_condition = f"AND {rollup.date_column} >= :refresh_from"
+            conn.execute(text(f"DELETE FROM {rollup.table} WHERE month >= :refresh_from"), params)
+        else:
+            conn.execute(text(f"DELETE FROM {rollup.table}"))
+
+        # Исходные таблицы: единые представления могут отставать от них до своего обновления
+        rows = source_views.source(
+            rollup.entity, f'{rollup.date_column}, {rollup.value_column}, "user"',
+            f'"user" IS NOT NULL\n              AND {rollup.condition.strip()}',
+            base_tables=True,
+        )
+        month = f"DATE_TRUNC('month', {rollup.date_column})::date"
+        result = conn.execute(text(f"""
+            INSERT INTO {rollup.table} ("user", month, days_sum, days_count)
+            SELECT
+                "user",
+                {month},
+                COALESCE(SUM({rollup.value_column}), 0),
+                COUNT({rollup.value_column})
+            FROM (
+                {rows}
+            ) combined
+            WHERE {rollup.date_column} < :covered_until
+              {refresh_condition}
+            GROUP BY "user", {month}
+        """), params)
+        conn.execute(
+            text(f"""
+                UPDATE {WATERMARKS_TABLE}
+                SET covered_until = :covered_until, refreshed_at = CURRENT_TIMESTAMP
+                WHERE rollup = :rollup
+            """),
+            {"rollup": name, "covered_until": covered_until},
+        )
+        return result.rowcount
+
+    async def refresh_periodically(self, interval: float, full_interval: float = 0.0) -> None:
+        """
+        Обновляет агрегаты каждые interval секунд (фоновая задача приложения)
+
+        Args:
+            interval: Период инкрементального обновления, секунды
+            full_interval: Не реже чем раз в full_interval секунд обновление пересчитывает всю
+                историю (изменения месяцев до запаса DASHBOARD_ROLLUPS_LOOKBACK_MONTHS); 0 - никогда
+        """
+        last_full = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            if not self.available():
+                continue
+            full = full_interval > 0 and time.monotonic() - last_full >= full_interval
+            try:
+                await run_in_db_executor(self.refresh, full)
+            except Exception as e:
+                print(f"❌ Monthly rollups refresh failed: {e}")
+                continue
+            if full:
+                last_full = time.monotonic()
+
+
+# Создаем singleton экземпляр
+monthly_rollups = MonthlyRollups()
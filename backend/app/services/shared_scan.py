@@ -0,0 +1,147 @@
+"""
+Общее чтение источников дашборда за один запрос (shared scan)
+
+Просроченные задачи, ожидание продаж, обе конверсии и заказы клиентов читают одни и те же
+таблицы просчетов, образцов и производств одного пользователя. SharedScan читает строки
+пользователя из каждой сущности один раз на запрос дашборда - с объединением колонок и
+фильтров этих секций, - а секции вычисляются из прочитанных строк в памяти
+(DashboardService._*_from_scan). Сущность читается при первом обращении секции к ней:
+если остальные секции взяты из кэша, лишние таблицы не читаются.
+"""
+import threading
+from typing import Callable, Dict, Optional
+
+from ..core.database import QueryResult
+from ..core.metrics import metrics
+from .fiscal_calendar import FiscalPeriods
+from .source_views import source_views
+
+
+# Колонки каждой сущности, нужные секциям на общем чтении
+SCAN_COLUMNS = {
+    "proscheti": "task_id, task_name, status, prosrok_now, prosr_day, date_create, cp_finish",
+    "obrazci": "task_id, task_name, status, prosrok_now, prosr_day, date_create",
+    "proizv": "task_id, task_name, status, prosrok_now, prosr_day, date_create, kontr_name, nad_zad_name, sum_project",
+}
+
+# Колонка с датой, по которой строки сущности попадают в периоды: КП - по завершению
+# просчета, образцы и производства - по созданию
+SCAN_DATE_COLUMNS = {
+    "proscheti": "cp_finish",
+    "obrazci": "date_create",
+    "proizv": "date_create",
+}
+
+# Периоды (ключи FiscalPeriods.params()), для которых общее чтение отмечает строки колонками
+# in_<период>: периоды конверсий и финансовый год заказов клиентов
+SCAN_PERIODS = ("current_quarter", "previous_quarter", "fiscal_year")
+
+# Порядок строк сущности: производства - как у детализации заказов клиентов
+# (сортировка по правилам сортировки БД сохраняется после фильтрации в памяти)
+SCAN_ORDER = {
+    "proizv": "ORDER BY kontr_name, task_name",
+}
+
+
+def scan_query(entity: str) -> str:
+    """
+    SQL общего чтения сущности: строки пользователя :user_name с колонками SCAN_COLUMNS
+
+    Читаются только строки, нужные хотя бы одной секции: просроченные (prosrok_now),
+    ждущие документов (status) и с датой SCAN_DATE_COLUMNS в объединении периодов
+    SCAN_PERIODS (образцы и производства - и с пустой датой, их считают конверсии), -
+    как у SQL секций, по индексам migrations/004. Попадание даты в каждый период
+    вычисляется в БД (in_<период>, NULL при пустой дате): границы периодов - date, а
+    колонки могут быть date, timestamp или timestamptz.
+
+    waiting_days (дни с создания задачи) считается в БД, как в запросе секции ожидания
+    продаж: NOW() - время начала транзакции (снимка) запроса. Общее чтение обслуживает
+    просроченные задачи и ожидание продаж, которым нужны текущие статусы, поэтому
+    читает исходные таблицы, а не единые представления.
+
+    Параметры: :user_name и границы периодов FiscalPeriods.params().
+    """
+    date_column = SCAN_DATE_COLUMNS[entity]
+    scan_start = ", ".join(f":{period}_start" for period in SCAN_PERIODS)
+    scan_end = ", ".join(f":{period}_end" for period in SCAN_PERIODS)
+    in_periods = "".join(
+        f",\n        {date_column} >= :{period}_start AND {date_column} < :{period}_end AS in_{period}"
+        for period in SCAN_PERIODS
+    )
+    empty_date = f"{date_column} IS NULL OR " if date_column == "date_create" else ""
+    rows = source_views.source(entity, SCAN_COLUMNS[entity], f"""
+        "user" = :user_name
+          AND (
+            prosrok_now = 'Да'
+            OR status = 'Нужно прикрепить документы'
+            OR {empty_date}({date_column} >= LEAST({scan_start}) AND {date_column} < GREATEST({scan_end}))
+          )
+    """, base_tables=True)
+    return f"""
+    SELECT
+        {SCAN_COLUMNS[entity]},
+        ROUND(EXTRACT(EPOCH FROM (NOW() - date_create)) / 86400)::int AS waiting_days{in_periods}
+    FROM (
+        {rows}
+    ) {entity}
+    {SCAN_ORDER.get(entity, "")}
+    """
+
+
+def exists_query(entity: str) -> str:
+    """SQL: есть ли у пользователя :user_name строки сущности (без фильтров общего чтения)"""
+    rows = source_views.source(entity, "1", '"user" = :user_name', base_tables=True)
+    return f"SELECT EXISTS ({rows}) AS user_has_rows"
+
+
+class SharedScan:
+    """
+    Строки пользователя из источников дашборда, прочитанные один раз на запрос
+
+    Секции вычисляются в разных потоках БД: сущность читает первая обратившаяся к ней
+    секция, остальные ждут ее результат. Если чтение не удалось (ошибка, отмена,
+    statement_timeout), следующая секция читает сущность сама.
+
+    Args:
+        user_full_name: ФИО пользователя
+        query: Выполнение SQL (DashboardService._query) - в unit of work, со statement_timeout
+            и отменой секции, которая читает сущность
+        periods: Границы периодов запроса - те же, что получают секции
+    """
+
+    def __init__(self, user_full_name: str, query: Callable[[str, Optional[Dict]], QueryResult], periods: FiscalPeriods):
+        self.user_full_name = user_full_name
+        self.periods = periods
+        self._query = query
+        self._rows: Dict[str, QueryResult] = {}
+        self._exists: Dict[str, bool] = {}
+        self._locks = {entity: threading.Lock() for entity in SCAN_COLUMNS}
+
+    def params(self) -> Dict:
+        """Параметры SQL общего чтения"""
+        return {"user_name": self.user_full_name, **self.periods.params()}
+
+    def rows(self, entity: str) -> QueryResult:
+        """Строки сущности (proscheti, obrazci или proizv) с колонками SCAN_COLUMNS, waiting_days и in_<период>"""
+        with self._locks[entity]:
+            if entity not in self._rows:
+                rows = self._query(scan_query(entity), self.params())
+                print(f"📚 Shared scan of {entity} for '{self.user_full_name}': {len(rows)} rows")
+                metrics.inc("dashboard_shared_scans")
+                metrics.inc("dashboard_shared_scan_rows", len(rows))
+                self._rows[entity] = rows
+            else:
+                metrics.inc("dashboard_shared_scan_reuses")
+            return self._rows[entity]
+
+    def has_rows(self, entity: str) -> bool:
+        """
+        Есть ли у пользователя строки сущности, в том числе не прочитанные общим чтением
+        (конверсии различают пользователя без целевых задач и без задач в периоде)
+        """
+        if self.rows(entity):
+            return True
+        with self._locks[entity]:
+            if entity not in self._exists:
+                self._exists[entity] = bool(self._query(exists_query(entity), {"user_name": self.user_full_name}).rows[0][0])
+            return self._exists[entity]
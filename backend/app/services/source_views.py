@@ -0,0 +1,140 @@
+"""
+Источники данных дашборда: таблицы *_gr_artema / *_gr_zheni или единые материализованные
+представления над ними (migrations/003_create_unified_source_views.sql)
+"""
+import asyncio
+import contextlib
+import contextvars
+import time
+from typing import Dict, Iterator, Optional
+from sqlalchemy import text
+from ..core.config import settings
+from ..core.database import engine, execute_query, run_in_db_executor
+from ..core.metrics import metrics
+
+
+# Группы исходных таблиц: <сущность>_<группа>
+SOURCE_GROUPS = ("gr_artema", "gr_zheni")
+
+# Единое представление для каждой сущности (просчеты, образцы, производства)
+UNIFIED_VIEWS = {
+    "proscheti": "proscheti_all",
+    "obrazci": "obrazci_all",
+    "proizv": "proizv_all",
+}
+
+
+# Читать исходные таблицы, а не представления (см. using_base_tables)
+_base_tables_only: contextvars.ContextVar[bool] = contextvars.ContextVar("base_tables_only", default=False)
+
+
+@contextlib.contextmanager
+def using_base_tables() -> Iterator[None]:
+    """
+    SQL, собранный внутри блока, читает исходные таблицы, а не единые представления
+    и помесячные агрегаты (результаты, которые сохраняются надолго, не должны зависеть
+    от момента обновления производных данных)
+    """
+    token = _base_tables_only.set(True)
+    try:
+        yield
+    finally:
+        _base_tables_only.reset(token)
+
+
+def base_tables_only() -> bool:
+    """Собирается ли SQL внутри using_base_tables"""
+    return _base_tables_only.get()
+
+
+class SourceViews:
+    """Выбор источника для SQL-запросов дашборда и обновление единых представлений"""
+
+    def __init__(self):
+        # Созданы ли представления в БД (None - еще не проверяли)
+        self._available: Optional[bool] = None
+
+    def available(self) -> bool:
+        """
+        Использовать ли единые представления
+
+        Наличие представлений проверяется один раз: без миграции 003 запросы
+        идут к исходным таблицам, как раньше.
+        """
+        if not settings.DASHBOARD_UNIFIED_VIEWS:
+            return False
+        if self._available is None:
+            try:
+                checks = ", ".join(
+                    f"to_regclass('{view}') IS NOT NULL AS {entity}"
+                    for entity, view in UNIFIED_VIEWS.items()
+                )
+                row = execute_query(f"SELECT {checks}")[0]
+                self._available = all(row.values())
+            except Exception as e:
+                print(f"⚠️ Could not check unified source views: {e}")
+                return False
+            if not self._available:
+                print("⚠️ Unified source views not found (migration 003), querying group tables")
+        return self._available
+
+    def source(self, entity: str, columns: str, condition: Optional[str] = None, base_tables: bool = False) -> str:
+        """
+        SELECT строк сущности для подзапроса FROM (...)
+
+        Args:
+            entity: proscheti, obrazci или proizv
+            columns: Список колонок
+            condition: Условие WHERE (например, '"user" = :user_name')
+            base_tables: Всегда читать исходные таблицы (так же внутри using_base_tables)
+
+        Returns:
+            SELECT из единого представления или UNION ALL по таблицам групп
+        """
+        where = f"\n            WHERE {condition.strip()}" if condition else ""
+        if not base_tables and not base_tables_only() and self.available():
+            return f"SELECT {columns} FROM {UNIFIED_VIEWS[entity]}{where}"
+        return "\n            UNION ALL\n            ".join(
+            f"SELECT {columns} FROM {entity}_{group}{where}" for group in SOURCE_GROUPS
+        )
+
+    def refresh(self, concurrently: bool = True) -> Dict[str, float]:
+        """
+        Обновляет единые представления после загрузки данных в исходные таблицы
+
+        CONCURRENTLY не блокирует чтение дашбордами на время обновления.
+        Каждое представление обновляется в своей транзакции.
+
+        Returns:
+            Время обновления каждого представления, секунды
+        """
+        durations = {}
+        mode = "CONCURRENTLY " if concurrently else ""
+        for view in UNIFIED_VIEWS.values():
+            started = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(f"REFRESH MATERIALIZED VIEW {mode}{view}"))
+            except Exception:
+                metrics.inc("source_views_refresh_errors")
+                raise
+            durations[view] = time.perf_counter() - started
+            print(f"🔄 Refreshed {view} in {durations[view]:.2f} s")
+        metrics.inc("source_views_refreshes")
+        self._available = None
+        return durations
+
+    async def refresh_periodically(self, interval: float) -> None:
+        """Обновляет представления каждые interval секунд (фоновая задача приложения)"""
+        while True:
+            await asyncio.sleep(interval)
+            if not self.available():
+                continue
+            try:
+                await run_in_db_executor(self.refresh)
+            except Exception as e:
+                print(f"❌ Unified source views refresh failed: {e}")
+
+
+# Создаем singleton экземпляр
+source_views = SourceViews()
@@ -1,67 +1,244 @@
 """
-Скрипт для применения миграции через Python
+Применение миграций базы данных (migrations/NNN_описание.sql)
+
+Применённые версии записываются в таблицу schema_migrations, поэтому повторный
+запуск применяет только новые миграции.
+
+Использование:
+    python apply_migration.py                # применить все новые миграции
+    python apply_migration.py --status       # список миграций и их состояние
+    python apply_migration.py --reapply 004  # применить миграцию повторно (например, после пересоздания таблиц)
+
+Подключение берется из backend/.env (DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME).
+
+Миграция выполняется в одной транзакции. Если в файле есть строка
+"-- migration: no-transaction" (нужно для CREATE INDEX CONCURRENTLY), команды
+выполняются по одной вне транзакции; такие миграции должны быть идемпотентными
+(IF NOT EXISTS), так как при ошибке уже выполненные команды не откатываются.
+Прерванный CREATE INDEX CONCURRENTLY оставляет индекс INVALID, который IF NOT EXISTS
+при повторе пропустил бы: такой индекс удаляется и строится заново, а миграция
+не записывается как примененная, пока хоть один ее индекс INVALID.
 """
-import psycopg2
+import argparse
+import hashlib
+import re
+import sys
 from pathlib import Path
 
-# Параметры подключения
-DB_CONFIG = {
-    'host': 'pg4.sweb.ru',
-    'port': 5433,
-    'database': 'headcorne_test',
-    'user': 'headcorne_test',
-    'password': 'Ss8SRGP5TH3W6J@L'
-}
-
-def apply_migration():
-    """Применяет миграцию из файла"""
-    # Читаем SQL файл
-    migration_file = Path(__file__).parent / 'migrations' / '001_create_users_table.sql'
-    
-    with open(migration_file, 'r', encoding='utf-8') as f:
-        sql_script = f.read()
-    
-    # Подключаемся к БД
+import psycopg2
+
+BACKEND_DIR = Path(__file__).parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.core.config import Settings
+
+MIGRATIONS_DIR = BACKEND_DIR / 'migrations'
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d+)_(.+)\.sql$')
+NO_TRANSACTION_MARKER = '-- migration: no-transaction'
+CONCURRENT_INDEX_PATTERN = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?("?[\w.]+"?)',
+    re.IGNORECASE,
+)
+
+SCHEMA_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(32) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    checksum VARCHAR(64) NOT NULL,           -- sha256 файла миграции
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def find_migrations():
+    """Файлы миграций, отсортированные по номеру версии"""
+    migrations = []
+    for path in MIGRATIONS_DIR.glob('*.sql'):
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if match:
+            migrations.append({
+                'version': match.group(1),
+                'name': match.group(2),
+                'path': path,
+            })
+    return sorted(migrations, key=lambda migration: int(migration['version']))
+
+
+def split_statements(sql_script: str):
+    """
+    Делит SQL-скрипт на отдельные команды по ';' в конце строки
+
+    Достаточно для миграций проекта (DDL без функций с $$-телами).
+    """
+    statements = []
+    current = []
+    for line in sql_script.splitlines():
+        current.append(line)
+        if line.rstrip().endswith(';'):
+            statement = '\n'.join(current).strip()
+            current = []
+            if _has_code(statement):
+                statements.append(statement)
+    tail = '\n'.join(current).strip()
+    if _has_code(tail):
+        statements.append(tail)
+    return statements
+
+
+def _has_code(statement: str) -> bool:
+    """Есть ли в тексте что-то кроме комментариев"""
+    return any(
+        line.strip() and not line.strip().startswith('--')
+        for line in statement.splitlines()
+    )
+
+
+def index_is_invalid(cursor, index_name: str) -> bool:
+    """Есть ли индекс index_name в состоянии INVALID (прерванное построение CONCURRENTLY)"""
+    cursor.execute(
+        'SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)',
+        (index_name,),
+    )
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def execute_without_transaction(cursor, statements):
+    """
+    Выполняет команды миграции по одной вне транзакции
+
+    Перед CREATE INDEX CONCURRENTLY удаляет INVALID-индекс с тем же именем, после -
+    проверяет, что индекс построен.
+
+    Raises:
+        RuntimeError: Индекс остался INVALID
+    """
+    for statement in statements:
+        match = CONCURRENT_INDEX_PATTERN.search(statement)
+        index_name = match.group(1) if match else None
+        if index_name and index_is_invalid(cursor, index_name):
+            print(f"⚠️ Индекс {index_name} INVALID (прерванное построение) - удаляется и строится заново")
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name}')
+        cursor.execute(statement)
+        if index_name and index_is_invalid(cursor, index_name):
+            raise RuntimeError(f"Индекс {index_name} остался INVALID")
+
+
+def connect():
+    """Подключение к БД по настройкам из backend/.env"""
+    settings = Settings(_env_file=BACKEND_DIR / '.env')
+    return psycopg2.connect(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        dbname=settings.DB_NAME,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+    )
+
+
+def applied_migrations(conn):
+    """Словарь {версия: checksum} примененных миграций"""
+    with conn.cursor() as cursor:
+        cursor.execute(SCHEMA_MIGRATIONS_TABLE)
+        conn.commit()
+        cursor.execute('SELECT version, checksum FROM schema_migrations')
+        return dict(cursor.fetchall())
+
+
+def apply_migration(conn, migration):
+    """Применяет одну миграцию и записывает ее версию в schema_migrations"""
+    sql_script = migration['path'].read_text(encoding='utf-8')
+    checksum = hashlib.sha256(sql_script.encode('utf-8')).hexdigest()
+    record = """
+        INSERT INTO schema_migrations (version, name, checksum)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (version) DO UPDATE
+        SET name = EXCLUDED.name, checksum = EXCLUDED.checksum, applied_at = CURRENT_TIMESTAMP
+    """
+    params = (migration['version'], migration['name'], checksum)
+
+    if NO_TRANSACTION_MARKER in sql_script:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                execute_without_transaction(cursor, split_statements(sql_script))
+                cursor.execute(record, params)
+        finally:
+            conn.autocommit = False
+        return
+
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        print("✅ Подключение к БД успешно!")
-        
-        # Выполняем SQL
-        cursor.execute(sql_script)
+        with conn.cursor() as cursor:
+            cursor.execute(sql_script)
+            cursor.execute(record, params)
         conn.commit()
-        
-        print("✅ Миграция применена успешно!")
-        
-        # Проверяем что таблица создана
-        cursor.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_name = 'users'
-            );
-        """)
-        
-        if cursor.fetchone()[0]:
-            print("✅ Таблица 'users' создана!")
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def show_status(conn, migrations):
+    """Печатает список миграций и их состояние"""
+    applied = applied_migrations(conn)
+    for migration in migrations:
+        checksum = applied.get(migration['version'])
+        if checksum is None:
+            state = 'ожидает'
+        elif checksum != _file_checksum(migration):
+            state = 'применена, файл изменен'
         else:
-            print("❌ Таблица 'users' не найдена!")
-        
-        cursor.close()
-        conn.close()
-        
-    except Exception as e:
-        print(f"❌ Ошибка: {e}")
-        if conn:
-            conn.rollback()
-            conn.close()
+            state = 'применена'
+        print(f"{migration['version']}  {migration['name']:<45} {state}")
 
-if __name__ == "__main__":
-    apply_migration()
 
+def _file_checksum(migration) -> str:
+    return hashlib.sha256(migration['path'].read_bytes()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Применение миграций базы данных')
+    parser.add_argument('--status', action='store_true', help='Показать состояние миграций')
+    parser.add_argument('--reapply', metavar='VERSION', help='Применить миграцию повторно')
+    args = parser.parse_args()
+
+    migrations = find_migrations()
+
+    try:
+        conn = connect()
+    except Exception as e:
+        print(f"❌ Ошибка подключения к БД: {e}")
+        sys.exit(1)
+    print("✅ Подключение к БД успешно!")
 
+    try:
+        if args.status:
+            show_status(conn, migrations)
+            return
 
+        if args.reapply:
+            pending = [m for m in migrations if int(m['version']) == int(args.reapply)]
+            if not pending:
+                print(f"❌ Миграция {args.reapply} не найдена")
+                sys.exit(1)
+        else:
+            applied = applied_migrations(conn)
+            pending = [m for m in migrations if m['version'] not in applied]
 
+        if not pending:
+            print("✅ Новых миграций нет")
+            return
 
+        for migration in pending:
+            print(f"⏳ Применяется {migration['path'].name}...")
+            try:
+                apply_migration(conn, migration)
+            except Exception as e:
+                print(f"❌ Ошибка в {migration['path'].name}: {e}")
+                sys.exit(1)
+            print(f"✅ {migration['path'].name} применена")
+    finally:
+        conn.close()
 
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Проверка и бенчмарк секции "Заказы от клиентов"
+
+Сравнивает текущую форму (один проход по производствам: детализация + сводка по клиентам
+и ИТОГО, посчитанные из строк детализации) с прежней (отдельные SQL для сводки и детализации):
+
+    python benchmark_client_orders.py --check               # сравнить на данных БД (пользователи с наибольшим числом производств)
+    python benchmark_client_orders.py --orders 5000         # синтетические данные: проверка и замер времени
+
+В режиме бенчмарка исходные таблицы подменяются временными (TEMP) таблицами в одном
+соединении: реальные данные не читаются и не изменяются. Кроме пользователя с --orders
+заказами создаются пользователи с особыми случаями (клиент не указан, пустые названия и
+суммы, заказы вне финансового года).
+"""
+import argparse
+import datetime
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import QueryResult, engine
+from app.services.dashboard_service import dashboard_service
+from app.services.fiscal_calendar import fiscal_calendar
+from app.services.source_views import source_views
+
+STATUS_FILTERS = ("active", "completed", "all")
+
+
+def legacy_queries(status_filter: str):
+    """Прежние запросы секции: сводка (GROUP BY клиента + ИТОГО) и детализация"""
+    status_condition = ""
+    if status_filter == "active":
+        status_condition = "AND status IS NOT NULL AND status != 'Завершенная'"
+    elif status_filter == "completed":
+        status_condition = "AND status = 'Завершенная'"
+    proizv = source_views.source("proizv", 'kontr_name, nad_zad_name, task_name, task_id, sum_project, status, "user", date_create', """
+        "user" = :user_name
+          AND date_create IS NOT NULL
+    """)
+    summary_query = f"""
+    WITH client_data AS (
+        SELECT
+            kontr_name,
+            COUNT(DISTINCT CASE WHEN nad_zad_name IS NOT NULL THEN nad_zad_name END) AS order_count,
+            SUM(COALESCE(sum_project, 0)) AS total_sum
+        FROM ({proizv}) combined
+        WHERE date_create >= :fiscal_year_start
+        AND date_create < :fiscal_year_end
+        {status_condition}
+        GROUP BY kontr_name
+    ),
+    with_total AS (
+        SELECT kontr_name AS "Клиент", order_count AS "Кол-во заказов", COALESCE(total_sum, 0) AS "Сумма", 1 AS sort_order
+        FROM client_data
+        UNION ALL
+        SELECT 'ИТОГО', SUM(order_count), COALESCE(SUM(total_sum), 0), 2
+        FROM client_data
+    )
+    SELECT "Клиент", "Кол-во заказов", "Сумма"
+    FROM with_total
+    ORDER BY
+        sort_order,
+        CASE WHEN sort_order = 1 THEN "Кол-во заказов" END DESC,
+        CASE WHEN sort_order = 1 THEN "Клиент" END ASC
+    """
+    details_query = f"""
+    SELECT
+        kontr_name AS client,
+        COALESCE(NULLIF(task_name, ''), nad_zad_name, 'Без названия') AS order_name,
+        task_id,
+        COALESCE(sum_project, 0) AS sum_project,
+        COALESCE(status, 'Без статуса') AS status
+    FROM ({proizv}) combined
+    WHERE date_create >= :fiscal_year_start
+    AND date_create < :fiscal_year_end
+    {status_condition}
+    ORDER BY kontr_name, task_name
+    """
+    return summary_query, details_query
+
+
+def fetch(conn, query: str, params: dict) -> QueryResult:
+    result = conn.execute(text(query), params)
+    return QueryResult(list(result.keys()), [tuple(row) for row in result])
+
+
+def run_legacy(conn, status_filter: str, params: dict):
+    summary_query, details_query = legacy_queries(status_filter)
+    return {"summary": fetch(conn, summary_query, params), "details": fetch(conn, details_query, params)}
+
+
+def run_current(conn, status_filter: str, params: dict):
+    orders = fetch(conn, dashboard_service._client_orders_query(status_filter), params)
+    return dashboard_service._client_orders_result(orders)
+
+
+def timed(func, repeat: int):
+    """Результат func() и медиана времени выполнения, секунды"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    return result, statistics.median(times)
+
+
+def same_result(legacy, current) -> bool:
+    """
+    Сводка совпадает построчно (вместе с типами значений); детализация - как набор строк:
+    порядок строк с одинаковыми kontr_name и task_name в ORDER BY не определен
+    """
+    def typed(rows):
+        return [tuple((type(value).__name__, value) for value in row) for row in rows]
+
+    return (
+        legacy["summary"].columns == current["summary"].columns
+        and typed(legacy["summary"].rows) == typed(current["summary"].rows)
+        and legacy["details"].columns == current["details"].columns
+        and sorted(map(repr, legacy["details"].rows)) == sorted(map(repr, current["details"].rows))
+    )
+
+
+def compare(conn, users, timing: bool = False, repeat: int = 1) -> int:
+    """Сравнивает прежние и текущие запросы для пользователей, возвращает число расхождений"""
+    mismatches = 0
+    for user_name in users:
+        for fiscal_year in ("current", "previous"):
+            params = {"user_name": user_name, **fiscal_calendar.periods(fiscal_year).params()}
+            for status_filter in STATUS_FILTERS:
+                legacy, legacy_time = timed(lambda: run_legacy(conn, status_filter, params), repeat)
+                current, current_time = timed(lambda: run_current(conn, status_filter, params), repeat)
+                same = same_result(legacy, current)
+                if not same:
+                    mismatches += 1
+                line = f"{'✅' if same else '❌'} {user_name} / {fiscal_year} / {status_filter}: {len(current['details'])} заказов"
+                if timing:
+                    line += f", прежний {legacy_time * 1000:.1f} мс, текущий {current_time * 1000:.1f} мс"
+                print(line)
+                if not same:
+                    print(f"   прежний: {legacy['summary'].rows}")
+                    print(f"   текущий: {current['summary'].rows}")
+    return mismatches
+
+
+def top_users(conn, limit: int):
+    """Пользователи с наибольшим количеством производств"""
+    all_users = source_views.source("proizv", '"user"')
+    result = conn.execute(text(f"""
+        SELECT "user" FROM ({all_users}) users
+        WHERE "user" IS NOT NULL
+        GROUP BY "user" ORDER BY COUNT(*) DESC LIMIT :limit
+    """), {"limit": limit})
+    return [row[0] for row in result]
+
+
+def create_synthetic_tables(conn, orders: int):
+    """Временные таблицы производств с именами исходных таблиц (видны только в этом соединении)"""
+    now = datetime.datetime.now()
+    rng = random.Random(42)
+    clients = [f"Клиент {index}" for index in range(max(1, orders // 25))] + ["альфа", "Альфа", "Ёлка"]
+    statuses = ["Завершенная", "В работе", "КП Согласовано", None]
+
+    users = {
+        "Бенчмарк Большой": orders,
+        "Бенчмарк Особые случаи": 300,
+        "Бенчмарк Вне года": 200,
+    }
+    for group in ("gr_artema", "gr_zheni"):
+        conn.execute(text(f"""
+            CREATE TEMP TABLE proizv_{group} (
+                task_id INT, "user" TEXT, kontr_name TEXT, nad_zad_name TEXT, task_name TEXT,
+                sum_project NUMERIC, status TEXT, date_create TIMESTAMP
+            ) ON COMMIT PRESERVE ROWS
+        """))
+
+    rows = []
+    for user_name, count in users.items():
+        special = user_name == "Бенчмарк Особые случаи"
+        for task_id in range(count):
+            days = rng.randint(1500, 2000) if user_name == "Бенчмарк Вне года" else rng.randint(0, 730)
+            rows.append({
+                "task_id": task_id,
+                "user": user_name,
+                "kontr_name": None if special and rng.random() < 0.2 else rng.choice(clients),
+                "nad_zad_name": None if rng.random() < 0.1 else f"НЗ-{rng.randint(0, max(1, orders // 5))}",
+                "task_name": rng.choice(["", None, "Ёж"]) if special else f"Заказ {task_id}",
+                "sum_project": None if special and rng.random() < 0.3 else Decimal(rng.randint(0, 500000)) / 10,
+                "status": rng.choice(statuses),
+                "date_create": now - datetime.timedelta(days=days, hours=rng.randint(0, 23)),
+            })
+
+    # Строки делятся между таблицами групп
+    for index, group in enumerate(("gr_artema", "gr_zheni")):
+        conn.execute(
+            text(f"""
+                INSERT INTO proizv_{group} (task_id, "user", kontr_name, nad_zad_name, task_name, sum_project, status, date_create)
+                VALUES (:task_id, :user, :kontr_name, :nad_zad_name, :task_name, :sum_project, :status, :date_create)
+            """),
+            rows[index::2],
+        )
+        conn.execute(text(f"ANALYZE proizv_{group}"))
+    return list(users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка и бенчмарк секции заказов от клиентов")
+    parser.add_argument("--check", action="store_true", help="Сравнить запросы на данных БД")
+    parser.add_argument("--users", type=int, default=20, help="Сколько пользователей проверить в режиме --check")
+    parser.add_argument("--orders", type=int, default=5000, help="Производств у пользователя в бенчмарке")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов для замера времени (медиана)")
+    args = parser.parse_args()
+
+    if args.check:
+        with engine.connect() as conn:
+            mismatches = compare(conn, top_users(conn, args.users), timing=True, repeat=args.repeat)
+    else:
+        # Временные таблицы подменяют исходные, единые представления не используются
+        settings.DASHBOARD_UNIFIED_VIEWS = False
+        with engine.connect() as conn:
+            print(f"⏳ Создание синтетических данных: {args.orders} производств у пользователя...")
+            users = create_synthetic_tables(conn, args.orders)
+            mismatches = compare(conn, users, timing=True, repeat=args.repeat)
+            conn.rollback()
+
+    if mismatches:
+        print(f"❌ Расхождений: {mismatches}")
+        raise SystemExit(1)
+    print("✅ Результаты совпадают")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Проверка и бенчмарк SQL секций конверсий ("Конверсии КП в образцы", "Конверсии КП в производство")
+
+Сравнивает текущие запросы с прежней формой (LEFT JOIN всех КП пользователя со всеми
+его образцами/производствами по "user" и COUNT(DISTINCT)):
+
+    python benchmark_conversions.py --check                 # сравнить на данных БД (пользователи из proscheti)
+    python benchmark_conversions.py --tasks 10000           # синтетические данные: проверка и замер времени
+
+В режиме бенчмарка исходные таблицы подменяются временными (TEMP) таблицами в одном
+соединении: реальные данные не читаются и не изменяются. Кроме пользователя с --tasks
+задачами создаются пользователи с особыми случаями (без образцов, образцы вне периодов,
+пустые даты и task_id), на которых прежний запрос ведет себя неочевидно.
+"""
+import argparse
+import datetime
+import random
+import time
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services.dashboard_service import dashboard_service
+from app.services.fiscal_calendar import fiscal_calendar
+from app.services.source_views import source_views
+
+SECTIONS = {
+    "conversions": ("obrazci", "Кол-во образцов", dashboard_service._conversions_query),
+    "production_conversions": ("proizv", "Кол-во производств", dashboard_service._production_conversions_query),
+}
+
+SOURCE_CONDITIONS = {
+    "conversions": (
+        '"user" = :user_name',
+        '"user" = :user_name',
+    ),
+    "production_conversions": (
+        '''"user" = :user_name
+          AND ("user" <> 'Артем Василевский' OR "user" IS NULL)
+          AND (status = 'Завершенная' OR status = 'КП Согласовано')''',
+        '''"user" = :user_name
+          AND ("user" <> 'Артем Василевский' OR "user" IS NULL)''',
+    ),
+}
+
+
+def legacy_query(section: str, fiscal_year: str) -> str:
+    """Прежний запрос секции: по периоду LEFT JOIN всех КП со всеми целевыми задачами по "user" """
+    target, target_column, _ = SECTIONS[section]
+    proscheti_condition, target_condition = SOURCE_CONDITIONS[section]
+    proscheti_columns = 'task_id, "user", cp_finish' + (", status" if section == "production_conversions" else "")
+    proscheti = "\nUNION ALL\n".join(
+        f"SELECT {proscheti_columns} FROM proscheti_{group} WHERE {proscheti_condition}"
+        for group in ("gr_artema", "gr_zheni")
+    )
+    targets = "\nUNION ALL\n".join(
+        f'SELECT task_id, "user", date_create FROM {target}_{group} WHERE {target_condition}'
+        for group in ("gr_artema", "gr_zheni")
+    )
+    year_offset = 0 if fiscal_year == "current" else -1
+    fiscal_year_start = f"""CASE WHEN EXTRACT(MONTH FROM NOW()) >= 3
+        THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1)
+        ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int - 1 + {year_offset}, 3, 1) END"""
+    fiscal_year_end = f"""CASE WHEN EXTRACT(MONTH FROM NOW()) >= 3
+        THEN MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + 1 + {year_offset}, 3, 1)
+        ELSE MAKE_DATE(EXTRACT(YEAR FROM NOW())::int + {year_offset}, 3, 1) END"""
+    periods = [
+        ("Текущий квартал", "DATE_TRUNC('quarter', NOW())", "DATE_TRUNC('quarter', NOW() + INTERVAL '3 month')"),
+        ("Прошлый квартал", "DATE_TRUNC('quarter', NOW() - INTERVAL '3 month')", "DATE_TRUNC('quarter', NOW())"),
+        ("Финансовый год", fiscal_year_start, fiscal_year_end),
+    ]
+    blocks = []
+    for title, start, end in periods:
+        blocks.append(f"""
+            SELECT
+                CONCAT('{title} (', TO_CHAR({start}, 'DD.MM.YYYY'), ' - ',
+                       TO_CHAR({end} - INTERVAL '1 day', 'DD.MM.YYYY'), ')') as "Период",
+                COUNT(DISTINCT proscheti.task_id) as "Кол-во КП",
+                COUNT(DISTINCT target.task_id) as "{target_column}",
+                CASE
+                    WHEN COUNT(DISTINCT proscheti.task_id) = 0 THEN 0
+                    ELSE ROUND(
+                        CAST(COUNT(DISTINCT target.task_id) AS NUMERIC) * 100.0 /
+                        NULLIF(COUNT(DISTINCT proscheti.task_id), 0),
+                        2
+                    )
+                END as "Конверсия"
+            FROM ({proscheti}) proscheti
+            LEFT JOIN ({targets}) target ON proscheti."user" = target."user"
+            WHERE proscheti.cp_finish >= {start}
+              AND proscheti.cp_finish < {end}
+              AND (
+                  target.date_create IS NULL
+                  OR (target.date_create >= {start} AND target.date_create < {end})
+              )""")
+    return f"""
+    WITH user_data AS ({" UNION ALL ".join(blocks)})
+    SELECT "Период", "Кол-во КП", "{target_column}", CONCAT("Конверсия", '%') as "Конверсия"
+    FROM user_data
+    ORDER BY
+        CASE
+            WHEN "Период" LIKE 'Текущий квартал%' THEN 1
+            WHEN "Период" LIKE 'Прошлый квартал%' THEN 2
+            WHEN "Период" LIKE 'Финансовый год%' THEN 3
+        END
+    """
+
+
+def run(conn, query: str, params: dict):
+    """Выполняет запрос, возвращает (строки, время в секундах)"""
+    started = time.perf_counter()
+    result = conn.execute(text(query), params)
+    rows = [dict(row._mapping) for row in result]
+    return rows, time.perf_counter() - started
+
+
+def compare(conn, users, timing: bool = False) -> int:
+    """Сравнивает прежние и текущие запросы для пользователей, возвращает число расхождений"""
+    mismatches = 0
+    for user_name in users:
+        for section, (_, _, current_query) in SECTIONS.items():
+            for fiscal_year in ("current", "previous"):
+                legacy_rows, legacy_time = run(conn, legacy_query(section, fiscal_year), {"user_name": user_name})
+                params = {"user_name": user_name, **fiscal_calendar.periods(fiscal_year).params()}
+                current_rows, current_time = run(conn, current_query(), params)
+                status = "✅" if legacy_rows == current_rows else "❌"
+                if legacy_rows != current_rows:
+                    mismatches += 1
+                line = f"{status} {user_name} / {section} / {fiscal_year}"
+                if timing:
+                    line += f": прежний {legacy_time * 1000:.0f} мс, текущий {current_time * 1000:.0f} мс"
+                print(line)
+                if legacy_rows != current_rows:
+                    print(f"   прежний: {legacy_rows}")
+                    print(f"   текущий: {current_rows}")
+    return mismatches
+
+
+def top_users(conn, limit: int):
+    """Пользователи с наибольшим количеством КП"""
+    all_users = source_views.source("proscheti", '"user"')
+    result = conn.execute(text(f"""
+        SELECT "user" FROM ({all_users}) users
+        WHERE "user" IS NOT NULL
+        GROUP BY "user" ORDER BY COUNT(*) DESC LIMIT :limit
+    """), {"limit": limit})
+    return [row[0] for row in result]
+
+
+def create_synthetic_tables(conn, tasks: int):
+    """Временные таблицы с именами исходных таблиц (видны только в этом соединении)"""
+    now = datetime.datetime.now()
+    rng = random.Random(42)
+
+    def some_date(null_share=0.02, days=730):
+        if rng.random() < null_share:
+            return None
+        return now - datetime.timedelta(days=rng.randint(0, days), hours=rng.randint(0, 23))
+
+    users = {
+        "Бенчмарк Большой": (tasks, tasks, None),
+        "Бенчмарк Без образцов": (300, 0, None),
+        "Бенчмарк Образцы вне периодов": (300, 200, datetime.timedelta(days=1500)),
+        "Бенчмарк Пустые даты": (300, 200, "null"),
+    }
+    for entity in ("proscheti", "obrazci", "proizv"):
+        for group in ("gr_artema", "gr_zheni"):
+            conn.execute(text(f"""
+                CREATE TEMP TABLE {entity}_{group} (
+                    task_id INT, "user" TEXT, status TEXT, cp_finish TIMESTAMP, date_create TIMESTAMP
+                ) ON COMMIT PRESERVE ROWS
+            """))
+
+    rows = {entity: [] for entity in ("proscheti", "obrazci", "proizv")}
+    for user_name, (cp_count, target_count, target_dates) in users.items():
+        for task_id in range(cp_count):
+            rows["proscheti"].append({
+                "task_id": task_id if rng.random() > 0.01 else None,
+                "user": user_name,
+                "status": rng.choice(["Завершенная", "КП Согласовано", "В работе"]),
+                "cp_finish": some_date(),
+                "date_create": some_date(),
+            })
+        for entity in ("obrazci", "proizv"):
+            for task_id in range(target_count):
+                if target_dates == "null":
+                    date_create = None if rng.random() < 0.5 else now - datetime.timedelta(days=1500)
+                elif target_dates is not None:
+                    date_create = now - target_dates
+                else:
+                    date_create = some_date()
+                rows[entity].append({
+                    "task_id": task_id, "user": user_name, "status": None,
+                    "cp_finish": None, "date_create": date_create,
+                })
+
+    for entity, entity_rows in rows.items():
+        # Строки делятся между таблицами групп
+        for index, group in enumerate(("gr_artema", "gr_zheni")):
+            part = entity_rows[index::2]
+            if part:
+                conn.execute(
+                    text(f"""
+                        INSERT INTO {entity}_{group} (task_id, "user", status, cp_finish, date_create)
+                        VALUES (:task_id, :user, :status, :cp_finish, :date_create)
+                    """),
+                    part,
+                )
+            conn.execute(text(f"ANALYZE {entity}_{group}"))
+    return list(users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка и бенчмарк SQL конверсий")
+    parser.add_argument("--check", action="store_true", help="Сравнить запросы на данных БД")
+    parser.add_argument("--users", type=int, default=20, help="Сколько пользователей проверить в режиме --check")
+    parser.add_argument("--tasks", type=int, default=10000, help="КП и образцов/производств у пользователя в бенчмарке")
+    args = parser.parse_args()
+
+    if args.check:
+        with engine.connect() as conn:
+            mismatches = compare(conn, top_users(conn, args.users))
+    else:
+        # Временные таблицы подменяют исходные, единые представления не используются
+        settings.DASHBOARD_UNIFIED_VIEWS = False
+        with engine.connect() as conn:
+            print(f"⏳ Создание синтетических данных: {args.tasks} КП и {args.tasks} образцов/производств у пользователя...")
+            users = create_synthetic_tables(conn, args.tasks)
+            mismatches = compare(conn, users, timing=True)
+            conn.rollback()
+
+    if mismatches:
+        print(f"❌ Расхождений: {mismatches}")
+        raise SystemExit(1)
+    print("✅ Результаты совпадают")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Проверка и бенчмарк помесячных агрегатов (migrations/005_create_monthly_rollups.sql)
+
+Сравнивает секции "Среднее время согласования КП" и "Среднее время принятия производства",
+посчитанные по агрегатам (DASHBOARD_MONTHLY_ROLLUPS=true), с расчетом по сырым строкам,
+и считает строки таблиц, прочитанные запросом секции (EXPLAIN ANALYZE, как в
+benchmark_shared_scan.py):
+
+    python refresh_rollups.py && python benchmark_rollups.py --users 5
+
+Агрегаты должны быть заполнены (refresh_rollups.py); скрипт их не изменяет.
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.services.dashboard_service import dashboard_service
+from app.services.fiscal_calendar import fiscal_calendar
+from benchmark_shared_scan import measure, top_users
+
+
+def section_queries(rollups: bool):
+    """SQL секций-временных рядов с агрегатами или по сырым строкам"""
+    settings.DASHBOARD_MONTHLY_ROLLUPS = rollups
+    return {
+        "approval_time": dashboard_service._approval_time_query(),
+        "production_acceptance_time": dashboard_service._production_acceptance_time_query(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Помесячные агрегаты: проверка и прочитанные строки")
+    parser.add_argument("--user", action="append", help="ФИО пользователя (можно несколько раз)")
+    parser.add_argument("--users", type=int, default=5, help="Сколько пользователей взять, если --user не указан")
+    args = parser.parse_args()
+
+    raw_queries = section_queries(rollups=False)
+    rollup_queries = section_queries(rollups=True)
+
+    mismatches = 0
+    with engine.connect() as conn:
+        users = args.user or top_users(conn, args.users)
+        for user_name in users:
+            for fiscal_year in ("current", "previous"):
+                params = {"user_name": user_name, **fiscal_calendar.periods(fiscal_year).params()}
+                for section_id, raw_query in raw_queries.items():
+                    rollup_query = rollup_queries[section_id]
+                    raw = [tuple(row) for row in conn.execute(text(raw_query), params)]
+                    rolled_up = [tuple(row) for row in conn.execute(text(rollup_query), params)]
+                    raw_read, _, raw_time = measure(conn, raw_query, params)
+                    rollup_read, _, rollup_time = measure(conn, rollup_query, params)
+                    same = raw == rolled_up
+                    if not same:
+                        mismatches += 1
+                    print(
+                        f"{'✅' if same else '❌'} {user_name} / {fiscal_year} / {section_id}: {len(raw)} месяцев, "
+                        f"прочитано строк {raw_read} → {rollup_read}, {raw_time:.1f} → {rollup_time:.1f} мс"
+                    )
+                    if not same:
+                        print(f"   сырые строки: {raw}")
+                        print(f"   агрегаты:     {rolled_up}")
+        conn.rollback()
+
+    if mismatches:
+        print(f"❌ Расхождений: {mismatches}")
+        raise SystemExit(1)
+    print("✅ Результаты совпадают")
+
+
+if __name__ == "__main__":
+    main()
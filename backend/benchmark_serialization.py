@@ -0,0 +1,149 @@
+"""
+Бенчмарк сериализации ответа /api/dashboard/
+
+Сравнивает прежний путь (валидация DashboardResponse Pydantic + jsonable_encoder + json)
+с быстрым (готовые элементы дашборда сразу в orjson) на синтетическом дашборде
+с большим количеством заказов клиентов. Быстрый путь замеряется для строк-словарей
+(как возвращал execute_query) и для колоночных QueryResult в обоих форматах ответа.
+
+Использование:
+    python benchmark_serialization.py
+    python benchmark_serialization.py --orders 2000 --repeat 50
+"""
+import argparse
+import json
+import time
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.database import QueryResult
+from app.core.serialization import dumps
+from app.models.schemas import DashboardResponse
+
+
+def build_dashboard(orders: int) -> dict:
+    """Синтетический дашборд в форме DashboardResponse"""
+    clients = [f"ООО Клиент {i}" for i in range(max(orders // 10, 1))]
+    details = [
+        {
+            "client": clients[i % len(clients)],
+            "order_name": f"Заказ №{i}",
+            "task_id": 100000 + i,
+            "sum_project": Decimal(f"{i * 137 % 100000}.50"),
+            "status": "В работе" if i % 3 else "Завершенная",
+        }
+        for i in range(orders)
+    ]
+    summary = [
+        {"Клиент": client, "Кол-во заказов": orders // len(clients), "Сумма": Decimal("123456.78")}
+        for client in clients
+    ]
+    overdue = [
+        {
+            "category": "Производства",
+            "task_id": 200000 + i,
+            "task_name": f"Задача {i}",
+            "prosr_day": i % 40,
+            "status": "В работе",
+        }
+        for i in range(orders // 4)
+    ]
+    months = [
+        {"Месяц": f"Месяц {i}", "Среднее время (дней)": Decimal("4.5"), "Изменение": Decimal("-0.3")}
+        for i in range(12)
+    ]
+
+    def item(item_id, data, details=None):
+        return {
+            "id": item_id,
+            "title": item_id,
+            "description": None,
+            "data": data,
+            "columns": list(data[0].keys()) if data else [],
+            "details": details,
+            "details_columns": list(details[0].keys()) if details else None,
+            "age_seconds": None,
+            "stale": False,
+        }
+
+    return {
+        "user_name": "Иванов Иван",
+        "items": [
+            item("overdue_tasks", [{"Категория": "Производства", "Кол-во": len(overdue), "Ср. дней": Decimal("12.3")}], overdue),
+            item("approval_time", months),
+            item("client_orders", summary, details),
+        ],
+        "failed_sections": [],
+    }
+
+
+def columnar_content(content: dict) -> dict:
+    """Тот же дашборд, но data/details - QueryResult, как их теперь возвращают секции"""
+    items = []
+    for item in content["items"]:
+        item = dict(item)
+        item["data"] = QueryResult.from_dicts(item["data"])
+        if item["details"] is not None:
+            item["details"] = QueryResult.from_dicts(item["details"])
+        items.append(item)
+    return {**content, "items": items}
+
+
+def pydantic_path(content: dict) -> bytes:
+    """Прежний путь FastAPI: валидация response_model и jsonable_encoder + json.dumps"""
+    model = DashboardResponse(**content)
+    encoded = jsonable_encoder(model)
+    return json.dumps(encoded, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(content: dict) -> bytes:
+    """Быстрый путь: готовые элементы сразу в orjson"""
+    return dumps(content)
+
+
+def columnar_path(content: dict) -> bytes:
+    """QueryResult, строки массивами значений (format=columnar)"""
+    return dumps(content, columnar=True)
+
+
+def measure(func, content: dict, repeat: int) -> float:
+    """Среднее время одного вызова, миллисекунды"""
+    func(content)  # прогрев
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(content)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации дашборда")
+    parser.add_argument("--orders", type=int, default=1000, help="Количество строк детализации заказов")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    content = build_dashboard(args.orders)
+    columnar = columnar_content(content)
+
+    # Все пути в формате объектов должны давать одинаковый JSON
+    expected = json.loads(pydantic_path(content))
+    assert expected == json.loads(fast_path(content)), "Результаты сериализации различаются"
+    assert expected == json.loads(fast_path(columnar)), "Результаты сериализации QueryResult различаются"
+
+    slow = measure(pydantic_path, content, args.repeat)
+    fast = measure(fast_path, content, args.repeat)
+    objects = measure(fast_path, columnar, args.repeat)
+    arrays = measure(columnar_path, columnar, args.repeat)
+    size = len(fast_path(content))
+    columnar_size = len(columnar_path(columnar))
+
+    print(f"Строк заказов: {args.orders}, размер ответа: {size / 1024:.0f} КБ (format=columnar: {columnar_size / 1024:.0f} КБ)")
+    print(f"Pydantic + json:                 {slow:8.2f} мс")
+    print(f"orjson, строки-словари:          {fast:8.2f} мс")
+    print(f"orjson, QueryResult -> объекты:  {objects:8.2f} мс")
+    print(f"orjson, QueryResult -> массивы:  {arrays:8.2f} мс")
+    print(f"Ускорение: {slow / fast:.1f}x (словари), {slow / arrays:.1f}x (format=columnar)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Проверка и бенчмарк общего чтения источников дашборда (DASHBOARD_SHARED_SCAN)
+
+Считает, сколько строк таблиц читает PostgreSQL на один дашборд: отдельными SQL секций
+(просроченные задачи, ожидание продаж, обе конверсии, заказы клиентов) и общим чтением
+каждой сущности один раз на запрос (services/shared_scan.py). Строки считаются по
+EXPLAIN (ANALYZE): все строки, которые прошли через узлы чтения таблиц (Seq Scan,
+Index Scan, Bitmap Heap Scan), включая отброшенные фильтром.
+
+    python benchmark_shared_scan.py                         # пользователи с наибольшим числом КП
+    python benchmark_shared_scan.py --user "Иван Петров"    # конкретный пользователь
+    python benchmark_shared_scan.py --check                 # сравнить результаты секций
+
+Запросы только читают данные; секции "Среднее время согласования КП" и "Среднее время
+принятия производства" в общем чтении не участвуют и не считаются.
+"""
+import argparse
+import contextlib
+import io
+import json
+
+from sqlalchemy import text
+
+from app.core.database import QueryResult, engine
+from app.services.dashboard_service import dashboard_service
+from app.services.fiscal_calendar import fiscal_calendar
+from app.services.shared_scan import SCAN_COLUMNS, SharedScan, scan_query
+from app.services.source_views import source_views
+
+# Узлы плана, читающие строки таблиц
+SCAN_NODES = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+
+# Колонки детализации, по которым секция сортирует строки (порядок при равенстве не определен)
+ORDER_KEYS = {
+    "overdue_tasks": ("category", "prosr_day"),
+    "waiting_sales": ("category", "waiting_days"),
+    "client_orders": ("client",),
+}
+
+
+def legacy_statements(fiscal_year: str, order_status: str):
+    """SQL секций без общего чтения: (название, запрос)"""
+    return [
+        ("Просроченные задачи", dashboard_service._overdue_tasks_query()),
+        ("Ждем ответа от продаж", dashboard_service._waiting_sales_query()),
+        ("Конверсии КП в образцы", dashboard_service._conversions_query()),
+        ("Конверсии КП в производство", dashboard_service._production_conversions_query()),
+        (f"Заказы от клиентов ({fiscal_year}, {order_status})", dashboard_service._client_orders_query(order_status)),
+    ]
+
+
+def shared_statements():
+    """SQL общего чтения: по одному на сущность"""
+    return [(f"Общее чтение {entity}", scan_query(entity)) for entity in SCAN_COLUMNS]
+
+
+def plan_rows(node) -> int:
+    """Строки таблиц, прочитанные узлом плана и его потомками"""
+    rows = 0
+    if node["Node Type"] in SCAN_NODES:
+        read = node["Actual Rows"] + node.get("Rows Removed by Filter", 0) + node.get("Rows Removed by Index Recheck", 0)
+        rows += round(read * node["Actual Loops"])
+    for child in node.get("Plans", []):
+        rows += plan_rows(child)
+    return rows
+
+
+def measure(conn, query: str, params: dict):
+    """(прочитано строк таблиц, возвращено строк, время выполнения в мс)"""
+    result = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}"), params).scalar()
+    explain = json.loads(result) if isinstance(result, str) else result
+    plan = explain[0]["Plan"]
+    return plan_rows(plan), plan["Actual Rows"], explain[0]["Execution Time"]
+
+
+def report(conn, title: str, statements, params: dict) -> int:
+    print(f"  {title}:")
+    total_read = total_returned = 0
+    total_time = 0.0
+    for name, query in statements:
+        read, returned, elapsed = measure(conn, query, params)
+        total_read += read
+        total_returned += returned
+        total_time += elapsed
+        print(f"    {name}: прочитано {read}, возвращено {returned}, {elapsed:.1f} мс")
+    print(f"    ИТОГО: {len(statements)} запросов, прочитано {total_read}, возвращено {total_returned}, {total_time:.1f} мс")
+    return total_read
+
+
+def benchmark(conn, users, fiscal_year: str, order_status: str) -> None:
+    params_base = fiscal_calendar.periods(fiscal_year).params()
+    for user_name in users:
+        params = {"user_name": user_name, **params_base}
+        print(f"👤 {user_name}")
+        before = report(conn, "Отдельные SQL секций", legacy_statements(fiscal_year, order_status), params)
+        after = report(conn, "Общее чтение", shared_statements(), params)
+        if before:
+            print(f"  📉 Строк прочитано: {before} → {after} ({after / before:.1%})")
+
+
+def quiet(func, *args):
+    """Вызов loader'а без отладочного вывода"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+def same_result(section_id: str, legacy, shared) -> bool:
+    """
+    Сводка и QueryResult-секции совпадают построчно (вместе с типами значений), детализация -
+    как набор строк с той же последовательностью ключей сортировки
+    """
+    def typed(rows):
+        return [tuple((type(value).__name__, value) for value in row) for row in rows]
+
+    if isinstance(legacy, QueryResult):
+        return legacy.columns == shared.columns and typed(legacy.rows) == typed(shared.rows)
+    legacy_details, shared_details = legacy["details"], shared["details"]
+    if legacy_details.columns != shared_details.columns:
+        return False
+    keys = [legacy_details.columns.index(name) for name in ORDER_KEYS.get(section_id, ())]
+    return (
+        legacy["summary"].columns == shared["summary"].columns
+        and typed(legacy["summary"].rows) == typed(shared["summary"].rows)
+        and sorted(map(repr, typed(legacy_details.rows))) == sorted(map(repr, typed(shared_details.rows)))
+        and [[row[key] for key in keys] for row in legacy_details.rows]
+        == [[row[key] for key in keys] for row in shared_details.rows]
+    )
+
+
+def check(users) -> int:
+    """Сравнивает результаты секций: SQL секции и общее чтение, возвращает число расхождений"""
+    mismatches = 0
+    for user_name in users:
+        for fiscal_year in ("current", "previous"):
+            for order_status in ("active", "completed", "all"):
+                periods = fiscal_calendar.periods(fiscal_year)
+                shared_scan = SharedScan(user_name, dashboard_service._query, periods)
+                for section in dashboard_service._dashboard_sections(user_name, fiscal_year, order_status, periods=periods):
+                    if "shared_loader" not in section:
+                        continue
+                    legacy = quiet(section["loader"], *section["args"])
+                    shared = quiet(section["shared_loader"], shared_scan, *section["args"])
+                    same = same_result(section["id"], legacy, shared)
+                    if not same:
+                        mismatches += 1
+                        print(f"❌ {user_name} / {fiscal_year} / {order_status} / {section['id']}")
+                print(f"{'✅' if not mismatches else '⚠️'} {user_name} / {fiscal_year} / {order_status}")
+    return mismatches
+
+
+def top_users(conn, limit: int):
+    """Пользователи с наибольшим количеством КП"""
+    all_users = source_views.source("proscheti", '"user"')
+    result = conn.execute(text(f"""
+        SELECT "user" FROM ({all_users}) users
+        WHERE "user" IS NOT NULL
+        GROUP BY "user" ORDER BY COUNT(*) DESC LIMIT :limit
+    """), {"limit": limit})
+    return [row[0] for row in result]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Строки, читаемые дашбордом: SQL секций и общее чтение источников")
+    parser.add_argument("--user", action="append", help="ФИО пользователя (можно несколько раз)")
+    parser.add_argument("--users", type=int, default=3, help="Сколько пользователей взять, если --user не указан")
+    parser.add_argument("--fiscal-year", default="current", choices=("current", "previous"))
+    parser.add_argument("--order-status", default="active", choices=("active", "completed", "all"))
+    parser.add_argument("--check", action="store_true", help="Сравнить результаты секций вместо подсчета строк")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        users = args.user or top_users(conn, args.users)
+        if not args.check:
+            benchmark(conn, users, args.fiscal_year, args.order_status)
+            conn.rollback()
+            return
+
+    mismatches = check(users)
+    if mismatches:
+        print(f"❌ Расхождений: {mismatches}")
+        raise SystemExit(1)
+    print("✅ Результаты совпадают")
+
+
+if __name__ == "__main__":
+    main()
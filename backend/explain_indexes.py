@@ -0,0 +1,151 @@
+"""
+Замеры EXPLAIN ANALYZE для индексов исходных таблиц (migrations/004_create_source_table_indexes.sql)
+
+Для каждого индекса выполняется запрос с тем же фильтром, что у дашборда:
+"до" - с отключенными индексными сканированиями (enable_indexscan/bitmapscan = off,
+как было без индексов), "после" - с обычными настройками планировщика.
+Ничего не изменяет в БД, индексы не удаляются.
+
+Использование:
+    python explain_indexes.py                         # вывод в консоль
+    python explain_indexes.py --user "Иванов Иван"    # фильтр по конкретному пользователю
+    python explain_indexes.py --output migrations/004_create_source_table_indexes.md
+"""
+import argparse
+import datetime
+import statistics
+
+from apply_migration import connect
+from app.services.fiscal_calendar import fiscal_calendar
+
+# (индекс, таблица, условие запроса дашборда)
+CASES = [
+    ('user_cp_finish', 'proscheti', 'cp_finish >= %(start)s AND cp_finish < %(end)s'),
+    ('user_cp_sogl', 'proscheti', 'cp_sogl >= %(start)s AND cp_sogl < %(end)s'),
+    ('user_overdue', 'proscheti', "prosrok_now = 'Да'"),
+    ('user_waiting', 'proscheti', "status = 'Нужно прикрепить документы'"),
+    ('user_date_create', 'obrazci', 'date_create >= %(start)s AND date_create < %(end)s'),
+    ('user_overdue', 'obrazci', "prosrok_now = 'Да'"),
+    ('user_waiting', 'obrazci', "status = 'Нужно прикрепить документы'"),
+    ('user_date_create', 'proizv', 'date_create >= %(start)s AND date_create < %(end)s'),
+    ('user_date_accept', 'proizv', 'date_accept >= %(start)s AND date_accept < %(end)s'),
+    ('user_overdue', 'proizv', "prosrok_now = 'Да'"),
+    ('user_waiting', 'proizv', "status = 'Нужно прикрепить документы'"),
+]
+GROUPS = ('gr_artema', 'gr_zheni')
+
+DISABLE_INDEXES = """
+    SET LOCAL enable_indexscan = off;
+    SET LOCAL enable_bitmapscan = off;
+    SET LOCAL enable_indexonlyscan = off;
+"""
+
+
+def explain(conn, query: str, params: dict, use_indexes: bool, repeat: int):
+    """Медиана Execution Time (мс) и описание сканирования таблицы"""
+    timings = []
+    plan_node = None
+    for _ in range(repeat):
+        with conn.cursor() as cursor:
+            if not use_indexes:
+                cursor.execute(DISABLE_INDEXES)
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params)
+            result = cursor.fetchone()[0][0]
+        conn.rollback()
+        timings.append(result['Execution Time'])
+        plan_node = _scan_node(result['Plan'])
+    return statistics.median(timings), plan_node
+
+
+def _scan_node(plan: dict) -> str:
+    """Описание сканирования таблицы из плана (с именем индекса, если он использован)"""
+    node_type = None
+    while True:
+        if node_type is None and 'Relation Name' in plan:
+            node_type = plan['Node Type']
+        if 'Index Name' in plan:
+            return f"{node_type or plan['Node Type']} (`{plan['Index Name']}`)"
+        if not plan.get('Plans'):
+            return node_type or plan['Node Type']
+        plan = plan['Plans'][0]
+
+
+def most_frequent_user(conn) -> str:
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT "user" FROM proscheti_gr_artema
+            WHERE "user" IS NOT NULL
+            GROUP BY "user" ORDER BY COUNT(*) DESC LIMIT 1
+        """)
+        row = cursor.fetchone()
+    conn.rollback()
+    return row[0] if row else ''
+
+
+def table_sizes(conn):
+    sizes = {}
+    with conn.cursor() as cursor:
+        for entity in ('proscheti', 'obrazci', 'proizv'):
+            for group in GROUPS:
+                cursor.execute(f"SELECT COUNT(*) FROM {entity}_{group}")
+                sizes[f"{entity}_{group}"] = cursor.fetchone()[0]
+    conn.rollback()
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN ANALYZE индексов исходных таблиц')
+    parser.add_argument('--user', help='ФИО пользователя (по умолчанию самый частый в proscheti_gr_artema)')
+    parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого запроса (берется медиана)')
+    parser.add_argument('--output', help='Записать результаты в markdown-файл')
+    parser.add_argument('--note', help='Описание данных для отчета (например, "копия production от 01.10")')
+    args = parser.parse_args()
+
+    conn = connect()
+    start, end = fiscal_calendar.fiscal_year_bounds("current")
+    params = {'user': args.user or most_frequent_user(conn), 'start': start, 'end': end}
+
+    with conn.cursor() as cursor:
+        cursor.execute('SHOW server_version')
+        server_version = cursor.fetchone()[0]
+    conn.rollback()
+
+    lines = [
+        '# EXPLAIN ANALYZE: индексы исходных таблиц (миграция 004)',
+        '',
+        f'Получено `python explain_indexes.py` {datetime.date.today():%d.%m.%Y}, PostgreSQL {server_version}.',
+        f'Финансовый год {start:%d.%m.%Y} - {end:%d.%m.%Y}, медиана {args.repeat} запусков.',
+        '"До" - индексные сканирования отключены (как без миграции 004), "после" - обычный план.',
+        '',
+    ]
+    if args.note:
+        lines += [f'Данные: {args.note}', '']
+    lines += [
+        'Строк в таблицах: ' + ', '.join(f'`{name}` {count}' for name, count in table_sizes(conn).items()),
+        '',
+        '| Индекс | Фильтр | До, мс | После, мс | План после |',
+        '|---|---|---:|---:|---|',
+    ]
+    for index_suffix, entity, condition in CASES:
+        for group in GROUPS:
+            table = f'{entity}_{group}'
+            query = f'SELECT * FROM {table} WHERE "user" = %(user)s AND {condition}'
+            before, _ = explain(conn, query, params, use_indexes=False, repeat=args.repeat)
+            after, plan = explain(conn, query, params, use_indexes=True, repeat=args.repeat)
+            shown_condition = condition.replace('%(start)s', 'начало года').replace('%(end)s', 'конец года')
+            lines.append(
+                f'| `idx_{table}_{index_suffix}` | `"user" = ... AND {shown_condition}` '
+                f'| {before:.2f} | {after:.2f} | {plan} |'
+            )
+    conn.close()
+
+    report = '\n'.join(lines) + '\n'
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+        print(f"✅ Результаты записаны в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Нагрузочный тест дашборда: проверяет, что одновременные запросы
+/api/dashboard/ выполняются параллельно, а не друг за другом
+
+Использование:
+    python load_test.py --user "Иван Петров"                 # приложение в процессе (ASGI)
+    python load_test.py --user "Иван Петров" --user "Ольга Смирнова" --concurrency 8
+    python load_test.py --url http://localhost:8000 --token <JWT администратора>
+
+Каждый запрос - со своим ключом (пользователь, fiscal_year, order_status), а кэш секций
+сбрасывается перед замерами, поэтому запросы не берутся из кэша и не объединяются
+SingleFlight: каждый выполняет SQL секций. Ключей - пользователи --user (или пользователь
+токена), умноженные на 2 финансовых года и 3 статуса заказов; их должно быть не меньше
+--concurrency + 1. С --url сброс кэша и счетчики (/api/metrics) требуют токена
+администратора (--token или --email из ADMIN_EMAILS).
+
+Если дашборды выполняются последовательно, общее время ~ времени одного запроса,
+умноженному на их количество (ускорение ~1x), а /api/health отвечает только после них.
+Тест завершается с кодом 1, если дашборды шли друг за другом, /api/health отвечал
+дольше --max-health-ms или во время одновременных запросов выросли счетчики попаданий
+в кэш или объединенных запросов.
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+import httpx
+
+FISCAL_YEARS = ("current", "previous")
+ORDER_STATUSES = ("active", "completed", "all")
+
+# Счетчики, которые не должны расти во время одновременных запросов: попадания в кэш
+# секций и запросы, объединенные с уже выполняющимися (SingleFlight)
+REUSE_COUNTERS = ("dashboard_cache_hits", "dashboard_cache_stale_hits", "dashboard_requests_coalesced")
+
+
+async def timed_get(client: httpx.AsyncClient, path: str, headers: dict = None, params: dict = None) -> float:
+    """Выполняет GET-запрос и возвращает время выполнения в секундах"""
+    started = time.perf_counter()
+    response = await client.get(path, headers=headers, params=params)
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event) -> list:
+    """Периодически опрашивает /api/health, пока идет нагрузка"""
+    latencies = []
+    while not stop.is_set():
+        latencies.append(await timed_get(client, "/api/health"))
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+def dashboard_keys(args) -> list:
+    """
+    Разные ключи дашборда: (заголовки с токеном пользователя, параметры запроса)
+
+    Сначала текущий финансовый год: результаты прошлого года секции с закрытым периодом
+    могут брать из постоянного хранилища.
+    """
+    if args.token:
+        users = [{"Authorization": f"Bearer {args.token}"}]
+    else:
+        from app.core.security import create_access_token
+        users = [
+            {"Authorization": f"Bearer {create_access_token({'sub': args.email, 'full_name': user})}"}
+            for user in (args.user or [""])
+        ]
+    return [
+        (headers, {"fiscal_year": fiscal_year, "order_status": order_status})
+        for fiscal_year, order_status, headers in itertools.product(FISCAL_YEARS, ORDER_STATUSES, users)
+    ]
+
+
+async def clear_cache(client: httpx.AsyncClient, args, headers: dict) -> None:
+    """Сбрасывает кэш секций дашбордов"""
+    if args.url:
+        response = await client.delete("/api/dashboard/cache", headers=headers)
+        response.raise_for_status()
+    else:
+        from app.services.dashboard_service import dashboard_service
+        dashboard_service.invalidate_cache()
+
+
+async def reuse_counters(client: httpx.AsyncClient, args, headers: dict) -> dict:
+    """Текущие значения REUSE_COUNTERS"""
+    if args.url:
+        response = await client.get("/api/metrics", headers=headers)
+        response.raise_for_status()
+        values = response.json()
+        return {name: values.get(name, 0) for name in REUSE_COUNTERS}
+    from app.core.metrics import metrics
+    return {name: metrics.get(name) for name in REUSE_COUNTERS}
+
+
+async def run(args):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        from app.main import app
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=args.timeout)
+
+    keys = dashboard_keys(args)
+    if len(keys) < args.concurrency + 1:
+        raise SystemExit(f"❌ Разных ключей дашборда {len(keys)}, нужно не меньше {args.concurrency + 1}: "
+                         f"добавьте пользователей --user или уменьшите --concurrency")
+    (single_headers, single_params), concurrent_keys = keys[0], keys[1:args.concurrency + 1]
+
+    async with client:
+        # Один запрос на холодном кэше для оценки времени
+        await clear_cache(client, args, single_headers)
+        single = await timed_get(client, "/api/dashboard/", single_headers, single_params)
+        print(f"Один запрос дашборда: {single:.2f} c")
+
+        await clear_cache(client, args, single_headers)
+        counters_before = await reuse_counters(client, args, single_headers)
+        stop = asyncio.Event()
+        health_task = asyncio.create_task(probe_health(client, stop))
+
+        started = time.perf_counter()
+        durations = await asyncio.gather(*[
+            timed_get(client, "/api/dashboard/", headers, params)
+            for headers, params in concurrent_keys
+        ])
+        wall = time.perf_counter() - started
+
+        stop.set()
+        health_latencies = await health_task
+        counters_after = await reuse_counters(client, args, single_headers)
+
+    sequential = single * args.concurrency
+    print(f"Одновременных запросов: {args.concurrency}")
+    print(f"Общее время: {wall:.2f} c, самый долгий запрос: {max(durations):.2f} c")
+    print(f"Ускорение относительно последовательного выполнения: {sequential / wall:.2f}x "
+          f"(1.0 = запросы шли друг за другом)")
+    failed = False
+    if health_latencies:
+        health_max = max(health_latencies) * 1000
+        print(f"/api/health во время нагрузки: {len(health_latencies)} запросов, "
+              f"максимум {health_max:.0f} мс")
+        if health_max > args.max_health_ms:
+            print(f"❌ /api/health ждет дашборды: {health_max:.0f} мс > {args.max_health_ms:.0f} мс")
+            failed = True
+        else:
+            print("✅ /api/health не ждет дашборды")
+    reused = {name: counters_after[name] - counters_before[name] for name in REUSE_COUNTERS}
+    if any(reused.values()):
+        print(f"❌ Запросы взяты из кэша или объединены, замер недействителен: {reused}")
+        failed = True
+    if wall >= sequential * 0.9:
+        print("❌ Дашборды выполняются последовательно")
+        failed = True
+    else:
+        print("✅ Дашборды выполняются параллельно")
+    if failed:
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест /api/dashboard/")
+    parser.add_argument("--url", help="Адрес запущенного backend (по умолчанию приложение в процессе)")
+    parser.add_argument("--token", help="JWT токен (по умолчанию создается из SECRET_KEY для каждого --user)")
+    parser.add_argument("--user", action="append", help="ФИО пользователя для токена (можно несколько раз)")
+    parser.add_argument("--email", default="load-test@local", help="Email (sub) создаваемых токенов")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--max-health-ms", type=float, default=500.0,
+                        help="Максимальное допустимое время ответа /api/health под нагрузкой, мс")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
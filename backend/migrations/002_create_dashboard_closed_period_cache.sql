@@ -0,0 +1,16 @@
+-- Постоянный кэш секций дашборда за закрытые финансовые годы (1 марта - 28/29 февраля)
+-- Результаты за закрытый период не меняются, поэтому вычисляются один раз на пользователя
+-- и переиспользуются между перезапусками и воркерами. Хранятся только секции, зависящие
+-- лишь от дат внутри года (не заказы клиентов: их статусы меняются и после закрытия года)
+CREATE TABLE IF NOT EXISTS dashboard_closed_period_cache (
+    user_name VARCHAR(255) NOT NULL,
+    section_id VARCHAR(64) NOT NULL,
+    period_start DATE NOT NULL,              -- Начало финансового года
+    payload TEXT NOT NULL,                   -- Результат секции (JSON)
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_name, section_id, period_start)
+);
+
+-- Индекс для сброса кэша по периоду (после догрузки данных)
+CREATE INDEX IF NOT EXISTS idx_dashboard_closed_period_cache_period
+    ON dashboard_closed_period_cache(period_start);
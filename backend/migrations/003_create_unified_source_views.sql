@@ -0,0 +1,56 @@
+-- Единые материализованные представления над парами таблиц *_gr_artema / *_gr_zheni
+-- Дашборд читает одно индексированное представление на сущность вместо UNION ALL двух таблиц.
+-- Колонка "group" - исходная таблица (gr_artema / gr_zheni), source_row - строка в ней
+-- (уникальный ключ нужен для REFRESH MATERIALIZED VIEW CONCURRENTLY).
+-- Представления обновляются после загрузки данных: python refresh_views.py
+
+-- Просчеты (КП)
+CREATE MATERIALIZED VIEW IF NOT EXISTS proscheti_all AS
+SELECT 'gr_artema'::text AS "group", ctid::text AS source_row,
+       task_id, task_name, "user", status, prosrok_now, prosr_day,
+       date_create, cp_finish, serch_date, cp_sogl, serch_sogl_day
+FROM proscheti_gr_artema
+UNION ALL
+SELECT 'gr_zheni'::text AS "group", ctid::text AS source_row,
+       task_id, task_name, "user", status, prosrok_now, prosr_day,
+       date_create, cp_finish, serch_date, cp_sogl, serch_sogl_day
+FROM proscheti_gr_zheni;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_proscheti_all_row ON proscheti_all("group", source_row);
+CREATE INDEX IF NOT EXISTS idx_proscheti_all_user_cp_finish ON proscheti_all("user", cp_finish);
+CREATE INDEX IF NOT EXISTS idx_proscheti_all_user_cp_sogl ON proscheti_all("user", cp_sogl);
+CREATE INDEX IF NOT EXISTS idx_proscheti_all_user_overdue ON proscheti_all("user") WHERE prosrok_now = 'Да';
+CREATE INDEX IF NOT EXISTS idx_proscheti_all_user_waiting ON proscheti_all("user") WHERE status = 'Нужно прикрепить документы';
+
+-- Образцы
+CREATE MATERIALIZED VIEW IF NOT EXISTS obrazci_all AS
+SELECT 'gr_artema'::text AS "group", ctid::text AS source_row,
+       task_id, task_name, "user", status, prosrok_now, prosr_day, date_create
+FROM obrazci_gr_artema
+UNION ALL
+SELECT 'gr_zheni'::text AS "group", ctid::text AS source_row,
+       task_id, task_name, "user", status, prosrok_now, prosr_day, date_create
+FROM obrazci_gr_zheni;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_obrazci_all_row ON obrazci_all("group", source_row);
+CREATE INDEX IF NOT EXISTS idx_obrazci_all_user_date_create ON obrazci_all("user", date_create);
+CREATE INDEX IF NOT EXISTS idx_obrazci_all_user_overdue ON obrazci_all("user") WHERE prosrok_now = 'Да';
+CREATE INDEX IF NOT EXISTS idx_obrazci_all_user_waiting ON obrazci_all("user") WHERE status = 'Нужно прикрепить документы';
+
+-- Производства
+CREATE MATERIALIZED VIEW IF NOT EXISTS proizv_all AS
+SELECT 'gr_artema'::text AS "group", ctid::text AS source_row,
+       task_id, task_name, "user", status, prosrok_now, prosr_day, date_create,
+       date_accept, colvo_days_accept, kontr_name, nad_zad_name, sum_project
+FROM proizv_gr_artema
+UNION ALL
+SELECT 'gr_zheni'::text AS "group", ctid::text AS source_row,
+       task_id, task_name, "user", status, prosrok_now, prosr_day, date_create,
+       date_accept, colvo_days_accept, kontr_name, nad_zad_name, sum_project
+FROM proizv_gr_zheni;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_proizv_all_row ON proizv_all("group", source_row);
+CREATE INDEX IF NOT EXISTS idx_proizv_all_user_date_create ON proizv_all("user", date_create);
+CREATE INDEX IF NOT EXISTS idx_proizv_all_user_date_accept ON proizv_all("user", date_accept);
+CREATE INDEX IF NOT EXISTS idx_proizv_all_user_overdue ON proizv_all("user") WHERE prosrok_now = 'Да';
+CREATE INDEX IF NOT EXISTS idx_proizv_all_user_waiting ON proizv_all("user") WHERE status = 'Нужно прикрепить документы';
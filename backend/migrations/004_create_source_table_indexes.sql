@@ -0,0 +1,43 @@
+-- migration: no-transaction
+-- Индексы исходных таблиц *_gr_artema / *_gr_zheni под фильтры запросов дашборда
+-- CONCURRENTLY не блокирует загрузку данных в таблицы на время построения индекса,
+-- поэтому миграция выполняется вне транзакции (см. apply_migration.py).
+-- Замеры EXPLAIN до/после: migrations/004_create_source_table_indexes.md
+
+-- Просчеты: конверсии по cp_finish, время согласования по cp_sogl,
+-- просроченные задачи и задачи, ждущие документов от продаж
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proscheti_gr_artema_user_cp_finish ON proscheti_gr_artema("user", cp_finish);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proscheti_gr_zheni_user_cp_finish ON proscheti_gr_zheni("user", cp_finish);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proscheti_gr_artema_user_cp_sogl ON proscheti_gr_artema("user", cp_sogl);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proscheti_gr_zheni_user_cp_sogl ON proscheti_gr_zheni("user", cp_sogl);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proscheti_gr_artema_user_overdue ON proscheti_gr_artema("user") WHERE prosrok_now = 'Да';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proscheti_gr_zheni_user_overdue ON proscheti_gr_zheni("user") WHERE prosrok_now = 'Да';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proscheti_gr_artema_user_waiting ON proscheti_gr_artema("user") WHERE status = 'Нужно прикрепить документы';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proscheti_gr_zheni_user_waiting ON proscheti_gr_zheni("user") WHERE status = 'Нужно прикрепить документы';
+
+-- Образцы: конверсии по date_create, просроченные и ждущие документов
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_obrazci_gr_artema_user_date_create ON obrazci_gr_artema("user", date_create);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_obrazci_gr_zheni_user_date_create ON obrazci_gr_zheni("user", date_create);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_obrazci_gr_artema_user_overdue ON obrazci_gr_artema("user") WHERE prosrok_now = 'Да';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_obrazci_gr_zheni_user_overdue ON obrazci_gr_zheni("user") WHERE prosrok_now = 'Да';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_obrazci_gr_artema_user_waiting ON obrazci_gr_artema("user") WHERE status = 'Нужно прикрепить документы';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_obrazci_gr_zheni_user_waiting ON obrazci_gr_zheni("user") WHERE status = 'Нужно прикрепить документы';
+
+-- Производства: заказы клиентов и конверсии по date_create, время принятия по date_accept,
+-- просроченные и ждущие документов
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proizv_gr_artema_user_date_create ON proizv_gr_artema("user", date_create);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proizv_gr_zheni_user_date_create ON proizv_gr_zheni("user", date_create);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proizv_gr_artema_user_date_accept ON proizv_gr_artema("user", date_accept);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proizv_gr_zheni_user_date_accept ON proizv_gr_zheni("user", date_accept);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proizv_gr_artema_user_overdue ON proizv_gr_artema("user") WHERE prosrok_now = 'Да';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proizv_gr_zheni_user_overdue ON proizv_gr_zheni("user") WHERE prosrok_now = 'Да';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proizv_gr_artema_user_waiting ON proizv_gr_artema("user") WHERE status = 'Нужно прикрепить документы';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_proizv_gr_zheni_user_waiting ON proizv_gr_zheni("user") WHERE status = 'Нужно прикрепить документы';
+
+-- Статистика для планировщика
+ANALYZE proscheti_gr_artema;
+ANALYZE proscheti_gr_zheni;
+ANALYZE obrazci_gr_artema;
+ANALYZE obrazci_gr_zheni;
+ANALYZE proizv_gr_artema;
+ANALYZE proizv_gr_zheni;
@@ -0,0 +1,29 @@
+-- Помесячные агрегаты для секций "Среднее время согласования КП" и "Среднее время принятия производства"
+-- Сумма и количество значений за месяц по пользователю: секция читает до 12 строк за финансовый год
+-- вместо всей истории пользователя. Месяцы после covered_until секции агрегируют по сырым строкам.
+-- Обновление (инкрементально, от водяного знака): python refresh_rollups.py
+
+-- Согласование КП: serch_sogl_day по месяцу cp_sogl
+CREATE TABLE IF NOT EXISTS approval_time_monthly (
+    "user" TEXT NOT NULL,
+    month DATE NOT NULL,                 -- Первое число месяца
+    days_sum NUMERIC NOT NULL,           -- SUM(serch_sogl_day)
+    days_count BIGINT NOT NULL,          -- COUNT(serch_sogl_day) - 0, если значений нет
+    PRIMARY KEY ("user", month)
+);
+
+-- Принятие производства: colvo_days_accept по месяцу date_accept
+CREATE TABLE IF NOT EXISTS production_acceptance_monthly (
+    "user" TEXT NOT NULL,
+    month DATE NOT NULL,
+    days_sum NUMERIC NOT NULL,           -- SUM(colvo_days_accept)
+    days_count BIGINT NOT NULL,          -- COUNT(colvo_days_accept)
+    PRIMARY KEY ("user", month)
+);
+
+-- Водяные знаки: месяцы раньше covered_until уже посчитаны в таблице агрегата
+CREATE TABLE IF NOT EXISTS dashboard_rollup_watermarks (
+    rollup VARCHAR(64) PRIMARY KEY,      -- approval_time / production_acceptance_time
+    covered_until DATE,                  -- NULL - агрегат еще не заполнен
+    refreshed_at TIMESTAMP
+);
@@ -0,0 +1,37 @@
+"""
+Обновление помесячных агрегатов approval_time_monthly / production_acceptance_monthly
+(migrations/005_create_monthly_rollups.sql)
+
+Запускайте после загрузки данных (агрегаты строятся по исходным таблицам групп):
+    python refresh_rollups.py          # месяцы от водяного знака до начала текущего месяца
+    python refresh_rollups.py --full   # пересчитать всю историю (после исправления старых данных)
+
+Инкрементальное обновление не видит изменений в месяцах раньше водяного знака минус
+DASHBOARD_ROLLUPS_LOOKBACK_MONTHS: запускайте --full регулярно (например, раз в сутки).
+"""
+import argparse
+import sys
+
+from app.services.monthly_rollups import monthly_rollups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обновление помесячных агрегатов дашборда")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Пересчитать агрегаты за всю историю, а не только от водяного знака",
+    )
+    args = parser.parse_args()
+
+    try:
+        written = monthly_rollups.refresh(full=args.full)
+    except Exception as e:
+        print(f"❌ Ошибка обновления агрегатов: {e}")
+        sys.exit(1)
+
+    print(f"✅ Агрегаты обновлены: {sum(written.values())} строк (пользователь, месяц)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Обновление единых представлений proscheti_all / obrazci_all / proizv_all
+(migrations/003_create_unified_source_views.sql)
+
+Запускайте после каждой загрузки данных в таблицы *_gr_artema / *_gr_zheni (например, из cron):
+    python refresh_views.py
+    python refresh_views.py --blocking   # без CONCURRENTLY (быстрее, но блокирует чтение)
+"""
+import argparse
+import sys
+
+from app.services.source_views import source_views
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обновление единых представлений дашборда")
+    parser.add_argument(
+        "--blocking",
+        action="store_true",
+        help="REFRESH без CONCURRENTLY: дашборды ждут окончания обновления",
+    )
+    args = parser.parse_args()
+
+    try:
+        durations = source_views.refresh(concurrently=not args.blocking)
+    except Exception as e:
+        print(f"❌ Ошибка обновления представлений: {e}")
+        sys.exit(1)
+
+    print(f"✅ Представления обновлены за {sum(durations.values()):.2f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -24,7 +24,7 @@ function DashboardPage({ token, userInfo, onLogout, theme, onToggleTheme }) {
     setClientOrdersLoading(true)
     
     try {
-      const data = await dashboardAPI.getDashboard('current', status)
+      const data = await dashboardAPI.getDashboard('current', status, ['client_orders'])
       const clientOrdersItem = data.items?.find(item => item.id === 'client_orders')
       
       if (clientOrdersItem && dashboardData) {
@@ -52,25 +52,37 @@ function DashboardPage({ token, userInfo, onLogout, theme, onToggleTheme }) {
     setLoading(true)
     setError('')
 
+    // Секции приходят по мере вычисления (просроченные задачи первыми) -
+    // показываем дашборд сразу после первой, упорядочивая элементы по index
+    const positions = {}
+    const placeItem = (items, index, item) => {
+      positions[item.id] = index
+      return [...items.filter((existing) => existing.id !== item.id), item]
+        .sort((a, b) => positions[a.id] - positions[b.id])
+    }
+
     try {
-      const data = await dashboardAPI.getDashboard('current', orderStatus)
-      console.log('📊 Dashboard data received:', data)
-      console.log('📊 Items:', data.items)
-      // Логируем просроченные задачи отдельно
-      const overdueItem = data.items?.find(item => item.id === 'overdue_tasks')
-      if (overdueItem) {
-        console.log('📋 Overdue tasks item:', overdueItem)
-        console.log('📋 Overdue details:', overdueItem.details)
-      }
-      // Логируем заказы клиентов
-      const clientOrdersItem = data.items?.find(item => item.id === 'client_orders')
-      if (clientOrdersItem) {
-        console.log('📦 Client orders item:', clientOrdersItem)
-        console.log('📦 Client orders details:', clientOrdersItem.details)
-      }
-      setDashboardData(data)
+      await dashboardAPI.streamDashboard('current', orderStatus, (event) => {
+        if (event.type === 'start') {
+          setDashboardData({ user_name: event.user_name, items: [], failed_sections: [] })
+        } else if (event.type === 'item') {
+          console.log('📊 Dashboard item received:', event.item.id)
+          setDashboardData((prevData) => ({
+            ...prevData,
+            items: placeItem(prevData.items, event.index, event.item)
+          }))
+          setLoading(false)
+        } else if (event.type === 'end') {
+          setDashboardData((prevData) => ({ ...prevData, failed_sections: event.failed_sections }))
+        }
+      })
     } catch (err) {
       console.error('Dashboard load error:', err)
+      if (err.response?.status === 401) {
+        // Токен истек: токен уже удален (api.js), возвращаемся на страницу входа
+        onLogout()
+        return
+      }
       setError('Ошибка при загрузке данных дашборда')
     } finally {
       setLoading(false)
@@ -123,6 +135,15 @@ function DashboardPage({ token, userInfo, onLogout, theme, onToggleTheme }) {
                 <p>Ваш персонализированный дашборд с аналитикой</p>
               </div>
 
+              {dashboardData.failed_sections && dashboardData.failed_sections.length > 0 && (
+                <div className="error-banner">
+                  Не удалось загрузить: {dashboardData.failed_sections.map((section) => section.title).join(', ')}
+                  <button onClick={loadDashboard} className="btn btn-primary">
+                    Повторить
+                  </button>
+                </div>
+              )}
+
               <div className="dashboard-grid">
                 {dashboardData.items && dashboardData.items.length > 0 ? (
                   dashboardData.items.map((item) => (
@@ -23,6 +23,23 @@ api.interceptors.request.use((config) => {
   return config
 })
 
+/**
+ * Токен истек или невалидный: удаляем его и перезагружаем страницу (приложение покажет вход)
+ */
+function handleExpiredToken() {
+  const token = localStorage.getItem('authToken')
+  if (token) {
+    // Токен есть, но он невалидный - значит истек, делаем reload
+    localStorage.removeItem('authToken')
+    localStorage.removeItem('userInfo')
+    // Проверяем, что мы не на странице логина
+    if (!window.location.pathname.includes('/login') && window.location.pathname !== '/') {
+      window.location.reload()
+    }
+  }
+  // Если токена нет - это нормально для страницы логина, не делаем reload
+}
+
 // Обработка ошибок
 api.interceptors.response.use(
   (response) => response,
@@ -38,17 +55,7 @@ api.interceptors.response.use(
       }
       
       // Токен истек или невалидный (но это НЕ запрос логина)
-      const token = localStorage.getItem('authToken')
-      if (token) {
-        // Токен есть, но он невалидный - значит истек, делаем reload
-        localStorage.removeItem('authToken')
-        localStorage.removeItem('userInfo')
-        // Проверяем, что мы не на странице логина
-        if (!window.location.pathname.includes('/login') && window.location.pathname !== '/') {
-          window.location.reload()
-        }
-      }
-      // Если токена нет - это нормально для страницы логина, не делаем reload
+      handleExpiredToken()
     }
     return Promise.reject(error)
   }
@@ -82,24 +89,79 @@ export const authAPI = {
  * API для дашборда
  */
 export const dashboardAPI = {
-  getDashboard: async (fiscalYear = 'current', orderStatus = 'active') => {
+  getDashboard: async (fiscalYear = 'current', orderStatus = 'active', sections = null) => {
     const response = await api.get('/dashboard/', {
       params: { 
         fiscal_year: fiscalYear,
-        order_status: orderStatus
+        order_status: orderStatus,
+        format: 'columnar',
+        // Только эти секции (id); без параметра вычисляются все
+        ...(sections ? { sections: sections.join(',') } : {})
       }
     })
-    return response.data
+    return { ...response.data, items: response.data.items.map(rowsToObjects) }
+  },
+  
+  /**
+   * Потоковая загрузка дашборда (NDJSON): onEvent вызывается для каждого события
+   * start / item / end по мере вычисления секций
+   */
+  streamDashboard: async (fiscalYear = 'current', orderStatus = 'active', onEvent) => {
+    const params = new URLSearchParams({ fiscal_year: fiscalYear, order_status: orderStatus, format: 'columnar' })
+    const token = localStorage.getItem('authToken')
+    const response = await fetch(`${API_BASE_URL}/dashboard/stream?${params}`, {
+      headers: token ? { Authorization: `Bearer ${token}` } : {},
+    })
+    if (!response.ok) {
+      // fetch не проходит через interceptor axios - истекший токен обрабатываем так же
+      if (response.status === 401) {
+        handleExpiredToken()
+      }
+      const error = new Error(`Dashboard stream failed: ${response.status}`)
+      error.response = { status: response.status }
+      throw error
+    }
+
+    const emit = (event) => onEvent(event.type === 'item' ? { ...event, item: rowsToObjects(event.item) } : event)
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+      const lines = buffer.split('\n')
+      buffer = lines.pop()
+      lines.filter((line) => line.trim()).forEach((line) => emit(JSON.parse(line)))
+    }
+    if (buffer.trim()) {
+      emit(JSON.parse(buffer))
+    }
   },
   
   getDashboardItems: async (fiscalYear = 'current') => {
     const response = await api.get('/dashboard/items', {
-      params: { fiscal_year: fiscalYear }
+      params: { fiscal_year: fiscalYear, format: 'columnar' }
     })
-    return response.data
+    return response.data.map(rowsToObjects)
   },
 }
 
+/**
+ * Элемент дашборда из колоночного формата (format=columnar: строки - массивы значений
+ * в порядке columns / details_columns) в строки-объекты, которые ожидают таблицы
+ */
+function rowsToObjects(item) {
+  const toObjects = (rows, columns) => rows && rows.map((row) =>
+    Array.isArray(row) ? Object.fromEntries(columns.map((column, index) => [column, row[index]])) : row
+  )
+  return {
+    ...item,
+    data: toObjects(item.data, item.columns),
+    details: toObjects(item.details, item.details_columns || []),
+  }
+}
+
 /**
  * Проверка здоровья сервиса
  */